@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# batch.py
+# --------------------------------------------
+# deps: openai, anthropic, pandas, pillow, python-dotenv
+#
+# Batch-API submission mode for full-archive runs. Trades latency (up to 24 h)
+# for throughput and the batch discount:
+#   1. every pending (puzzle, attempt) of a model is turned into one request
+#      line, built from the same build_msgs_* output the live runners use,
+#      and written to results/batches/batch_{MODEL}.jsonl
+#   2. the file is submitted as a single OpenAI or Anthropic batch job
+#   3. the job is polled until it ends
+#   4. outputs are merged back into results_{MODEL}.json in the usual schema
+#
+# The batch id is kept in results/batches/batch_{MODEL}.state.json, so an
+# interrupted run resumes polling instead of submitting twice. Gemini has
+# no batch endpoint here and is skipped.
+#
+# Usage:
+#   python src/batch.py gpt-4o-mini claude-3-haiku-20240307 [--poll-sec 60]
+#
+# Offline: start src/fake_provider.py and set OPENAI_BASE_URL /
+# ANTHROPIC_BASE_URL; it completes batches immediately.
+# --------------------------------------------
+
+import argparse
+import json
+import time
+from datetime import datetime as dt
+
+import benchmark_reasoning as br
+from clients import get_client
+from prompt_cache import split_usage
+from providers import classify_provider
+
+BATCH_DIR       = br.RESULTS_DIR / "batches"
+POLL_SEC        = 60
+OPENAI_ENDPOINT = "/v1/chat/completions"
+DONE_STATUSES   = {"completed", "failed", "expired", "cancelled", "ended"}
+
+
+def custom_id(job):
+    return f"{job['pid']}-{job['attempt']}"
+
+
+def request_line(provider, model, job):
+    """One batch request for `job`, in the provider's batch input format."""
+    if provider == "openai":
+        return {"custom_id": custom_id(job), "method": "POST", "url": OPENAI_ENDPOINT,
+                "body": br.openai_kwargs(model, job)}
+    system_txt, parts = job["prompt"]
+    return {"custom_id": custom_id(job),
+            "params": {"model": model, "system": system_txt,
+                       "messages": [{"role": "user", "content": parts}],
+                       "temperature": job["temperature"], "max_tokens": br.COMPLETION_MAX}}
+
+
+def write_requests(provider, model, jobs):
+    path = BATCH_DIR / f"batch_{model}.jsonl"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for job in jobs:
+            f.write(json.dumps(request_line(provider, model, job)) + "\n")
+    return path
+
+
+def submit(provider, client, path):
+    """Submit a request file as one batch job; returns the batch id."""
+    if provider == "openai":
+        with open(path, "rb") as f:
+            upload = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(input_file_id=upload.id, endpoint=OPENAI_ENDPOINT,
+                                      completion_window="24h")
+        return batch.id
+    with open(path) as f:
+        requests = [json.loads(line) for line in f]
+    return client.messages.batches.create(requests=requests).id
+
+
+def poll(provider, client, batch_id, poll_sec):
+    """Block until the batch reaches a terminal status; returns the batch object."""
+    while True:
+        if provider == "openai":
+            batch = client.batches.retrieve(batch_id)
+            status, counts = batch.status, batch.request_counts
+        else:
+            batch = client.messages.batches.retrieve(batch_id)
+            status, counts = batch.processing_status, batch.request_counts
+        print(f"{dt.now().time()}  batch {batch_id}: {status}  {counts}")
+        if status in DONE_STATUSES:
+            return batch
+        time.sleep(poll_sec)
+
+
+def fetch_outputs(provider, client, batch):
+    """{custom_id: (answer, (prompt, completion, total), (cache read, cache write))} for every successful request."""
+    outputs = {}
+    if provider == "openai":
+        if not batch.output_file_id:
+            return outputs
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            resp = rec.get("response") or {}
+            if resp.get("status_code") != 200:
+                continue
+            body = resp["body"]
+            outputs[rec["custom_id"]] = (body["choices"][0]["message"]["content"].strip(),
+                                         *split_usage(provider, body["usage"]))
+        return outputs
+    for rec in client.messages.batches.results(batch.id):
+        if rec.result.type != "succeeded":
+            continue
+        msg = rec.result.message
+        outputs[rec.custom_id] = (msg.content[0].text.strip(), *split_usage(provider, msg.usage))
+    return outputs
+
+
+def run_batch(model, poll_sec=POLL_SEC):
+    provider = classify_provider(model)
+    if provider not in ("openai", "anthropic"):
+        print(f"[SKIP] {model}: no batch endpoint for {provider}")
+        return
+
+    results = br.load_results(model)
+    jobs = br.build_jobs(provider, model, results)
+    if not jobs:
+        print(f"[SKIP] {model}: nothing left to run")
+        return
+    client = get_client(provider, model)
+
+    state_path = BATCH_DIR / f"batch_{model}.state.json"
+    if state_path.exists():
+        batch_id = json.loads(state_path.read_text())["id"]
+        print(f"→ Resuming {model} batch {batch_id}")
+    else:
+        path = write_requests(provider, model, jobs)
+        batch_id = submit(provider, client, path)
+        state_path.write_text(json.dumps({"id": batch_id, "provider": provider, "input": path.name}))
+        print(f"→ Submitted {len(jobs)} requests for {model} as batch {batch_id}")
+
+    batch = poll(provider, client, batch_id, poll_sec)
+    outputs = fetch_outputs(provider, client, batch)
+
+    merged = 0
+    for job in jobs:
+        out = outputs.get(custom_id(job))
+        if out:
+            answer, usage, cache = out
+            br.record_entry(results, job, br.make_entry(job, answer, usage, cache=cache))
+            merged += 1
+    br.save_results(model, results)
+    state_path.unlink()
+    print(f"✓ {model}: merged {merged}/{len(jobs)} answers into {br.result_path(model).name}"
+          f"{'' if merged == len(jobs) else ' (rerun to resubmit the rest)'}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the puzzle benchmark through the provider batch APIs")
+    ap.add_argument("models", nargs="*", default=br.MODELS)
+    ap.add_argument("--poll-sec", type=float, default=POLL_SEC)
+    args = ap.parse_args()
+    for model in args.models:
+        run_batch(model, args.poll_sec)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# bench_engine.py
+# --------------------------------------------
+# deps: openai, pandas, pillow, python-dotenv
+#
+# Offline throughput benchmark for engine.py. Starts fake_provider.py in the
+# background, builds the real OpenAI prompts for every puzzle x attempt, and
+# pushes them through the Engine at several concurrency levels, reporting
+# requests/sec and wall-clock per run. Nothing is written to results/.
+#
+# --stream compares whole responses with streamed ones that stop at the answer
+# tag, on replies padded with --ramble tokens paced --token-latency apart, and
+# adds p50 time-to-first-token / latency per run.
+#
+# Usage:
+#   python src/bench_engine.py --latency 0.5 --concurrency 1 8 32
+#   python src/bench_engine.py --stream --ramble 200 --token-latency 0.01 --concurrency 16
+# --------------------------------------------
+
+import argparse
+import asyncio
+import contextlib
+import io
+
+import benchmark_reasoning as br
+import fake_provider
+from engine import Engine
+from providers import PROVIDER_LIMITS
+from ratelimit import RateLimiter
+from response_cache import set_mode
+
+
+def run_once(jobs, concurrency, port, tpm_limit):
+    from openai import OpenAI
+    client = OpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="fake")
+    limiter = RateLimiter(rpm=PROVIDER_LIMITS["openai"]["rpm"], tpm=tpm_limit)
+    call = lambda job: br.call_attempt("openai", client, "fake-model", job, limiter)
+    engine = Engine("bench", call, concurrency=concurrency, limiter=limiter)
+    entries = []
+    with contextlib.redirect_stdout(io.StringIO()):   # silence per-attempt logging
+        stats = asyncio.run(engine.run(jobs, lambda job, entry: entries.append(entry)))
+    return stats, entries
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark engine throughput against fake_provider")
+    ap.add_argument("--latency", type=float, default=0.5)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--limit", type=int, default=None, help="only use the first N jobs")
+    ap.add_argument("--tpm", type=int, default=None,
+                    help="apply a TPM limit (off by default: the fake server has no quota)")
+    ap.add_argument("--stream", action="store_true", help="also run streamed attempts and compare")
+    ap.add_argument("--ramble", type=int, default=0, help="filler tokens the fake server adds after the answer")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="fake seconds per generated token")
+    args = ap.parse_args()
+    set_mode("off")                                   # time the server, not cache hits
+
+    server = fake_provider.serve(port=0, latency=args.latency, background=True,
+                                 ramble=args.ramble, token_latency=args.token_latency)
+    port = server.server_port
+
+    modes = [False, True] if args.stream else [False]
+    job_sets = {stream: br.build_jobs("openai", "fake-model", {}, stream) for stream in modes}
+    if args.limit:
+        job_sets = {k: jobs[:args.limit] for k, jobs in job_sets.items()}
+    print(f"{len(job_sets[False])} jobs, fake latency {args.latency}s"
+          + (f", {args.ramble} filler tokens at {args.token_latency}s" if args.ramble else ""))
+
+    print(f"{'mode':>8} {'concurrency':>12} {'requests':>9} {'wall (s)':>9} {'req/s':>8}  streamed")
+    for stream in modes:
+        for c in args.concurrency:
+            stats, entries = run_once(job_sets[stream], c, port, args.tpm)
+            timing = br.stream_summary(entries) if stream else ""
+            print(f"{'stream' if stream else 'whole':>8} {c:>12} {stats['requests']:>9} {stats['elapsed']:>9.1f} "
+                  f"{stats['rps']:>8.2f}  {timing}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
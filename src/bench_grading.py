@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# bench_grading.py
+# --------------------------------------------
+# deps: pandas
+#
+# Micro-benchmark for the regex grading core in check_accuracy_regex.py.
+# Builds a synthetic results set (default 100k answers: MODELS x puzzles x
+# 2 attempts) from the real ground truth, mixing real model answers,
+# reformatted truths ("$1,234$", "The answer is 42") and random numbers, and
+# times
+#   • legacy – the old per-row loop: normalize(answer) and normalize(truth)
+#              recomputed for every comparison
+#   • frame  – results_frame + grade: truths normalized once, each distinct
+#              answer normalized once, all models in one pass
+# reporting answers/sec. Both paths must agree on every flag.
+#
+# Usage:
+#   python src/bench_grading.py [--answers 100000] [--seed 0]
+# --------------------------------------------
+
+import argparse
+import random
+import time
+
+import check_accuracy_regex as car
+from puzzle_store import default_store
+
+
+def synthetic_results(truths, n_answers, seed):
+    """{model: results_json} with n_answers answers in total (two attempts per puzzle)."""
+    rng = random.Random(seed)
+    real = [a.get("answer", "") for m in car.MODELS_FILE.read_text().split()
+            if (r := car.load_results(m)) for rec in r.values() for a in rec.get("answers", [])]
+    pids = list(truths.index)
+
+    def answer(pid):
+        truth = truths.at[pid, "truth"]
+        roll = rng.random()
+        if roll < 0.4 and real:
+            return rng.choice(real)
+        if roll < 0.6:
+            return rng.choice([truth, f"${truth}$", f"The answer is {truth}.", f"\\( {truth} \\)"])
+        if roll < 0.9:
+            return str(rng.randint(0, 10 ** rng.randint(1, 9)))
+        return f"{rng.randint(1, 99)}/{rng.randint(1, 99)}"
+
+    results, n, m = {}, 0, 0
+    while n < n_answers:
+        model = f"synthetic-{m}"
+        results[model] = {}
+        for pid in pids:
+            if n >= n_answers:
+                break
+            results[model][str(pid)] = {"name": truths.at[pid, "truth_name"],
+                                        "answers": [{"attempt": 0, "answer": answer(pid)},
+                                                    {"attempt": 1, "answer": answer(pid)}]}
+            n += 2
+        m += 1
+    return results
+
+
+def legacy(results_by_model, truths):
+    """The pre-frame loop: per-row lookups, normalize() on both sides of every comparison."""
+    def match(a, t):
+        return not car.normalize(a).isdisjoint(car.normalize(t))
+
+    flags = []
+    for model_name, results in results_by_model.items():
+        for pid_str, rec in results.items():
+            pid_int = int(pid_str)
+            if pid_int not in truths.index:
+                continue
+            truth = truths.at[pid_int, "truth"]
+            answers = rec.get("answers", [])
+            ans0 = answers[0].get("answer", "").strip() if len(answers) >= 1 else ""
+            ans1 = answers[1].get("answer", "").strip() if len(answers) >= 2 else ""
+            first_ok = match(ans0, truth)
+            flags.append((first_ok, first_ok or match(ans1, truth)))
+    return flags
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark regex grading throughput")
+    ap.add_argument("--answers", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    truths = car.truth_table(default_store())
+    data = synthetic_results(truths, args.answers, args.seed)
+    n = sum(2 * len(r) for r in data.values())
+    print(f"{n} answers, {len(data)} models, {len(truths)} puzzles with ground truth")
+
+    t = time.perf_counter()
+    old = legacy(data, truths)
+    t_legacy = time.perf_counter() - t
+
+    runs = {}
+    for label in ("frame (cold cache)", "frame (warm cache)"):
+        if "cold" in label:
+            car.canonical.cache_clear()
+        t = time.perf_counter()
+        graded = car.grade(car.results_frame(data), car.truth_table(default_store()))
+        runs[label] = time.perf_counter() - t
+    new = list(zip(graded["first_ok"], graded["best_ok"]))
+    assert old == new, "frame grading disagrees with the legacy loop"
+
+    print(f"{'legacy':<20} {t_legacy:7.2f}s  {n / t_legacy:>10,.0f} answers/s")
+    for label, sec in runs.items():
+        print(f"{label:<20} {sec:7.2f}s  {n / sec:>10,.0f} answers/s  ({t_legacy / sec:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# bench_images.py
+# --------------------------------------------
+# deps: openai, anthropic, google-generativeai, pandas, pillow, python-dotenv (via clients)
+#
+# Image tokens against accuracy, per puzzle category (categories.csv).
+# Every image puzzle is asked once per image version:
+#
+#   • 600px   – the IMG_MAX_PX JPEG the runners sent before image_prep
+#   • N×      – image_prep.prepare at N × the model's IMAGE_BUDGET (--scales)
+#
+# with benchmark_reasoning's system prompt at temperature 0, and graded with
+# check_accuracy_regex.answers_match. Per category (a puzzle counts in each
+# of its flags; "all" covers every puzzle) it prints the mean image tokens
+# and the accuracy of each version. Requests go through response_cache, so
+# a re-run or --cache-only replays them; nothing is written to results/.
+# To check the plumbing offline, point OPENAI_BASE_URL / ANTHROPIC_BASE_URL
+# at src/fake_provider.py.
+#
+# Usage:
+#   python src/bench_images.py [MODEL ...] [--scales 0.5 1 2] [--limit N] [--dry-run]
+# --------------------------------------------
+
+import argparse
+import asyncio
+from pathlib import Path
+
+import pandas as pd
+
+import benchmark_reasoning as br
+from check_accuracy_regex import answers_match
+from clients import complete, image_part, to_anthropic, to_gemini, to_openai
+from engine import Engine
+from image_cache import jpeg_b64
+from image_prep import prepare, puzzle_images
+from providers import PROVIDER_LIMITS, classify_provider, read_models
+from ratelimit import RateLimiter
+from response_cache import add_cli_flags, apply_cli_flags
+from token_estimate import b64_size, estimate, image_tokens
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR        = Path(__file__).resolve().parent.parent
+CATEGORIES_PATH = BASE_DIR / "data" / "puzzles" / "categories.csv"
+SCALES          = (0.5, 1.0, 2.0)
+LEGACY          = "600px"
+
+
+def categories():
+    """{puzzle name: [category, ...]} from categories.csv's 0/1 flag columns."""
+    if not CATEGORIES_PATH.exists():
+        print(f"[WARN] {CATEGORIES_PATH} not found: reporting all puzzles together")
+        return {}
+    df = pd.read_csv(CATEGORIES_PATH)
+    flags = [c for c in df.columns if c not in ("id", "name")]
+    return {str(r["name"]).strip(): [c for c in flags if r[c] == 1] for _, r in df.iterrows()}
+
+
+def versions(path, provider, model, scales):
+    """{version label: (b64, media type, image tokens)} for one puzzle image."""
+    legacy = jpeg_b64(path)
+    out = {LEGACY: (legacy, "image/jpeg", image_tokens(provider, model, *b64_size(legacy)))}
+    for scale in scales:
+        p = prepare(path, provider, model, scale)
+        out[f"{scale:g}×"] = (p["b64"], p["media_type"], p["tokens"])
+    return out
+
+
+def build_jobs(provider, model, rows, scales):
+    jobs = []
+    for row in rows:
+        if row.get("answer") is None or not isinstance(row.get("puzzleText"), str):
+            continue
+        for label, (b64, media_type, tokens) in versions(row["imagePath"], provider, model, scales).items():
+            messages = [{"role": "system", "content": br.system_prompt()},
+                        {"role": "user", "content": [image_part(row["imagePath"], b64, media_type),
+                                                     {"type": "text", "text": row["puzzleText"]}]}]
+            shaped = {"openai": to_openai, "anthropic": to_anthropic}.get(provider, to_gemini)(messages)
+            jobs.append({"model": model, "pid": str(int(row["id"])), "name": row["name"].strip(),
+                         "truth": str(row["answer"]).strip(), "version": label, "image_tokens": tokens,
+                         "messages": messages, "label": f"{row['name'].strip()} @ {label}",
+                         "tokens": estimate(provider, model, shaped) + br.COMPLETION_MAX})
+    return jobs
+
+
+def ask(job, limiter):
+    answer, usage = complete(job["model"], job["messages"], {"temperature": 0.0, "max_tokens": br.COMPLETION_MAX},
+                             attempt="images", limiter=limiter)
+    return {"answer": answer, **usage}
+
+
+async def run_model(model, rows, scales, dry_run):
+    """One row per (puzzle, version): name, version, image_tokens, ok."""
+    provider = classify_provider(model)
+    jobs = await asyncio.to_thread(build_jobs, provider, model, rows, scales)
+    if dry_run:
+        return pd.DataFrame([{"name": j["name"], "version": j["version"], "image_tokens": j["image_tokens"],
+                              "ok": None} for j in jobs])
+    out = []
+
+    def record(job, entry):
+        out.append({"name": job["name"], "version": job["version"], "image_tokens": job["image_tokens"],
+                    "ok": answers_match(entry["answer"], job["truth"])})
+
+    limits = PROVIDER_LIMITS[provider]
+    limiter = RateLimiter(rpm=limits["rpm"], tpm=limits["tpm"])
+    engine = Engine(provider, lambda job: ask(job, limiter), concurrency=limits["concurrency"], limiter=limiter)
+    stats = await engine.run(jobs, record)
+    print(f"{model}: {stats['requests']} requests, {stats['failed']} failed, {stats['elapsed']:.1f}s")
+    return pd.DataFrame(out)
+
+
+def report(model, df, cats, scales):
+    labels = [LEGACY, *(f"{scale:g}×" for scale in scales)]
+    rows = [("all", df)]
+    for cat in sorted({c for cs in cats.values() for c in cs}):
+        rows.append((cat, df[df["name"].map(lambda n: cat in cats.get(n, []))]))
+    print(f"\n{model}: {df['name'].nunique()} image puzzles; mean image tokens / accuracy per version")
+    print(f"  {'category':<14}{'n':>4}" + "".join(f"{label:>18}" for label in labels))
+    for cat, part in rows:
+        if part.empty:
+            continue
+        cells = []
+        for label in labels:
+            v = part[part["version"] == label]
+            acc = "   -" if v["ok"].isna().all() else f"{v['ok'].mean():>4.0%}"
+            cells.append(f"{v['image_tokens'].mean():>11,.0f} {acc:>5}")
+        print(f"  {cat:<14}{part['name'].nunique():>4}" + "".join(f"{c:>18}" for c in cells))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Image tokens against accuracy per puzzle category")
+    ap.add_argument("models", nargs="*", help="default: models.txt")
+    ap.add_argument("--scales", type=float, nargs="+", default=list(SCALES),
+                    help="multiples of image_prep.IMAGE_BUDGET to try")
+    ap.add_argument("--limit", type=int, default=None, help="only the first N image puzzles")
+    ap.add_argument("--dry-run", action="store_true", help="image tokens only, no requests")
+    add_cli_flags(ap)
+    args = ap.parse_args()
+    apply_cli_flags(args)
+
+    rows = puzzle_images()[:args.limit]
+    cats = categories()
+    for model in args.models or read_models():
+        df = asyncio.run(run_model(model, rows, args.scales, args.dry_run))
+        if df.empty:
+            print(f"[SKIP] {model}: no answered image puzzles")
+            continue
+        report(model, df, cats, args.scales)
+
+
+if __name__ == "__main__":
+    main()
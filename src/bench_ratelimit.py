@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# bench_ratelimit.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Simulated-clock harness for ratelimit.RateLimiter. A discrete-event loop
+# plays N workers against a fake server that enforces RPM/TPM over a strict
+# 60 s sliding window and answers 429 when a request would exceed it. Token
+# estimates are noisy (actual = estimate x U[lo, hi]) the way chars/4 is.
+#
+# For each policy it reports:
+#   • utilization  – accepted tokens / (TPM x simulated minutes)
+#   • 429s         – requests the server rejected
+#   • wall         – simulated seconds to finish all jobs
+#
+# "legacy" replays the old wait_quota_openai behaviour (re-sum the deque, sleep
+# once without re-checking, record usage only after the response).
+#
+# Usage:
+#   python src/bench_ratelimit.py --jobs 2000 --workers 16 --tpm 200000 --rpm 1000
+# --------------------------------------------
+
+import argparse
+import collections
+import heapq
+import random
+
+from ratelimit import RateLimiter, Reservation
+
+RETRY_AFTER_429 = 1.0
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SimServer:
+    """Strict sliding-window quota, the way the provider sees it."""
+
+    def __init__(self, rpm, tpm):
+        self.rpm, self.tpm = rpm, tpm
+        self.window = collections.deque()
+        self.used = 0
+        self.rejected = 0
+        self.accepted_tokens = 0
+
+    def admit(self, now, tokens):
+        while self.window and now - self.window[0][0] >= 60:
+            self.used -= self.window.popleft()[1]
+        if len(self.window) >= self.rpm or self.used + tokens > self.tpm:
+            self.rejected += 1
+            return False
+        self.window.append((now, tokens))
+        self.used += tokens
+        self.accepted_tokens += tokens
+        return True
+
+
+class LimiterPolicy:
+    def __init__(self, rpm, tpm, clock):
+        self.limiter = RateLimiter(rpm=rpm, tpm=tpm, clock=clock)
+        self.clock = clock
+
+    def before(self, est):
+        """(seconds to wait, None) to re-check later, or (0, reservation) to send now."""
+        res = self.limiter.try_acquire(est)
+        return (0.0, res) if isinstance(res, Reservation) else (res, None)
+
+    def recheck(self):
+        return True
+
+    def after(self, reservation, actual):
+        self.limiter.settle(reservation, actual)
+
+
+class LegacyPolicy:
+    def __init__(self, rpm, tpm, clock):
+        self.tpm = tpm
+        self.clock = clock
+        self.bucket = collections.deque()
+
+    def before(self, est):
+        now = self.clock()
+        while self.bucket and now - self.bucket[0][0] > 60:
+            self.bucket.popleft()
+        used = sum(t for _, t in self.bucket)
+        if used + est > self.tpm and self.bucket:
+            return 60 - (now - self.bucket[0][0]) + 0.2, None
+        return 0.0, None
+
+    def recheck(self):
+        return False          # the old code slept once and sent regardless
+
+    def after(self, reservation, actual):
+        self.bucket.append((self.clock(), actual))
+
+
+def simulate(policy_cls, args, seed=0):
+    rng = random.Random(seed)
+    clock = SimClock()
+    server = SimServer(args.rpm, args.tpm)
+    policy = policy_cls(args.rpm, args.tpm, clock)
+    jobs = [(est, int(est * rng.uniform(args.lo, args.hi)))
+            for est in (rng.randint(args.min_tok, args.max_tok) for _ in range(args.jobs))]
+    next_job = 0
+    events = []
+    seq = 0
+
+    def push(t, worker, phase, payload=None):
+        nonlocal seq
+        heapq.heappush(events, (t, seq, worker, phase, payload))
+        seq += 1
+
+    for w in range(args.workers):
+        if next_job < len(jobs):
+            push(0.0, w, "acquire", jobs[next_job]); next_job += 1
+
+    while events:
+        t, _, w, phase, job = heapq.heappop(events)
+        clock.now = t
+        res = None
+        if phase == "acquire":
+            wait, res = policy.before(job[0])
+            if wait > 0:
+                push(t + wait, w, "acquire" if policy.recheck() else "send", job)
+                continue
+            phase = "send"
+        if phase == "send":
+            est, actual = job
+            if not server.admit(t, actual):
+                push(t + RETRY_AFTER_429, w, "acquire", job)
+                continue
+            push(t + rng.uniform(args.latency * 0.5, args.latency * 1.5), w, "done", (job, res))
+        elif phase == "done":
+            (est, actual), res = job
+            policy.after(res, actual)
+            if next_job < len(jobs):
+                push(t, w, "acquire", jobs[next_job]); next_job += 1
+
+    minutes = max(clock.now, 1e-9) / 60
+    return {
+        "wall": clock.now,
+        "utilization": server.accepted_tokens / (args.tpm * minutes),
+        "rejected": server.rejected,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulated-clock utilization of the rate limiter")
+    ap.add_argument("--jobs", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--rpm", type=int, default=1000)
+    ap.add_argument("--tpm", type=int, default=200_000)
+    ap.add_argument("--min-tok", type=int, default=500)
+    ap.add_argument("--max-tok", type=int, default=4000)
+    ap.add_argument("--lo", type=float, default=0.6, help="actual/estimate lower bound")
+    ap.add_argument("--hi", type=float, default=1.2, help="actual/estimate upper bound")
+    ap.add_argument("--latency", type=float, default=5.0, help="mean response latency (s)")
+    args = ap.parse_args()
+
+    print(f"{args.jobs} jobs, {args.workers} workers, RPM {args.rpm}, TPM {args.tpm}")
+    print(f"{'policy':>8} {'wall (s)':>10} {'utilization':>12} {'429s':>6}")
+    for name, cls in (("legacy", LegacyPolicy), ("bucket", LimiterPolicy)):
+        r = simulate(cls, args)
+        print(f"{name:>8} {r['wall']:>10.1f} {r['utilization']:>12.1%} {r['rejected']:>6}")
+
+
+if __name__ == "__main__":
+    main()
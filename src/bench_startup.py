@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# bench_startup.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Startup-cost benchmark for the src/ entry points. For every command it runs
+#   • python -X importtime -c "import <command>" – total import time (sum of
+#     the per-module self times, minus whatever a bare interpreter already
+#     imports) and the heaviest third-party packages pulled in, by cumulative
+#     time
+#   • python src/<command>.py --help             – wall-clock, interpreter start
+#     included (argparse commands only)
+# each REPEATS times in a fresh interpreter, keeping the fastest run (warm
+# .pyc and disk cache). Importing a command should not load an SDK, pandas
+# or PIL, build a client or read data; those costs belong to the run.
+#
+# --save writes the numbers to a baseline file; later runs print the change
+# against it, so a regression in startup shows up as a positive delta.
+#
+# Usage:
+#   python src/bench_startup.py [COMMAND ...] [--repeats 5] [--save] [--baseline PATH]
+# --------------------------------------------
+
+import argparse
+import functools
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# ---------- CONFIG -------------------------------------------------------
+SRC_DIR   = Path(__file__).resolve().parent
+BASE_DIR  = SRC_DIR.parent
+BASELINE  = BASE_DIR / ".cache" / "startup.json"
+REPEATS   = 5
+TOP_N     = 3
+LOCAL     = {p.stem for p in SRC_DIR.glob("*.py")}
+COMMANDS  = [
+    "benchmarks", "benchmark_reasoning", "batch", "eval_curr_month", "eval_last_month", "eval_model",
+    "read_solution_text", "check_accuracy_llm", "check_accuracy_regex", "grade", "extract_correct",
+    "merge_correct_solutions", "scraper", "puzzle_store", "image_cache", "response_cache",
+    "results_log", "fake_provider",
+]
+
+
+def _importtime_lines(stderr: str):
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "self [us]" not in line:
+            self_us, cum_us, name = line[len("import time:"):].split("|")
+            yield int(self_us), int(cum_us), name.strip()
+
+
+def parse_importtime(stderr: str, skip=frozenset()):
+    """(total ms, {root package: cumulative ms}) from `-X importtime` output, ignoring `skip` modules."""
+    total_us, packages = 0, {}
+    for self_us, cum_us, name in _importtime_lines(stderr):
+        if name in skip:
+            continue
+        total_us += self_us
+        root = name.split(".")[0]
+        packages[root] = max(packages.get(root, 0), int(cum_us) / 1000)
+    return total_us / 1000, packages
+
+
+def _env():
+    import os
+    return {**os.environ, "PYTHONPATH": str(SRC_DIR)}
+
+
+def _importtime(code):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         capture_output=True, text=True, cwd=BASE_DIR, env=_env())
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return out.stderr
+
+
+@functools.cache
+def interpreter_modules():
+    """Modules a bare interpreter already imports (site, .pth hooks); not charged to any command."""
+    return frozenset(name for _, _, name in _importtime_lines(_importtime("pass")))
+
+
+def import_cost(command):
+    return parse_importtime(_importtime(f"import {command}"), interpreter_modules())
+
+
+def help_wall(command):
+    """Wall-clock ms of `<command>.py --help`, or None if the command has no argparse CLI."""
+    script = SRC_DIR / f"{command}.py"
+    if "argparse" not in script.read_text():
+        return None
+    t = time.perf_counter()
+    subprocess.run([sys.executable, str(script), "--help"], capture_output=True, cwd=BASE_DIR, env=_env())
+    return (time.perf_counter() - t) * 1000
+
+
+def measure(command, repeats):
+    best_ms, best_pkgs = None, {}
+    for _ in range(repeats):
+        ms, pkgs = import_cost(command)
+        if best_ms is None or ms < best_ms:
+            best_ms, best_pkgs = ms, pkgs
+    walls = [help_wall(command) for _ in range(repeats)]
+    heavy = sorted(((p, ms) for p, ms in best_pkgs.items() if p not in LOCAL and p != command),
+                   key=lambda kv: -kv[1])[:TOP_N]
+    return {"import_ms": round(best_ms, 1), "help_ms": None if walls[0] is None else round(min(walls), 1),
+            "heaviest": {p: round(ms, 1) for p, ms in heavy}}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Import-time / --help startup cost per command")
+    ap.add_argument("commands", nargs="*", default=COMMANDS)
+    ap.add_argument("--repeats", type=int, default=REPEATS)
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="store these numbers as the new baseline")
+    args = ap.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results = {}
+    print(f"{'command':<24} {'import':>9} {'Δ':>8} {'--help':>9}  heaviest imports")
+    for command in args.commands:
+        try:
+            r = results[command] = measure(command, args.repeats)
+        except RuntimeError as e:
+            print(f"{command:<24} [ERROR] {e}")
+            continue
+        base = baseline.get(command, {}).get("import_ms")
+        delta = f"{r['import_ms'] - base:+.1f}" if base is not None else "-"
+        help_ms = f"{r['help_ms']:.1f}" if r["help_ms"] is not None else "-"
+        heavy = ", ".join(f"{p} {ms:.0f}" for p, ms in r["heaviest"].items())
+        print(f"{command:<24} {r['import_ms']:>7.1f}ms {delta:>8} {help_ms:>7}ms  {heavy}")
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2))
+        print(f"\nSaved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
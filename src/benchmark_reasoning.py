@@ -5,229 +5,183 @@
 #   1. Populate .env with OPENAI_API_KEY, ANTHROPIC_API_KEY, GEMINI_API_KEY.
 #   2. (Optional) Test mode
 #   3. Run:
-#        python src/benchmark_reasoning.py
+#        python src/benchmark_reasoning.py [MODEL ...] [--stream] [--cache-only | --refresh | --no-cache]
 #
-# This will generate (in project_root/results/):
-#   - results_o4-mini.json
-#   - results_claude-3-opus-20240229.json
-#   - results_gemini-1.5-pro.json
+# This will generate (in project_root/results/) one results_{MODEL}.json per
+# model, e.g. results_o3-2025-04-16.json. While a run is in flight, answers
+# are appended to results_{MODEL}.jsonl (see results_log.py) and folded into
+# the JSON when it ends; an interrupted run replays that log on resume.
 #
-# Dependencies: openai, anthropic, google-generativeai, pandas, pillow, python-dotenv
+# Every attempt is timed into spans (queue, quota wait, encode, request,
+# retry sleep, persist) written to results/traces/run_*.jsonl; summarize them
+# with `python src/tracing.py summary`.
+#
+# Puzzles x attempts are fanned out through engine.Engine. Every provider gets
+# its own Engine (worker pool + RPM/TPM quota from providers.PROVIDER_LIMITS),
+# and all providers run at the same time, so wall-clock is roughly that of
+# the slowest provider. Models on the same provider share its quota.
+# To time a run offline, start src/fake_provider.py and point
+# OPENAI_BASE_URL / ANTHROPIC_BASE_URL at it.
+#
+# --stream streams every attempt (see streaming.py). The prompt then also asks
+# for the answer inside <answer>…</answer>, and reading stops at the closing
+# tag or after STREAM_TOKEN_CAP visible tokens. o-series models get
+# max_completion_tokens=REASONING_CAP. Each attempt also records ttft_sec,
+# latency_sec and stop ("tag" / "cap" / "end") next to its token counts.
+#
+# Prompts put the stable part first (system, image, text) and are marked for
+# provider prompt caching; all first attempts run before the second ones, and
+# cache hits / writes are stored as cached_tokens / cache_write_tokens (see
+# prompt_cache.py, whose `report` shows the cost and latency saved).
+#
+# Puzzle images are prepared per model by image_prep.py (cropped, sized to the
+# provider's tiles and image-token budget, palette PNG for line-art).
+#
+# Dependencies: openai, anthropic, google-generativeai, pillow, python-dotenv
 # --------------------------------------------
 
-import os
+import argparse
+import asyncio
 import base64
+import collections
 import io
 import json
-import pathlib
-import re
 import time
-import collections
 from datetime import datetime as dt
 from pathlib import Path
 
-import pandas as pd
-from dotenv import load_dotenv, find_dotenv
-from PIL import Image
+from clients import (get_client, safe_call_claude, safe_call_gemini, safe_call_openai,
+                     stream_claude, stream_gemini, stream_openai)
+from engine import Engine
+from image_prep import prepare as prepare_image
+from providers import PROVIDER_LIMITS, group_by_provider, is_reasoning_model
+from prompt_cache import cache_key, mark, split_usage
+from puzzle_store import default_store
+from ratelimit import RateLimiter
+from response_cache import add_cli_flags, apply_cli_flags, default_cache
+import results_log
+import retry
+import tracing
+from streaming import ANSWER_HINT, answer_of
+from token_estimate import estimate
 
 #  CONFIG 
 BASE            = Path(__file__).resolve().parent.parent
-CSV_PATH        = BASE / "data" / "puzzles" / "puzzles.csv"
 IMG_MAX_PX      = 600
 JPEG_Q          = 70
-RETRY_CUSHION   = 0.3
-
-PROVIDERS = [
-    "openai",      #  o4-mini-2025-04-16
-    # "anthropic",   #  claude-3-opus-20240229
-    # "gemini",      #  gemini-1.5-pro
-]
 
 # Testing without API calls, set TEST_MODE=1
 TEST_MODE = 0
 
-# MODEL CONFIG 
-MODEL_MAP = {
-    "openai":  "o3-2025-04-16" #"o3-2025-04-16",
-    # "anthropic": "claude-3-opus-20240229",
-    # "gemini":   "gemini-1.5-pro",
-}
-
-OUTFILE_MAP = {
-    "openai":    BASE / "results" / "results_o3-2025-04-16.json",
-    # "anthropic": BASE / "results" / "results_claude-3-opus-20240229.json",
-    # "gemini":    BASE / "results" / "results_gemini-1.5-pro.json",
-}
+# MODEL CONFIG: reasoning models run by default (override on the command line).
+# Providers run concurrently, each under its own providers.PROVIDER_LIMITS quota.
+MODELS = [
+    "o3-2025-04-16",
+    # "o4-mini-2025-04-16",
+    # "claude-3-opus-20240229",
+    # "gemini-1.5-pro",
+]
+RESULTS_DIR = BASE / "results"
 
 # Two temperature one for each run:
 ATTEMPTS = [0.25, 0.30]
 
-TPM_LIMIT   = 200_000  
-RPM_LIMIT   = 1000     
 COMPLETION_MAX = 200   
+STREAM_TOKEN_CAP = 64      # visible tokens read per streamed attempt; an answer-only reply fits easily
+REASONING_CAP    = 16_000  # max_completion_tokens (reasoning + answer) for o-series when streaming
 
-#  AUTH / CLIENT SETUP 
-load_dotenv(find_dotenv())
-
-# Preload the full puzzle df:
-df = pd.read_csv(CSV_PATH)
+SYSTEM_PROMPT = "You are an expert Jane Street puzzle solver. Return ONLY the final numeric or textual answer—no explanation."
 
 #  HELPERS 
-def jpeg_b64(path: pathlib.Path) -> str:
-    """Read an image, downsize to IMG_MAX_PX, and return a base64‐encoded JPEG."""
-    with Image.open(path) as im:
-        im = im.convert("RGB")
-        im.thumbnail((IMG_MAX_PX, IMG_MAX_PX))
-        buf = io.BytesIO()
-        im.save(buf, format="JPEG", quality=JPEG_Q)
-        return base64.b64encode(buf.getvalue()).decode()
+def system_prompt(stream=False):
+    """The solver instructions; streamed attempts also get the answer-tag request."""
+    return f"{SYSTEM_PROMPT} {ANSWER_HINT}" if stream else SYSTEM_PROMPT
 
 
-def build_msgs_openai(rec):
+def puzzle_rows():
+    """Puzzle rows in CSV order, from the compiled puzzle store (built on first use)."""
+    return default_store().rows()
+
+
+def puzzle_image_b64(rec):
+    """Pre-encoded puzzle image for a store row, or None."""
+    if not rec.get("hasImage", False) or not rec.get("imagePath"):
+        return None
+    return default_store().image_b64(rec["id"], IMG_MAX_PX, JPEG_Q)
+
+
+def puzzle_image(rec, provider, model=None):
+    """(b64, media type) of a store row's image prepared for `model` (image_prep), or None.
+
+    Without a model it is the stored IMG_MAX_PX JPEG the earlier results were run with.
+    """
+    if model is None:
+        b64 = puzzle_image_b64(rec)
+        return (b64, "image/jpeg") if b64 else None
+    if not rec.get("hasImage", False) or not rec.get("imagePath"):
+        return None
+    prepared = prepare_image(rec["imagePath"], provider, model)
+    return prepared["b64"], prepared["media_type"]
+
+
+def build_msgs_openai(rec, stream=False, model=None):
     """Construct OpenAI‐style chat message list."""
     text = rec["puzzleText"]
-    name = rec["name"]
     img_part = None
-    if rec.get("hasImage", False):
-        for ext in ("png","jpg","jpeg","PNG","JPG"):
-            p = BASE / "data" / "puzzles" / "puzzle_images" / name / f"0_0.{ext}"
-            if p.exists():
-                b64 = jpeg_b64(p)
-                img_part = {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
-                }
-                break
-
-    system = {"role": "system",
-              "content": "You are an expert Jane Street puzzle solver. Return ONLY the final numeric or textual answer—no explanation."}
-    user_parts = [{"type": "text", "text": text}]
-    if img_part:
-        user_parts.append(img_part)
+    image = puzzle_image(rec, "openai", model)
+    if image:
+        img_part = {
+            "type": "image_url",
+            "image_url": {"url": f"data:{image[1]};base64,{image[0]}"}
+        }
+
+    # stable part first (see prompt_cache): system, image, then the text
+    system = {"role": "system", "content": system_prompt(stream)}
+    user_parts = [img_part] if img_part else []
+    user_parts.append({"type": "text", "text": text})
 
     return [system, {"role": "user", "content": user_parts}]
 
 
-def build_msgs_anthropic(rec):
+def build_msgs_anthropic(rec, stream=False, model=None):
     """Construct Anthropic‐style (system_str, parts_list)."""
     text = rec["puzzleText"]
-    name = rec["name"]
     img_part = None
-    if rec.get("hasImage", False):
-        for ext in ("png","jpg","jpeg","PNG","JPG"):
-            p = BASE / "data" / "puzzles" / "puzzle_images" / name / f"0_0.{ext}"
-            if p.exists():
-                b64 = jpeg_b64(p)
-                img_part = {
-                    "type": "image",
-                    "source": {"type": "base64", "media_type": "image/jpeg", "data": b64}
-                }
-                break
-
-    system_txt = "You are an expert Jane Street puzzle solver. Return ONLY the final numeric or textual answer—no explanation."
-    parts = [{"type": "text", "text": text}]
-    if img_part:
-        parts.append(img_part)
-
-    return system_txt, parts
-
-
-def build_msgs_gemini(rec):
-    """Construct Gemini prompt: a list of strings/PIL.Image."""
+    image = puzzle_image(rec, "anthropic", model)
+    if image:
+        img_part = {
+            "type": "image",
+            "source": {"type": "base64", "media_type": image[1], "data": image[0]}
+        }
+
+    # image before text, and the whole prompt marked for Anthropic's prompt cache
+    system_txt = system_prompt(stream)
+    parts = [img_part] if img_part else []
+    parts.append({"type": "text", "text": text})
+
+    return system_txt, mark(parts)
+
+
+def build_msgs_gemini(rec, stream=False, model=None):
+    """Construct Gemini prompt: a list of strings/PIL.Image (the file as is without a model)."""
     text = rec["puzzleText"]
-    name = rec["name"]
     pil_img = None
-    if rec.get("hasImage", False):
-        for ext in ("png","jpg","jpeg","PNG","JPG"):
-            p = BASE / "data" / "puzzles" / "puzzle_images" / name / f"0_0.{ext}"
-            if p.exists():
-                pil_img = Image.open(p)
-                break
-
-    prompt = "You are an expert Jane Street puzzle solver. Return ONLY the final numeric or textual answer—no explanation.\n\n" + text
+    if rec.get("hasImage", False) and rec.get("imagePath"):
+        from PIL import Image
+        if model is None:
+            source = rec["imagePath"]
+        else:
+            source = io.BytesIO(base64.b64decode(puzzle_image(rec, "gemini", model)[0]))
+        with Image.open(source) as pil_img:
+            pil_img.load()          # read the pixels now so the file is closed, not held per prompt
+
+    prompt = system_prompt(stream) + "\n\n" + text
     if pil_img:
         return [prompt, pil_img]
     else:
         return [prompt]
 
 
-def rough_tokens_openai(messages):
-    """Estimate OpenAI tokens as roughly len(chars)/4 + 1."""
-    chars = 0
-    for m in messages:
-        c = m.get("content", "")
-        if isinstance(c, list):
-            for part in c:
-                text = part.get("text", "") or part.get("image_url", {}).get("url", "")
-                chars += len(text)
-        else:
-            if isinstance(c, str):
-                chars += len(c)
-    return chars // 4 + 1
-
-
-def wait_quota_openai(needed):
-    """Block until at least `needed` tokens are available under TPM_LIMIT."""
-    now = time.time()
-    while bucket and now - bucket[0][0] > 60:
-        bucket.popleft()
-    used = sum(tokens for _, tokens in bucket)
-    if used + needed > TPM_LIMIT:
-        time.sleep(60 - (now - bucket[0][0]) + 0.2)
-
-
-def wait_quota_requests(bucket, limit):
-    """Block until there's capacity under limit requests/minute."""
-    now = time.time()
-    while bucket and now - bucket[0] > 60:
-        bucket.popleft()
-    if len(bucket) >= limit:
-        time.sleep(60 - (now - bucket[0]) + 0.2)
-
-
-def safe_call_openai(client, **kw):
-    from openai import RateLimitError
-    while True:
-        try:
-            return client.chat.completions.create(**kw)
-        except RateLimitError as e:
-            m = re.search(r"in (\d+)ms", str(e))
-            wait = (int(m.group(1)) / 1000) if m else 1.0
-            time.sleep(wait + RETRY_CUSHION)
-
-
-def safe_call_claude(client, system_txt, parts, **kw):
-    import anthropic
-    while True:
-        try:
-            return client.messages.create(model=MODEL_MAP["anthropic"],
-                                          system=system_txt,
-                                          messages=[{"role": "user", "content": parts}],
-                                          **kw)
-        except anthropic.RateLimitError as e:
-            m = re.search(r"in (\d+)ms", str(e))
-            wait = (int(m.group(1)) / 1000) if m else 60.0
-            time.sleep(wait + RETRY_CUSHION)
-
-
-def safe_call_gemini(client, contents, **kw):
-    import google.generativeai as genai
-    generation_config = genai.types.GenerationConfig(
-        temperature=kw.get("temperature", 0.25),
-        max_output_tokens=kw.get("max_output_tokens", COMPLETION_MAX)
-    )
-    while True:
-        try:
-            return client.generate_content(contents=contents, generation_config=generation_config)
-        except Exception as e:
-            msg = str(e).lower()
-            if any(x in msg for x in ["rate limit", "quota", "429", "exhausted"]):
-                print(f"Gemini rate/quota hit; sleeping 60s…")
-                time.sleep(60 + RETRY_CUSHION)
-                continue
-            raise
-
-
 def needs_rerun(answers, attempt_no):
     """True if we have not yet stored a non‐empty answer for this attempt."""
     for a in answers:
@@ -236,158 +190,270 @@ def needs_rerun(answers, attempt_no):
     return True
 
 
-#  MAIN BENCHMARK LOOP 
-for PROVIDER in PROVIDERS:
-    print(f"\n=== Starting benchmark for {PROVIDER.upper()} ===")
-
-    MODEL = MODEL_MAP[PROVIDER]
-    OUT_PATH = OUTFILE_MAP[PROVIDER]
-
-    # Instantiate client and rate‐limit trackers
-    if PROVIDER == "openai":
-        from openai import OpenAI, RateLimitError
-        client = OpenAI()
-        bucket = collections.deque()
-    elif PROVIDER == "anthropic":
-        import anthropic
-        key = os.getenv("ANTHROPIC_API_KEY")
-        if not key:
-            raise RuntimeError("Missing ANTHROPIC_API_KEY in .env")
-        client = anthropic.Anthropic(api_key=key)
-        request_bucket = collections.deque()
-    else:  # PROVIDER == "gemini"
-        import google.generativeai as genai
-        key = os.getenv("GEMINI_API_KEY")
-        if not key:
-            raise RuntimeError("Missing GEMINI_API_KEY in .env")
-        genai.configure(api_key=key)
-        # client is already a model instance
-        client = genai.GenerativeModel(f"models/{MODEL}")
-        request_bucket = collections.deque()
-
-    # Load or initialize results
-    if OUT_PATH.exists():
-        results = json.loads(OUT_PATH.read_text())
+def result_path(model):
+    return RESULTS_DIR / f"results_{model}.json"
+
+
+def load_results(model):
+    """Last compacted results with the attempt log of an interrupted run replayed on top."""
+    return results_log.load(result_path(model))
+
+
+def record_entry(results, job, entry):
+    """Replace any existing entry for this attempt in a model's results dict."""
+    results_log.apply(results, job["pid"], job["name"], entry)
+
+
+def save_results(model, results):
+    """Compact: write results_{MODEL}.json and drop its attempt log."""
+    results_log.compact(result_path(model), results)
+
+
+def openai_kwargs(model, job):
+    """chat.completions.create arguments for one attempt.
+
+    Benchmark attempts send no sampling params, as they always have; sampling.py's jobs (they carry
+    "n") need their temperature, which o-series models do not take.
+    """
+    kwargs = {"model": model, "messages": job["prompt"], "prompt_cache_key": cache_key(model, job["pid"])}
+    if "n" in job and not is_reasoning_model(model):
+        kwargs.update({"temperature": job["temperature"], "max_tokens": COMPLETION_MAX})
+    elif job.get("stream"):
+        kwargs["max_completion_tokens"] = REASONING_CAP
+    return kwargs
+
+
+def make_entry(job, ans, usage, streamed=None, cache=None):
+    """Results‐file entry for one attempt; `usage` is (prompt, completion, total), `cache` (read, written)."""
+    entry = {
+        "attempt": job["attempt"],
+        "temperature": job["temperature"],
+        "answer": ans,
+        "prompt_tokens": usage[0],
+        "completion_tokens": usage[1],
+        "total_tokens": usage[2],
+    }
+    if cache and any(cache):
+        entry.update({"cached_tokens": cache[0], "cache_write_tokens": cache[1]})
+    if streamed is not None:
+        entry.update({"ttft_sec": None if streamed.ttft_sec is None else round(streamed.ttft_sec, 3),
+                      "latency_sec": round(streamed.latency_sec, 3),
+                      "stop": streamed.stop})
+    return entry
+
+
+def stream_attempt(provider, client, model, job, limiter=None):
+    """Streamed variant of `call_attempt`: stops at the answer tag / token cap and records timings."""
+    pid, idx, temp = job["pid"], job["attempt"], job["temperature"]
+    print(f"{dt.now().time()}  {model}  Puzzle {pid} attempt {idx} (streaming)")
+    if provider == "openai":
+        r = stream_openai(client, limiter=limiter, attempt=idx, max_stream_tokens=STREAM_TOKEN_CAP,
+                          **openai_kwargs(model, job))
+    elif provider == "anthropic":
+        system_txt, parts = job["prompt"]
+        r = stream_claude(client, model, system_txt, parts, limiter=limiter, attempt=idx,
+                          max_stream_tokens=STREAM_TOKEN_CAP, temperature=temp, max_tokens=COMPLETION_MAX)
     else:
-        results = {}
-
-    # Iterate over all puzzles
-    for _, row in df.iterrows():
+        r = stream_gemini(client, job["prompt"], attempt=idx, max_stream_tokens=STREAM_TOKEN_CAP,
+                          temperature=temp, max_output_tokens=COMPLETION_MAX)
+    return make_entry(job, answer_of(r.text), (r.prompt_tokens, r.completion_tokens, r.total_tokens), r,
+                      (r.cached_tokens, r.cache_write_tokens))
+
+
+def call_attempt(provider, client, model, job, limiter=None):
+    """Issue one attempt for `job` and return the results entry (runs in a worker thread)."""
+    if job.get("stream"):
+        return stream_attempt(provider, client, model, job, limiter)
+    pid, idx, temp = job["pid"], job["attempt"], job["temperature"]
+
+    if provider == "openai":
+        print(f"{dt.now().time()}  {model}  Puzzle {pid}  attempt {idx}")
+        resp = safe_call_openai(client=client, limiter=limiter, attempt=idx, **openai_kwargs(model, job))
+        ans   = resp.choices[0].message.content.strip()
+        usage, cache = split_usage(provider, resp.usage)
+
+    elif provider == "anthropic":
+        print(f"{dt.now().time()}  {model}  Puzzle {pid} attempt {idx} (Claude)")
+        system_txt, parts = job["prompt"]
+        resp = safe_call_claude(client,
+                                model,
+                                system_txt,
+                                parts,
+                                limiter=limiter,
+                                attempt=idx,
+                                temperature=temp,
+                                max_tokens=COMPLETION_MAX)
+        ans = resp.content[0].text.strip()
+        usage, cache = split_usage(provider, resp.usage)
+
+    else:  # provider == "gemini"
+        print(f"{dt.now().time()}  {model}  Puzzle {pid} attempt {idx} (Gemini)")
+        resp = safe_call_gemini(client,
+                                contents=job["prompt"],
+                                attempt=idx,
+                                temperature=temp,
+                                max_output_tokens=COMPLETION_MAX)
+        try:
+            ans = resp.text.strip()
+        except Exception:
+            ans = "ERROR: Cannot extract text"
+            if getattr(resp, "prompt_feedback", None):
+                bf = resp.prompt_feedback.block_reason or ""
+                ans += f" (Blocked: {bf})"
+            print(f"Warning: Puzzle {pid} attempt {idx} (Gemini) – couldn’t extract text")
+
+        meta = getattr(resp, "usage_metadata", None)
+        usage = (
+            getattr(meta, "prompt_token_count", 0),
+            getattr(meta, "candidates_token_count", 0),
+            getattr(meta, "total_token_count", 0),
+        )
+        cache = None
+
+    return make_entry(job, ans, usage, cache=cache)
+
+
+def stream_summary(entries):
+    """Median / p90 TTFT and latency and stop reasons of streamed attempt entries."""
+    def pct(values, q):
+        values = sorted(v for v in values if v is not None)
+        return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+    ttft = [e["ttft_sec"] for e in entries]
+    latency = [e["latency_sec"] for e in entries]
+    stops = collections.Counter(e["stop"] for e in entries)
+    return (f"TTFT p50 {pct(ttft, .5):.2f}s p90 {pct(ttft, .9):.2f}s, "
+            f"latency p50 {pct(latency, .5):.2f}s p90 {pct(latency, .9):.2f}s, "
+            f"stop: {', '.join(f'{k} {v}' for k, v in stops.most_common())}")
+
+
+def test_attempt(provider, job):
+    """TEST_MODE stand-in for `call_attempt`: no API call, fixed answer."""
+    print(f"{dt.now().time()}  [TEST_MODE] {job['model']} Puzzle {job['pid']} attempt {job['attempt']} ({provider})")
+    return make_entry(job, f"[{provider.upper()}‐TEST‐ANSWER]", (0, 0, 0))
+
+
+def build_prompt(provider, row, stream=False, model=None):
+    """Provider‐specific messages/prompt for one puzzle row, its image prepared for `model`."""
+    if provider == "openai":
+        return build_msgs_openai(row, stream, model)
+    if provider == "anthropic":
+        return build_msgs_anthropic(row, stream, model)
+    return build_msgs_gemini(row, stream, model)
+
+
+def build_jobs(provider, model, results, stream=False):
+    """One job per (puzzle, attempt) of `model` that still `needs_rerun`."""
+    jobs = []
+    for row in puzzle_rows():
         pid = str(int(row["id"]))
-        record = results.get(pid, {"name": row["name"], "answers": []})
-        answers = record["answers"]
+        answers = results.get(pid, {"answers": []})["answers"]
 
         # Skip if puzzleText missing or not a string
         if not isinstance(row.get("puzzleText"), str):
             continue
 
+        pending = [(idx, temp) for idx, temp in enumerate(ATTEMPTS, start=1)
+                   if needs_rerun(answers, idx)]
         # If all attempts done, skip
-        if pid in results and not any(needs_rerun(answers, i) for i in range(1, len(ATTEMPTS) + 1)):
+        if pid in results and not pending:
             continue
 
-        # Build provider‐specific messages/prompts
-        if PROVIDER == "openai":
-            msgs = build_msgs_openai(row)
-            try:
-                p_tok = rough_tokens_openai(msgs)
-            except:
-                print(f"Skipping {pid}: failed token estimate")
-                continue
-
-        elif PROVIDER == "anthropic":
-            system_txt, parts = build_msgs_anthropic(row)
-
-        else:  # PROVIDER == "gemini"
-            msgs = build_msgs_gemini(row)
-
-        # Loop over attempts
-        for idx, temp in enumerate(ATTEMPTS, start=1):
-            if not needs_rerun(answers, idx):
-                continue
-
-            # TEST_MODE short‐circuit
-            if TEST_MODE:
-                print(f"{dt.now().time()}  [TEST_MODE] Puzzle {pid} attempt {idx} ({PROVIDER})")
-                fake_ans = f"[{PROVIDER.upper()}‐TEST‐ANSWER]"
-                answers = [a for a in answers if a.get("attempt") != idx] + [{
-                    "attempt": idx,
-                    "temperature": temp,
-                    "answer": fake_ans,
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0
-                }]
-                results[pid] = {"name": row["name"], "answers": answers}
-                continue
-
-            # REAL API CALL MODE
-            if PROVIDER == "openai":
-                wait_quota_openai(p_tok)
-                print(f"{dt.now().time()}  Puzzle {pid}  attempt {idx}")
-                resp = safe_call_openai(
-                    client=client,
-                    model=MODEL,
-                    messages=msgs,
-                )
-                bucket.append((time.time(), resp.usage.total_tokens))
-                ans   = resp.choices[0].message.content.strip()
-                usage = (resp.usage.prompt_tokens, resp.usage.completion_tokens, resp.usage.total_tokens)
-
-
-            elif PROVIDER == "anthropic":
-                wait_quota_requests(request_bucket, RPM_LIMIT)
-                print(f"{dt.now().time()}  Puzzle {pid} attempt {idx} (Claude)")
-                resp = safe_call_claude(client,
-                                        system_txt,
-                                        parts,
-                                        temperature=temp,
-                                        max_tokens=COMPLETION_MAX)
-                request_bucket.append(time.time())
-                ans = resp.content[0].text.strip()
-                usage = (resp.usage.input_tokens,
-                         resp.usage.output_tokens,
-                         resp.usage.input_tokens + resp.usage.output_tokens)
-
-            else:  # PROVIDER == "gemini"
-                wait_quota_requests(request_bucket, RPM_LIMIT)
-                print(f"{dt.now().time()}  Puzzle {pid} attempt {idx} (Gemini)")
-                resp = safe_call_gemini(client,
-                                       contents=msgs,
-                                       temperature=temp,
-                                       max_output_tokens=COMPLETION_MAX)
-                request_bucket.append(time.time())
-
-                try:
-                    ans = resp.text.strip()
-                except Exception:
-                    ans = "ERROR: Cannot extract text"
-                    if getattr(resp, "prompt_feedback", None):
-                        bf = resp.prompt_feedback.block_reason or ""
-                        ans += f" (Blocked: {bf})"
-                    print(f"Warning: Puzzle {pid} attempt {idx} (Gemini) – couldn’t extract text")
-
-                meta = getattr(resp, "usage_metadata", None)
-                usage = (
-                    getattr(meta, "prompt_token_count", 0),
-                    getattr(meta, "candidates_token_count", 0),
-                    getattr(meta, "total_token_count", 0),
-                )
-
-            # Record the single attempt
-            entry = {
-                "attempt": idx,
-                "temperature": temp,
-                "answer": ans,
-                "prompt_tokens": usage[0],
-                "completion_tokens": usage[1],
-                "total_tokens": usage[2],
-            }
-            # Replace any existing attempt entry
-            answers = [a for a in answers if a.get("attempt") != idx] + [entry]
-            results[pid] = {"name": row["name"], "answers": answers}
-
-        # Write out incrementally
-        OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-        OUT_PATH.write_text(json.dumps(results, indent=2))
-
-    print(f"\n✓ Finished {PROVIDER.upper()} → wrote {OUT_PATH.name}")
+        # Build the prompt once, shared by all attempts (its time goes to the first one's trace)
+        built = time.monotonic()
+        prompt = build_prompt(provider, row, stream, model)
+        encode_sec = time.monotonic() - built
+        try:
+            tokens = estimate(provider, model, prompt, key=(pid, stream))
+        except Exception as e:
+            print(f"Skipping {pid}: failed token estimate ({e})")
+            continue
+
+        for idx, temp in pending:
+            jobs.append({"model": model, "pid": pid, "name": row["name"], "attempt": idx,
+                         "temperature": temp, "prompt": prompt, "tokens": tokens, "stream": stream,
+                         "encode_sec": encode_sec})
+            encode_sec = 0.0
+    return jobs
+
+
+async def run_provider(provider, models, stream=False, tracer=None):
+    """Benchmark every model of one provider through a single Engine (shared quota)."""
+    print(f"\n=== Starting benchmark for {provider.upper()}: {', '.join(models)} ===")
+
+    # Load or initialize results, one file per model
+    results = {model: load_results(model) for model in models}
+
+    # Prompt building encodes images; keep it off the loop so providers start together
+    jobs = await asyncio.to_thread(
+        lambda: [job for model in models for job in build_jobs(provider, model, results[model], stream)])
+    # Every first attempt before any second one, so later attempts find their prompt cached
+    jobs.sort(key=lambda job: job["attempt"])
+    limits = PROVIDER_LIMITS[provider]
+    # Cache-only runs never reach the provider, so there is no quota to respect
+    limiter = None if default_cache().mode == "cache-only" else RateLimiter(rpm=limits["rpm"], tpm=limits["tpm"])
+    if TEST_MODE:
+        call = lambda job: test_attempt(provider, job)
+    else:
+        call = lambda job: call_attempt(provider, get_client(provider, job["model"]), job["model"], job, limiter)
+
+    # Finished attempts are appended to results_{MODEL}.jsonl; the JSON is rewritten once at the end
+    logs = {model: results_log.ResultsLog(result_path(model)) for model in models}
+
+    timed = []
+
+    def record(job, entry):
+        record_entry(results[job["model"]], job, entry)
+        logs[job["model"]].append(job["pid"], job["name"], entry)
+        if "latency_sec" in entry:
+            timed.append(entry)
+
+    engine = Engine(provider, call, concurrency=limits["concurrency"], limiter=limiter, tracer=tracer)
+    try:
+        stats = await engine.run(jobs, record)
+    finally:
+        for model, log in logs.items():
+            log.close()
+            save_results(model, results[model])
+
+    print(f"\n✓ Finished {provider.upper()} → wrote {', '.join(result_path(m).name for m in models)}  "
+          f"({stats['requests']} requests, {stats['failed']} failed, "
+          f"{stats['elapsed']:.1f}s, {stats['rps']:.2f} req/s)")
+    if timed:
+        print(f"  streamed: {stream_summary(timed)}")
+    return stats
+
+
+async def run_models(models, stream=False, trace=True):
+    """Run every provider present in `models` at the same time."""
+    groups = group_by_provider(models)
+    start = time.monotonic()
+    tracer = tracing.TraceWriter() if trace else None
+    try:
+        await asyncio.gather(*(run_provider(p, ms, stream, tracer) for p, ms in groups.items()))
+    finally:
+        if tracer:
+            tracer.close()
+    cache = default_cache().stats
+    print(f"\nAll providers done in {time.monotonic() - start:.1f}s  "
+          f"(response cache: {cache['hits']} hits, {cache['misses']} misses)")
+    for line in retry.summary():
+        print(f"  retries  {line}")
+    if tracer and tracer.path.exists():
+        print(f"  timing spans → {tracer.path.relative_to(BASE)}  (python src/tracing.py summary)")
+
+
+#  MAIN 
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark reasoning models on every puzzle")
+    ap.add_argument("models", nargs="*", default=MODELS)
+    ap.add_argument("--stream", action="store_true",
+                    help="stream attempts, stop at the answer tag / token cap, record TTFT and latency")
+    ap.add_argument("--no-trace", action="store_true", help="don't write results/traces/run_*.jsonl")
+    add_cli_flags(ap)
+    args = ap.parse_args()
+    apply_cli_flags(args)
+    asyncio.run(run_models(args.models, args.stream, not args.no_trace))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,273 @@
 #!/usr/bin/env python
 # judge_all_models.py
 # --------------------------------------------
-# deps: openai, pandas, python-dotenv
+# deps: openai, python-dotenv
+#
+# LLM judge for every model in models.txt: compares each puzzle's answer in
+# results_{MODEL}.json against the ground truth and writes
+# correct_solutions_{MODEL}.json with a 0/1 "correct" flag per puzzle. A
+# "correct": 0.5 set there by hand (partial credit, see grade.py) is kept on
+# re-runs as long as the model's answer is unchanged.
+#
+# Judging is done in bulk rather than one request per puzzle:
+#   • (ground_truth, model_answer) pairs are collected across all models and
+#     deduplicated, so a pair that several models share is judged once;
+#   • BATCH_SIZE pairs are packed into one structured-output request that
+#     returns a verdict per item id;
+#   • batches run concurrently through engine.Engine under the OpenAI
+#     RPM/TPM quota (providers.PROVIDER_LIMITS), with no fixed pauses.
+# Items a batch fails to return are re-judged one per request; anything
+# still undecided is left out of the output and reported.
+#
+# Verdicts are kept in verdict_store (keyed by puzzle id, ground-truth hash,
+# answer hash and judge), so a re-run only judges the answers that are new or
+# changed since the last one; --regrade judges everything again.
+#
+# --samples judges every sample of samples_{MODEL}.json (sampling.py)
+# instead, through the same deduplicated, stored verdicts, and scores pass@k
+# and majority vote with check_accuracy_regex.score_samples into
+# passk_{MODEL}.json. Samples left without a verdict are left out of n.
+#
+# Usage:
+#   python src/check_accuracy_llm.py [--batch-size 25] [--regrade] [--samples [--k 1 4 8]]
+# --------------------------------------------
 
+import argparse
+import asyncio
 import json
 import time
 from pathlib import Path
 
-import pandas as pd
-from dotenv import load_dotenv
-from openai import OpenAI
+from clients import get_client, safe_call_openai
+from engine import Engine
+from providers import PROVIDER_LIMITS, read_models
+from puzzle_store import default_store
+from ratelimit import RateLimiter
+from token_estimate import estimate
+from verdict_store import default_verdicts, judge_id, verdict_key
 
 # ---------- CONFIG -------------------------------------------------------
-BASE = Path(__file__).resolve().parent.parent
-MODELS_FILE  = BASE / "models.txt"
-CSV_PATH     = BASE / "data" / "puzzles" / "puzzles.csv"
+BASE         = Path(__file__).resolve().parent.parent
 RESULTS_DIR  = BASE / "results"
-PAUSE_SEC    = 0.5                   # pause between LLM calls
 JUDGE_MODEL  = "gpt-4o-mini"         # model to use for judgment
+BATCH_SIZE   = 25                    # (ground_truth, answer) pairs per judge request
+TOKENS_PER_VERDICT = 16              # completion budget per item in a batch
 
-# ---------- AUTH ---------------------------------------------------------
-load_dotenv()
-client = OpenAI()
-
-# ---------- LOAD LIST OF MODELS ------------------------------------------
-with open(MODELS_FILE, "r") as f:
-    model_names = [line.strip() for line in f if line.strip()]
-
-# ---------- LOAD GROUND-TRUTH DATA --------------------------------------
-df = pd.read_csv(CSV_PATH)
-
-# ---------- HELPER: CALL JUDGE MODEL ------------------------------------
-def judge_answer(ground_truth: str, model_answer: str) -> int:
-    """
-    Ask the JUDGE_MODEL whether model_answer matches ground_truth.
-    Returns 1 if judged correct, 0 otherwise.
-    """
-    prompt = (
-        f"Ground truth answer: {ground_truth}\n"
-        f"Model answer: {model_answer}\n\n"
-        "Question: Is the model answer correct (or extremely close for numeric values)?\n"
-        "Reply with exactly '1' if correct, or '0' if incorrect."
-    )
-    resp = client.chat.completions.create(
-        model=JUDGE_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a judge that responds with 1 or 0."},
-            {"role": "user",   "content": prompt}
-        ],
-        temperature=0.0,
-        max_tokens=1
-    )
-    verdict = resp.choices[0].message.content.strip()
-    return 1 if verdict.startswith("1") else 0
-
-# ---------- MAIN LOOP ----------------------------------------------------
-for model_name in model_names:
-    results_path = RESULTS_DIR / f"results_{model_name}.json"
-    if not results_path.exists():
-        print(f"Skipping {model_name}: no results file at {results_path}")
-        continue
-
-    print(f"\nProcessing model: {model_name}")
-    results = json.loads(results_path.read_text())
-    output = {}
-
-    for pid_str, rec in results.items():
-        pid_int = int(pid_str)
-        csv_idx = pid_int
-        if csv_idx < 0 or csv_idx >= len(df):
-            continue
+SYSTEM_PROMPT = (
+    "You are a judge. You are given a JSON list of items. For every item, decide whether the model answer is correct "
+    "(or extremely close for numeric values) given the ground truth answer. "
+    "Return one verdict per item id: 1 if correct, 0 if incorrect."
+)
+
+VERDICT_SCHEMA = {
+    "name": "verdicts",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "verdicts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"},
+                                   "correct": {"type": "integer", "enum": [0, 1]}},
+                    "required": ["id", "correct"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["verdicts"],
+        "additionalProperties": False,
+    },
+}
 
-        row = df.iloc[csv_idx]
-        truth = str(row["answer"]).strip()
-        if truth == "" or pd.isna(row["answer"]):
-            continue
 
-        answers_list = rec.get("answers", [])
-        ans0 = answers_list[0]["answer"] if len(answers_list) >= 1 else ""
-        ans1 = answers_list[1]["answer"] if len(answers_list) >= 2 else ""
-        model_answer = ans0.strip() or ans1.strip()
-        if not model_answer:
+# ---------- COLLECT PAIRS ------------------------------------------------
+def collect(model_names, store):
+    """Per-model output rows (without verdicts) and the set of unique (truth, answer) pairs."""
+    per_model, pairs = {}, {}
+    for model_name in model_names:
+        results_path = RESULTS_DIR / f"results_{model_name}.json"
+        if not results_path.exists():
+            print(f"Skipping {model_name}: no results file at {results_path}")
             continue
+        rows = []
+        for pid_str, rec in json.loads(results_path.read_text()).items():
+            row = store.get(int(pid_str))
+            if row is None or row["answer"] is None:
+                continue
+            truth = str(row["answer"]).strip()
+            if truth == "":
+                continue
+
+            answers_list = rec.get("answers", [])
+            ans0 = answers_list[0]["answer"] if len(answers_list) >= 1 else ""
+            ans1 = answers_list[1]["answer"] if len(answers_list) >= 2 else ""
+            model_answer = ans0.strip() or ans1.strip()
+            if not model_answer:
+                continue
+
+            entry = {
+                "name":         rec.get("name", row["name"]),
+                "ground_truth": truth,
+                "model_answer": model_answer,
+            }
+            if row.get("numSolvers") is not None:
+                entry["numSolvers"] = int(row["numSolvers"])
+            rows.append((pid_str, entry))
+            pairs.setdefault((truth, model_answer), None)
+        per_model[model_name] = rows
+    return per_model, list(pairs)
+
+
+# ---------- JUDGE --------------------------------------------------------
+def judge_messages(batch):
+    items = [{"id": i, "ground_truth": truth, "model_answer": answer}
+             for i, (truth, answer) in enumerate(batch)]
+    return [{"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": json.dumps(items, ensure_ascii=False, indent=1)}]
+
+
+def make_job(batch, n):
+    messages = judge_messages(batch)
+    max_tokens = 20 + TOKENS_PER_VERDICT * len(batch)
+    return {"label": f"judge batch {n} ({len(batch)} pairs)", "pairs": batch, "messages": messages,
+            "max_tokens": max_tokens, "tokens": estimate("openai", JUDGE_MODEL, messages) + max_tokens}
+
+
+def judge_batch(client, limiter, job):
+    """One judge request; returns {"verdicts": {pair: 0/1}, "total_tokens": n} (runs in a worker thread)."""
+    resp = safe_call_openai(client=client, limiter=limiter, model=JUDGE_MODEL,
+                            messages=job["messages"], temperature=0.0, max_tokens=job["max_tokens"],
+                            response_format={"type": "json_schema", "json_schema": VERDICT_SCHEMA})
+    verdicts = {}
+    try:
+        for v in json.loads(resp.choices[0].message.content)["verdicts"]:
+            if 0 <= v["id"] < len(job["pairs"]):
+                verdicts[job["pairs"][v["id"]]] = 1 if v["correct"] == 1 else 0
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"[WARN] {job['label']}: unparseable verdicts ({e})")
+    return {"verdicts": verdicts, "total_tokens": resp.usage.total_tokens if resp.usage else None}
+
+
+async def judge_all(pairs, batch_size=BATCH_SIZE):
+    """{(truth, answer): 0/1} for every pair the judge returned a verdict for."""
+    limits = PROVIDER_LIMITS["openai"]
+    limiter = RateLimiter(rpm=limits["rpm"], tpm=limits["tpm"])
+    client = get_client("openai")
+    verdicts = {}
 
-        correct_flag = judge_answer(truth, model_answer)
+    def record(job, entry):
+        verdicts.update(entry["verdicts"])
 
-        entry = {
-            "name":         rec.get("name", row["name"]),
-            "ground_truth": truth,
-            "model_answer": model_answer,
-            "correct":      correct_flag,
-        }
-        if "numSolvers" in df.columns and not pd.isna(row.get("numSolvers", None)):
-            entry["numSolvers"] = int(row["numSolvers"])
-        output[pid_str] = entry
+    engine = Engine("judge", lambda job: judge_batch(client, limiter, job),
+                    concurrency=limits["concurrency"], limiter=limiter)
+    todo = pairs
+    for size in (batch_size, 1):           # second pass: whatever a batch dropped, one per request
+        if not todo:
+            break
+        jobs = [make_job(todo[i:i + size], n) for n, i in enumerate(range(0, len(todo), size))]
+        stats = await engine.run(jobs, record)
+        print(f"Judged {len(todo)} pairs in {len(jobs)} requests "
+              f"({stats['failed']} failed, {stats['elapsed']:.1f}s)")
+        todo = [p for p in todo if p not in verdicts]
+    if todo:
+        print(f"[WARN] no verdict for {len(todo)} pairs; they are left out of the output")
+    return verdicts
 
-        time.sleep(PAUSE_SEC)
 
+async def judge_incremental(items, batch_size=BATCH_SIZE, regrade=False, stored_only=False):
+    """{(truth, answer): 0/1} for [(puzzle id, truth, answer)], judging only keys with no stored verdict."""
+    store = default_verdicts()
+    judge = judge_id(JUDGE_MODEL, SYSTEM_PROMPT)
+    keyed = {verdict_key(pid, truth, answer, judge): (truth, answer) for pid, truth, answer in items}
+    stored = {} if regrade else store.lookup(keyed)
+    verdicts = {keyed[k]: v for k, v in stored.items()}
+    # a pair already judged for another puzzle id needs no second request
+    pending = list(dict.fromkeys(p for k, p in keyed.items() if k not in stored and p not in verdicts))
+    print(f"{len(keyed)} answers: {len(stored)} stored verdicts, {len(pending)} new or changed pairs to judge")
+    if pending and not stored_only:
+        verdicts.update(await judge_all(pending, batch_size))
+    store.put_many((k, verdicts[p]) for k, p in keyed.items() if k not in stored and p in verdicts)
+    return verdicts
+
+
+def write_model(model_name, rows, verdicts):
+    """Write correct_solutions_{MODEL}.json from collected rows; returns (path, pairs left undecided)."""
     out_path = RESULTS_DIR / f"correct_solutions_{model_name}.json"
+    old = json.loads(out_path.read_text()) if out_path.exists() else {}
+    output, undecided = {}, 0
+    for pid_str, entry in rows:
+        verdict = verdicts.get((entry["ground_truth"], entry["model_answer"]))
+        if verdict is None:
+            undecided += 1
+            continue
+        marked = old.get(pid_str, {})
+        if not verdict and marked.get("correct") == 0.5 and marked.get("model_answer") == entry["model_answer"]:
+            verdict = 0.5                     # hand-given partial credit
+        output[pid_str] = {**entry, "correct": verdict}
+        if "numSolvers" in entry:             # keep the original key order
+            output[pid_str]["numSolvers"] = output[pid_str].pop("numSolvers")
+
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(json.dumps(output, indent=2))
     print(f"Wrote {out_path.name} with {len(output)} entries")
+    return out_path, undecided
+
+
+def judge_samples(model_names, store, ks, batch_size=BATCH_SIZE, regrade=False):
+    """Judge every sample of samples_{MODEL}.json and write passk_{MODEL}.json per model."""
+    from check_accuracy_regex import samples_frame, score_samples, report_samples, truth_table
+    from sampling import load_samples, samples_path
+    loaded = {}
+    for model_name in model_names:
+        if samples_path(model_name).exists() or samples_path(model_name).with_suffix(".jsonl").exists():
+            loaded[model_name] = load_samples(model_name)
+        else:
+            print(f"Skipping {model_name}: no samples file at {samples_path(model_name)}")
+    df = samples_frame(loaded).join(truth_table(store), on="pid", how="inner")
+    df["name"] = df["name"].fillna(df["truth_name"])
+    given = df[df["answer"] != ""]
+    items = list(dict.fromkeys(zip(given["pid_str"], given["truth"], given["answer"])))
+    print(f"{len(df)} samples across {len(loaded)} models → {len(items)} distinct answers")
+    verdicts = asyncio.run(judge_incremental(items, batch_size, regrade)) if items else {}
+
+    ok = [0 if a == "" else verdicts.get((t, a)) for t, a in zip(df["truth"], df["answer"])]
+    df["ok"] = [v == 1 for v in ok]
+    undecided = [v is None for v in ok]
+    if any(undecided):
+        print(f"[WARN] no verdict for {sum(undecided)} samples; they are left out of n")
+    scores = score_samples(df[[not u for u in undecided]], ks)
+    for model_name in loaded:
+        report_samples(model_name, scores[scores["model"] == model_name], f"passk_{model_name}.json", ks)
+
+
+# ---------- MAIN ---------------------------------------------------------
+def main():
+    ap = argparse.ArgumentParser(description="Judge every model's answers with an LLM")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--regrade", action="store_true", help="ignore stored verdicts and judge every pair again")
+    ap.add_argument("--samples", action="store_true",
+                    help="judge samples_{MODEL}.json: pass@k and majority vote → passk_{MODEL}.json")
+    ap.add_argument("--k", type=int, nargs="+", default=None, help="pass@k values to report (default 1 2 4 … 32)")
+    args = ap.parse_args()
+
+    start = time.monotonic()
+    if args.samples:
+        from check_accuracy_regex import PASS_K
+        judge_samples(read_models(), default_store(), args.k or PASS_K, args.batch_size, args.regrade)
+        print(f"Done in {time.monotonic() - start:.1f}s")
+        return
+    per_model, pairs = collect(read_models(), default_store())
+    total = sum(len(rows) for rows in per_model.values())
+    print(f"{total} answers across {len(per_model)} models → {len(pairs)} unique pairs")
+    items = [(pid, e["ground_truth"], e["model_answer"]) for rows in per_model.values() for pid, e in rows]
+    verdicts = asyncio.run(judge_incremental(items, args.batch_size, args.regrade))
+
+    for model_name, rows in per_model.items():
+        write_model(model_name, rows, verdicts)
+    print(f"Done in {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
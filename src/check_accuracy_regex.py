@@ -8,31 +8,61 @@
 # (shifting JSON key “0” → CSV ID 1), and writes correct_solutions_regex_{MODEL}.json
 # containing only those puzzles judged correct. A console summary is printed per model.
 #
+# Grading is columnar: all results files are loaded into one frame (one row
+# per model × puzzle, both attempts as columns) and joined to a truth table
+# in which every ground-truth answer is normalized once. Each distinct
+# answer string is normalized once as well (`canonical` is memoized), so the
+# first-attempt / best-of-two flags for every model come out of one pass.
+# bench_grading.py times this on a synthetic 100k-answer set.
+#
+# --samples grades the k samples per puzzle of samples_{MODEL}.json
+# (sampling.py) the same way, in long form (one row per model × puzzle ×
+# sample), and scores every puzzle at once:
+#   • pass@k – the unbiased estimator 1 − C(n−c, k) / C(n, k) for n samples
+#     of which c are correct (Chen et al., 2021), looked up from a table of
+#     exact binomials rather than computed row by row;
+#   • majority vote – the answer agreeing with the most samples (answers
+#     agree when their normalized forms intersect, as in grading). Its
+#     accuracy over k sampled chains is the self-consistency accuracy, and
+#     "agreement" is the share of samples that back it.
+# Per-puzzle scores go to passk_regex_{MODEL}.json.
+#
 # Usage:
 #   1. Put your list of model names (one per line) in ${PROJECT_ROOT}/models.txt.
 #   2. Make sure each results_{MODEL}.json already exists under results/.
 #   3. Run:
-#        python check_accuracy.py
+#        python check_accuracy.py [--samples [--k 1 4 8]]
 # --------------------------------------------
 
+from __future__ import annotations
+
+import argparse
+import functools
 import json
+import math
 import re
 import sys
 import unicodedata
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import pandas as pd
+from puzzle_store import PuzzleStore, default_store
+
+if TYPE_CHECKING:
+    import pandas as pd      # imported where used: answers_match callers (grade.py) never need it
 
 # ── CONFIG ────────────────────────────────────────────────────────────────
 BASE_DIR     = Path(__file__).resolve().parent.parent
 MODELS_FILE  = BASE_DIR / "models.txt"
 RESULTS_DIR  = BASE_DIR / "results"
-DATA_CSV     = BASE_DIR / "data" / "puzzles" / "puzzles.csv"
+PASS_K       = (1, 2, 4, 8, 16, 32)     # pass@k reported for every k up to the samples per puzzle
 
 _num_re   = re.compile(r"[-+]?\d+(?:,\d{3})*(?:\.\d+)?(?:\.\d+)?")
 _frac_re  = re.compile(r"\d+/\d+")
 _caps_re  = re.compile(r"\b[A-Z]{2,}\b")
 _pi_re    = re.compile(r"[πpi]+", re.IGNORECASE)
+_wrap_re  = re.compile(r"\\\(|\\\)|\$\$|\$|\\\[|\\\]")
+_word_re  = re.compile(r"[^\w]")
 
 def grab_token(s: str) -> str:
     s = s.strip()
@@ -44,7 +74,7 @@ def grab_token(s: str) -> str:
 
 def normalize(s: str) -> set[str]:
     s = unicodedata.normalize("NFKC", s).strip()
-    s = re.sub(r"\\\(|\\\)|\$\$|\$|\\\[|\\\]", "", s).strip()
+    s = _wrap_re.sub("", s).strip()
 
     if _pi_re.fullmatch(s):
         return {"π", str(3.141592653589793)[:9]}
@@ -65,79 +95,104 @@ def normalize(s: str) -> set[str]:
         float_str = str(f).rstrip("0").rstrip(".")
         return {int_str, float_str}
 
-    clean = re.sub(r"[^\w]", "", token)
+    clean = _word_re.sub("", token)
     return {clean}
 
+@functools.lru_cache(maxsize=1 << 16)
+def canonical(s: str) -> frozenset:
+    """Memoized `normalize`: each distinct answer string is normalized once per process."""
+    return frozenset(normalize(s))
+
 def answers_match(model_ans: str, truth: str) -> bool:
-    set1 = normalize(model_ans)
-    set2 = normalize(truth)
-    return not set1.isdisjoint(set2)
+    return not canonical(model_ans).isdisjoint(canonical(truth))
 
-def process_model(model_name: str, gt_df: pd.DataFrame):
+def truth_table(store: PuzzleStore) -> pd.DataFrame:
+    """Ground truth indexed by puzzle id, with each answer normalized once."""
+    import pandas as pd
+    rows = [r for r in store.rows() if r["answer"] is not None and str(r["answer"]).strip() != ""]
+    table = pd.DataFrame({
+        "truth":      [str(r["answer"]).strip() for r in rows],
+        "truth_name": [r["name"] for r in rows],
+        "numSolvers": [r.get("numSolvers") for r in rows],
+    }, index=pd.Index([int(r["id"]) for r in rows], name="pid"))
+    table["truth_norm"] = [canonical(t) for t in table["truth"]]
+    return table
+
+def load_results(model_name: str):
+    """results_{MODEL}.json, or None (with a message) if missing or unreadable."""
     results_path = RESULTS_DIR / f"results_{model_name}.json"
     if not results_path.exists():
         print(f"[SKIP] results_{model_name}.json not found in {RESULTS_DIR}", file=sys.stderr)
-        return
-
+        return None
     with open(results_path, "r") as f:
         try:
-            results = json.load(f)
+            return json.load(f)
         except json.JSONDecodeError as e:
             print(f"[ERROR] Failed to parse {results_path}: {e}", file=sys.stderr)
-            return
+            return None
 
-    total = 0
-    first_correct = 0
-    best_correct  = 0
-    correct_first = []
-    correct_best  = []
-    output = {}
+def results_frame(results_by_model: dict) -> pd.DataFrame:
+    """One row per (model, puzzle) in results order; the first two attempts as columns."""
+    import pandas as pd
+    cols = {"model": [], "pid_str": [], "pid": [], "name": [], "ans0": [], "ans1": []}
+    for model_name, results in results_by_model.items():
+        for pid_str, rec in results.items():
+            try:
+                pid_int = int(pid_str)
+            except ValueError:
+                continue
+            answers = rec.get("answers", [])
+            cols["model"].append(model_name)
+            cols["pid_str"].append(pid_str)
+            cols["pid"].append(pid_int)
+            cols["name"].append(rec.get("name"))
+            cols["ans0"].append(answers[0].get("answer", "").strip() if len(answers) >= 1 else "")
+            cols["ans1"].append(answers[1].get("answer", "").strip() if len(answers) >= 2 else "")
+    return pd.DataFrame(cols)
 
-    for pid_str, rec in results.items():
-        try:
-            pid_int = int(pid_str)
-        except ValueError:
-            continue
-
-        if pid_int not in gt_df.index:
-            continue
-
-        truth = str(gt_df.at[pid_int, "answer"]).strip()
-        if truth == "" or pd.isna(gt_df.at[pid_int, "answer"]):
-            continue
-
-        total += 1
-        name = rec.get("name", gt_df.at[pid_int, "name"])
-        answers = rec.get("answers", [])
-
-        ans0 = answers[0].get("answer", "").strip() if len(answers) >= 1 else ""
-        ans1 = answers[1].get("answer", "").strip() if len(answers) >= 2 else ""
-
-        first_ok = answers_match(ans0, truth)
-        best_ok  = first_ok or answers_match(ans1, truth)
-
-        if first_ok:
-            first_correct += 1
-            correct_first.append((pid_int, name))
-        if best_ok:
-            best_correct += 1
-            correct_best.append((pid_int, name))
-            chosen_ans = ans0 if first_ok else ans1
-            entry = {
-                "name":         name,
-                "ground_truth": truth,
-                "model_answer": chosen_ans,
-            }
-            if "numSolvers" in gt_df.columns:
-                ns = gt_df.at[pid_int, "numSolvers"]
-                if pd.notna(ns):
-                    entry["numSolvers"] = int(ns)
-            output[pid_str] = entry
+def _matches(answers: pd.Series, truth_norm: pd.Series) -> pd.Series:
+    import pandas as pd
+    # Normalize each distinct answer once, then test every row against its puzzle's truth set
+    codes, uniques = pd.factorize(answers)
+    norms = [canonical(u) for u in uniques]
+    return pd.Series([not norms[c].isdisjoint(t) for c, t in zip(codes, truth_norm)],
+                     index=answers.index, dtype=bool)
+
+def grade(frame: pd.DataFrame, truths: pd.DataFrame) -> pd.DataFrame:
+    """Add first_ok / best_ok / chosen columns; rows without a ground truth are dropped."""
+    df = frame.join(truths, on="pid", how="inner")
+    df["name"] = df["name"].fillna(df["truth_name"])
+    df["first_ok"] = _matches(df["ans0"], df["truth_norm"])
+    df["best_ok"] = df["first_ok"] | _matches(df["ans1"], df["truth_norm"])
+    df["chosen"] = df["ans0"].where(df["first_ok"], df["ans1"])
+    return df
+
+def report_model(model_name: str, df: pd.DataFrame, verbose: bool = True):
+    """Write correct_solutions_regex_{MODEL}.json (and print the accuracy report unless not `verbose`)."""
+    import pandas as pd
+    total = len(df)
+    first_correct = int(df["first_ok"].sum())
+    best_correct  = int(df["best_ok"].sum())
+    correct_first = list(zip(df.loc[df["first_ok"], "pid"], df.loc[df["first_ok"], "name"]))
+    correct_best  = list(zip(df.loc[df["best_ok"], "pid"], df.loc[df["best_ok"], "name"]))
+
+    output = {}
+    for r in df[df["best_ok"]].itertuples():
+        entry = {
+            "name":         r.name,
+            "ground_truth": r.truth,
+            "model_answer": r.chosen,
+        }
+        if pd.notna(r.numSolvers):
+            entry["numSolvers"] = int(r.numSolvers)
+        output[r.pid_str] = entry
 
     out_path = RESULTS_DIR / f"correct_solutions_regex_{model_name}.json"
     out_path.parent.mkdir(parents=True, exist_ok=True)
     with open(out_path, "w") as outf:
         json.dump(output, outf, indent=2)
+    if not verbose:
+        return out_path
 
     print(f"\nMODEL = {model_name}")
     print(f"Puzzles with ground‐truth answers: {total}")
@@ -162,21 +217,161 @@ def process_model(model_name: str, gt_df: pd.DataFrame):
         print("  (none)")
 
     print(f"\nWrote {out_path.name} with {len(output)} correct entries.")
+    return out_path
+
+# ── k SAMPLES PER PUZZLE ──────────────────────────────────────────────────
+def samples_frame(samples_by_model: dict) -> pd.DataFrame:
+    """One row per (model, puzzle, sample) of samples_{MODEL}.json; missing samples are left out."""
+    import pandas as pd
+    cols = {"model": [], "pid_str": [], "pid": [], "name": [], "sample": [], "answer": []}
+    for model_name, samples in samples_by_model.items():
+        for pid_str, rec in samples.items():
+            if not pid_str.isdigit():
+                continue
+            for i, a in enumerate(rec.get("answers", []), start=1):
+                if a is None:
+                    continue
+                cols["model"].append(model_name)
+                cols["pid_str"].append(pid_str)
+                cols["pid"].append(int(pid_str))
+                cols["name"].append(rec.get("name"))
+                cols["sample"].append(i)
+                cols["answer"].append(a.strip())
+    return pd.DataFrame(cols)
+
+def grade_samples(frame: pd.DataFrame, truths: pd.DataFrame) -> pd.DataFrame:
+    """Add an `ok` column to a samples frame; rows without a ground truth are dropped."""
+    df = frame.join(truths, on="pid", how="inner")
+    df["name"] = df["name"].fillna(df["truth_name"])
+    df["ok"] = _matches(df["answer"], df["truth_norm"]) & (df["answer"] != "")
+    return df
+
+def pass_at_k(n, c, k: int):
+    """Unbiased pass@k for arrays of sample counts `n` and correct counts `c` (NaN where n < k)."""
+    import numpy as np
+    n, c = np.asarray(n, dtype=int), np.asarray(c, dtype=int)
+    top = int(n.max()) if n.size else 0
+    table = np.full((top + 1, top + 1), np.nan)
+    for nn in range(k, top + 1):
+        for cc in range(nn + 1):
+            table[nn, cc] = 1.0 - math.comb(nn - cc, k) / math.comb(nn, k)
+    return table[n, c]
+
+def score_samples(df: pd.DataFrame, ks=PASS_K) -> pd.DataFrame:
+    """Per (model, puzzle): samples n, correct c, pass@k for each k, and the majority vote.
+
+    `df` is a graded samples frame (an `ok` per sample); the majority-vote
+    columns are majority_answer, majority_ok and agreement.
+    """
+    import numpy as np
+    keys = ["model", "pid"]
+    per = df.groupby(keys, sort=False).agg(
+        pid_str=("pid_str", "first"), name=("name", "first"), truth=("truth", "first"),
+        numSolvers=("numSolvers", "first"), n=("ok", "size"), correct=("ok", "sum"))
+    for k in ks:
+        per[f"pass@{k}"] = pass_at_k(per["n"], per["correct"], k)
+
+    # Votes: samples grouped by normalized answer, then each group's support is
+    # every sample whose normalized form intersects it
+    given = df[df["answer"] != ""]
+    votes = (given.assign(vote=given["answer"].map(canonical))
+             .groupby(keys + ["vote"], sort=False)
+             .agg(count=("ok", "size"), ok=("ok", "max"), answer=("answer", "first")))
+    majority = {}
+    for key, grp in votes.groupby(level=[0, 1], sort=False):
+        forms = grp.index.get_level_values(2)
+        counts = grp["count"].to_numpy()
+        support = [sum(c for t, c in zip(forms, counts) if not f.isdisjoint(t)) for f in forms]
+        best = int(np.argmax(support))
+        majority[key] = (grp["answer"].iat[best], bool(grp["ok"].iat[best]), support[best])
+    won = [majority.get(key, ("", False, 0)) for key in per.index]
+    per["majority_answer"] = [w[0] for w in won]
+    per["majority_ok"] = [w[1] for w in won]
+    per["agreement"] = [w[2] for w in won] / per["n"]
+    return per.reset_index()
+
+def report_samples(model_name: str, per: pd.DataFrame, out_name: str, ks=PASS_K, verbose: bool = True):
+    """Write per-puzzle pass@k / majority-vote scores to `out_name` and print the model summary."""
+    import pandas as pd
+    ks = [k for k in ks if f"pass@{k}" in per and per[f"pass@{k}"].notna().any()]
+    output = {}
+    for r in per.to_dict("records"):
+        entry = {"name": r["name"], "ground_truth": r["truth"], "samples": int(r["n"]),
+                 "correct": int(r["correct"])}
+        entry.update({f"pass@{k}": round(float(r[f"pass@{k}"]), 4) for k in ks if k <= r["n"]})
+        entry.update({"majority_answer": r["majority_answer"], "majority_correct": int(r["majority_ok"]),
+                      "agreement": round(float(r["agreement"]), 4)})
+        if pd.notna(r["numSolvers"]):
+            entry["numSolvers"] = int(r["numSolvers"])
+        output[r["pid_str"]] = entry
+
+    out_path = RESULTS_DIR / out_name
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as outf:
+        json.dump(output, outf, indent=2)
+    if not verbose:
+        return out_path
+
+    total = len(per)
+    print(f"\nMODEL = {model_name}")
+    if total == 0:
+        print(" (No sampled puzzles had a ground-truth answer.)")
+        return out_path
+    print(f"Puzzles with ground‐truth answers: {total}, "
+          f"{per['n'].mean():.1f} samples each (min {per['n'].min()}, max {per['n'].max()})")
+    for k in ks:
+        col = per[f"pass@{k}"]
+        note = f"  ({col.notna().sum()} puzzles with ≥{k} samples)" if col.isna().any() else ""
+        print(f" • pass@{k:<3} {col.mean():.2%}{note}")
+    maj = int(per["majority_ok"].sum())
+    print(f" • Majority vote (self-consistency): {maj}/{total} = {maj/total:.2%}")
+    print(f" • Mean agreement with the majority answer: {per['agreement'].mean():.2%}")
+    print(f"\nWrote {out_path.name} with {len(output)} entries.")
+    return out_path
+
+def process_model(model_name: str, store: PuzzleStore):
+    results = load_results(model_name)
+    if results is None:
+        return
+    report_model(model_name, grade(results_frame({model_name: results}), truth_table(store)))
 
 def main():
+    ap = argparse.ArgumentParser(description="Regex grading of every model in models.txt")
+    ap.add_argument("--samples", action="store_true",
+                    help="grade samples_{MODEL}.json: pass@k and majority vote → passk_regex_{MODEL}.json")
+    ap.add_argument("--k", type=int, nargs="+", default=list(PASS_K), help="pass@k values to report")
+    args = ap.parse_args()
+
     if not MODELS_FILE.exists():
         print(f"[ERROR] models.txt not found at {MODELS_FILE}", file=sys.stderr)
         sys.exit(1)
 
-    # Load ground truth CSV, index by puzzle ID (1..N)
-    gt_df = pd.read_csv(DATA_CSV).set_index("id")
+    # Ground truth, addressed by puzzle ID and normalized once for every model
+    truths = truth_table(default_store())
 
     # Read model list
     with open(MODELS_FILE, "r") as mf:
         models = [line.strip() for line in mf if line.strip()]
 
-    for model_name in models:
-        process_model(model_name, gt_df)
+    if args.samples:
+        from sampling import load_samples, samples_path
+        loaded = {}
+        for m in models:
+            if samples_path(m).exists() or samples_path(m).with_suffix(".jsonl").exists():
+                loaded[m] = load_samples(m)
+            else:
+                print(f"[SKIP] {samples_path(m).name} not found in {RESULTS_DIR}", file=sys.stderr)
+        scores = score_samples(grade_samples(samples_frame(loaded), truths), args.k)
+        for model_name in loaded:
+            report_samples(model_name, scores[scores["model"] == model_name],
+                           f"passk_regex_{model_name}.json", args.k)
+        return
+
+    # Every model's results in one frame, graded in a single pass
+    loaded = {m: r for m in models if (r := load_results(m)) is not None}
+    graded = grade(results_frame(loaded), truths)
+    for model_name in loaded:
+        report_model(model_name, graded[graded["model"] == model_name])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# clients.py
+# --------------------------------------------
+# deps: httpx, pillow, python-dotenv; openai / anthropic / google-generativeai
+#       are each imported only when a model of that provider is first used
+#
+# Shared provider-client layer for every script that talks to a model.
+#
+#   • get_client(provider[, model]) – one long-lived SDK client per provider
+#     (per model for Gemini, whose client is a model handle), created on first
+#     use and reused for the rest of the process. OpenAI and Anthropic clients
+#     sit on an httpx pool sized to the provider's worker count, with
+#     keep-alive, so TLS and connection setup are paid once per connection
+#     instead of once per request.
+#   • safe_call_openai / safe_call_claude / safe_call_gemini – the SDK calls
+#     under retry.py's policy (backoff with jitter, Retry-After, per-provider
+#     circuit breaker), served from response_cache when possible. The SDKs'
+#     own retries are switched off so every wait is the policy's and counted.
+#   • stream_openai / stream_claude / stream_gemini – the same calls streamed
+#     through streaming.read_stream, which stops at the answer tag or a token
+#     cap and records time-to-first-token and latency (a StreamResult).
+#   • complete(model, messages, params) -> (answer, usage) – one provider-
+#     neutral call. `messages` are OpenAI-style (a system message and a user
+#     message whose content is text and image_part(...) parts); params are
+#     temperature / max_tokens. The adapters below render them into each
+#     SDK's request (Anthropic's marked for prompt caching, see prompt_cache),
+#     and usage comes back as prompt / completion / total tokens, plus
+#     cached_tokens / cache_write_tokens when the provider's cache was used.
+#     native_usage=True adds the provider's own usage fields as well
+#     (Anthropic input_tokens / output_tokens, Gemini usage_metadata's
+#     *_token_count), for files that have always stored those.
+# --------------------------------------------
+
+import base64
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+from image_cache import jpeg_b64
+from prompt_cache import mark, split_usage
+from providers import PROVIDER_LIMITS, classify_provider, is_reasoning_model, load_env
+from response_cache import cached_call, default_cache
+from retry import with_retries
+from streaming import ANSWER_CLOSE, read_stream
+
+# ---------- CONFIG -------------------------------------------------------
+TIMEOUT         = 600.0     # seconds; reasoning models can think for minutes
+KEEPALIVE_SEC   = 120.0     # idle pooled connections live this long
+POOL_HEADROOM   = 4         # connections beyond the provider's worker count
+MAX_TOKENS      = 1024      # default completion budget for complete()
+GEMINI_MAX_OUT  = 200       # safe_call_gemini / stream_gemini default, as in benchmark_reasoning
+
+_clients = {}
+_lock = threading.Lock()
+
+
+# ---------- clients ------------------------------------------------------
+def api_key(env):
+    """API key from the environment; a placeholder under --cache-only, where nothing is sent."""
+    key = os.getenv(env)
+    if not key and default_cache().mode == "cache-only":
+        return "cache-only"
+    return key
+
+
+def _http_client(sdk, provider):
+    """The SDK's own httpx client class (keeps its defaults) with a pool sized for `provider`."""
+    import httpx
+    workers = PROVIDER_LIMITS[provider]["concurrency"]
+    limits = httpx.Limits(max_connections=workers + POOL_HEADROOM, max_keepalive_connections=workers,
+                          keepalive_expiry=KEEPALIVE_SEC)
+    return sdk.DefaultHttpxClient(limits=limits)
+
+
+def _make_client(provider, model):
+    if provider == "openai":
+        import openai
+        return openai.OpenAI(api_key=api_key("OPENAI_API_KEY"), timeout=TIMEOUT, max_retries=0,
+                             http_client=_http_client(openai, provider))
+    if provider == "anthropic":
+        import anthropic
+        key = api_key("ANTHROPIC_API_KEY")
+        if not key:
+            raise RuntimeError("Missing ANTHROPIC_API_KEY in .env")
+        return anthropic.Anthropic(api_key=key, timeout=TIMEOUT, max_retries=0,
+                                   http_client=_http_client(anthropic, provider))
+    # provider == "gemini": configure once, then one model handle per model
+    import google.generativeai as genai
+    if ("gemini", None) not in _clients:
+        key = api_key("GEMINI_API_KEY")
+        if not key:
+            raise RuntimeError("Missing GEMINI_API_KEY in .env")
+        genai.configure(api_key=key)
+        _clients[("gemini", None)] = genai
+    return genai.GenerativeModel(model if model.startswith("models/") else f"models/{model}")
+
+
+def get_client(provider, model=None):
+    """Process-wide client for `provider` (Gemini: for `model`), created on first use."""
+    key = (provider, model if provider == "gemini" else None)
+    load_env()
+    with _lock:
+        if key not in _clients:
+            _clients[key] = _make_client(provider, model)
+        return _clients[key]
+
+
+# ---------- calls with retries -------------------------------------------
+def safe_call_openai(client, limiter=None, attempt=None, **kw):
+    """chat.completions.create under the retry policy, served from the response cache when possible."""
+    def call():
+        raw = client.chat.completions.with_raw_response.create(**kw)
+        if limiter:
+            limiter.update_from_headers(raw.headers)
+        return raw.parse()
+
+    return cached_call("openai", client, kw, lambda: with_retries("openai", call), attempt)
+
+
+def safe_call_claude(client, model, system_txt, parts, limiter=None, attempt=None, **kw):
+    """messages.create under the retry policy, served from the response cache when possible."""
+    payload = dict(model=model, system=system_txt, messages=[{"role": "user", "content": parts}], **kw)
+
+    def call():
+        raw = client.messages.with_raw_response.create(**payload)
+        if limiter:
+            limiter.update_from_headers(raw.headers)
+        return raw.parse()
+
+    return cached_call("anthropic", client, payload, lambda: with_retries("anthropic", call), attempt)
+
+
+def safe_call_gemini(client, contents, attempt=None, **kw):
+    """generate_content under the retry policy, served from the response cache when possible."""
+    import google.generativeai as genai
+    generation_config = genai.types.GenerationConfig(
+        temperature=kw.get("temperature", 0.25),
+        max_output_tokens=kw.get("max_output_tokens", GEMINI_MAX_OUT)
+    )
+
+    def call():
+        return client.generate_content(contents=contents, generation_config=generation_config)
+
+    return cached_call("gemini", client, {"contents": contents, "config": generation_config},
+                       lambda: with_retries("gemini", call), attempt)
+
+
+# ---------- streamed calls -----------------------------------------------
+# Cached under "<provider>-stream" as the finished StreamResult; a replay keeps
+# the timings measured when the response was first read.
+def stream_openai(client, limiter=None, attempt=None, max_stream_tokens=None, **kw):
+    """chat.completions.create(stream=True) read until the answer tag / token cap → StreamResult."""
+    payload = {**kw, "stream": True, "stream_options": {"include_usage": True}}
+    if not is_reasoning_model(kw["model"]):             # o-series take no stop sequences
+        payload["stop"] = [ANSWER_CLOSE]
+
+    def text_of(chunk):
+        return chunk.choices[0].delta.content or "" if chunk.choices else ""
+
+    def usage_of(chunk):
+        if not chunk.usage:
+            return None, None
+        (prompt, completion, _), cache = split_usage("openai", chunk.usage)
+        return prompt, completion, *cache
+
+    def finish_of(chunk):
+        reason = chunk.choices[0].finish_reason if chunk.choices else None
+        return "cap" if reason == "length" else None
+
+    def call():
+        start = time.monotonic()
+        raw = client.chat.completions.with_raw_response.create(**payload)
+        if limiter:
+            limiter.update_from_headers(raw.headers)
+        stream = raw.parse()
+        return read_stream(stream, text_of, usage_of, finish_of, max_tokens=max_stream_tokens,
+                           close=stream.close, start=start)
+
+    return cached_call("openai-stream", client, payload, lambda: with_retries("openai", call), attempt)
+
+
+def stream_claude(client, model, system_txt, parts, limiter=None, attempt=None, max_stream_tokens=None, **kw):
+    """messages.create(stream=True) read until the answer tag / token cap → StreamResult."""
+    payload = dict(model=model, system=system_txt, messages=[{"role": "user", "content": parts}],
+                   stop_sequences=[ANSWER_CLOSE], stream=True, **kw)
+
+    def text_of(event):
+        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+            return event.delta.text
+        return ""
+
+    def usage_of(event):
+        if event.type == "message_start":
+            (prompt, _, _), cache = split_usage("anthropic", event.message.usage)
+            return prompt, None, *cache
+        if event.type == "message_delta":
+            return None, event.usage.output_tokens
+        return None, None
+
+    def finish_of(event):
+        if event.type != "message_delta":
+            return None
+        return {"stop_sequence": "tag", "max_tokens": "cap"}.get(event.delta.stop_reason)
+
+    def call():
+        start = time.monotonic()
+        raw = client.messages.with_raw_response.create(**payload)
+        if limiter:
+            limiter.update_from_headers(raw.headers)
+        stream = raw.parse()
+        return read_stream(stream, text_of, usage_of, finish_of, max_tokens=max_stream_tokens,
+                           close=stream.close, start=start)
+
+    return cached_call("anthropic-stream", client, payload, lambda: with_retries("anthropic", call), attempt)
+
+
+def stream_gemini(client, contents, attempt=None, max_stream_tokens=None, **kw):
+    """generate_content(stream=True) read until the answer tag / token cap → StreamResult."""
+    import google.generativeai as genai
+    generation_config = genai.types.GenerationConfig(
+        temperature=kw.get("temperature", 0.25),
+        max_output_tokens=kw.get("max_output_tokens", GEMINI_MAX_OUT),
+        stop_sequences=[ANSWER_CLOSE],
+    )
+
+    def text_of(chunk):
+        try:
+            return chunk.text
+        except ValueError:                  # a chunk with no text part (e.g. safety metadata)
+            return ""
+
+    def usage_of(chunk):
+        meta = getattr(chunk, "usage_metadata", None)
+        if not meta:
+            return None, None
+        return getattr(meta, "prompt_token_count", None), getattr(meta, "candidates_token_count", None)
+
+    def call():
+        start = time.monotonic()
+        return read_stream(client.generate_content(contents=contents, generation_config=generation_config,
+                                                   stream=True),
+                           text_of, usage_of, max_tokens=max_stream_tokens, start=start)
+
+    return cached_call("gemini-stream", client, {"contents": contents, "config": generation_config},
+                       lambda: with_retries("gemini", call), attempt)
+
+
+# ---------- provider-neutral messages ------------------------------------
+def image_part(path: Path, b64=None, media_type="image/jpeg"):
+    """Image content part for complete(); `b64` defaults to the shared JPEG encoding of `path`."""
+    return {"type": "image", "path": Path(path), "b64": b64 or jpeg_b64(path), "media_type": media_type}
+
+
+def _split(messages):
+    """(system text, user content parts) of a system + user message list."""
+    system, parts = "", []
+    for m in messages:
+        content = m["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if m["role"] == "system":
+            system = "\n\n".join(filter(None, [system] + [p["text"] for p in content]))
+        else:
+            parts.extend(content)
+    return system, parts
+
+
+def to_openai(messages):
+    def part(p):
+        if p["type"] != "image":
+            return p
+        return {"type": "image_url", "image_url": {"url": f"data:{p['media_type']};base64,{p['b64']}"}}
+    return [{**m, "content": [part(p) for p in m["content"]]} if isinstance(m["content"], list) else m
+            for m in messages]
+
+
+def to_anthropic(messages):
+    """(system, parts) with the whole prompt marked for Anthropic's prompt cache."""
+    system, parts = _split(messages)
+    return system, mark([{"type": "image", "source": {"type": "base64", "media_type": p["media_type"],
+                                                      "data": p["b64"]}}
+                         if p["type"] == "image" else p for p in parts])
+
+
+def to_gemini(messages):
+    """[system + "\\n\\n" + text, PIL images...], the prompt shape the Gemini runners always used."""
+    from PIL import Image
+    system, parts = _split(messages)
+    text = "\n".join(p["text"] for p in parts if p["type"] == "text")
+    images = [Image.open(io.BytesIO(base64.b64decode(p["b64"]))) if p.get("b64") else Image.open(p["path"])
+              for p in parts if p["type"] == "image"]
+    return [f"{system}\n\n{text}" if system else text, *images]
+
+
+def _usage(prompt, completion, total, cache=None):
+    usage = {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": total}
+    if cache and any(cache):
+        usage.update({"cached_tokens": cache[0], "cache_write_tokens": cache[1]})
+    return usage
+
+
+def _native(names, usage):
+    """{name: value} of the provider's own usage fields that are present."""
+    values = {n: getattr(usage, n, None) for n in names}
+    return {n: v for n, v in values.items() if v is not None}
+
+
+def complete(model, messages, params=None, attempt=None, limiter=None, native_usage=False):
+    """One chat turn on `model`'s provider → (answer, usage); o-series models get no sampling params.
+
+    With `native_usage` the usage also carries the provider's own field names.
+    """
+    params = params or {}
+    provider = classify_provider(model)
+    client = get_client(provider, model)
+    temperature, max_tokens = params.get("temperature"), params.get("max_tokens", MAX_TOKENS)
+
+    if provider == "openai":
+        kw = {"model": model, "messages": to_openai(messages)}
+        if not is_reasoning_model(model):
+            kw.update({k: v for k, v in (("temperature", temperature), ("max_tokens", max_tokens)) if v is not None})
+        resp = safe_call_openai(client, limiter=limiter, attempt=attempt, **kw)
+        if not resp.usage:
+            return resp.choices[0].message.content.strip(), {}
+        counts, cache = split_usage(provider, resp.usage)
+        return resp.choices[0].message.content.strip(), _usage(*counts, cache)
+
+    if provider == "anthropic":
+        system, parts = to_anthropic(messages)
+        kw = {"max_tokens": max_tokens}
+        if temperature is not None:
+            kw["temperature"] = temperature
+        resp = safe_call_claude(client, model, system, parts, limiter=limiter, attempt=attempt, **kw)
+        counts, cache = split_usage(provider, resp.usage)
+        usage = _usage(*counts, cache)
+        if native_usage:
+            usage.update(_native(("input_tokens", "output_tokens", "cache_read_input_tokens",
+                                  "cache_creation_input_tokens"), resp.usage))
+        return resp.content[0].text.strip(), usage
+
+    # provider == "gemini"
+    kw = {"max_output_tokens": max_tokens}
+    if temperature is not None:
+        kw["temperature"] = temperature
+    resp = safe_call_gemini(client, to_gemini(messages), attempt=attempt, **kw)
+    meta = getattr(resp, "usage_metadata", None)
+    usage = _usage(getattr(meta, "prompt_token_count", 0), getattr(meta, "candidates_token_count", 0),
+                   getattr(meta, "total_token_count", 0))
+    if native_usage:
+        usage.update(_native(("prompt_token_count", "candidates_token_count", "total_token_count"), meta))
+    return resp.text.strip(), usage
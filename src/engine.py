@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# engine.py
+# --------------------------------------------
+# Async fan-out engine shared by the benchmark runners.
+#
+# Every (puzzle, attempt) pair becomes an independent job. Jobs are pushed
+# through a bounded pool of in-flight requests and throttled against the
+# provider's RPM / TPM quota. Provider SDK calls are blocking, so each job runs
+# in a worker thread; the event loop only schedules, throttles and hands the
+# finished entry to `on_result`, which keeps the results dict single-writer.
+# Quota is enforced by a ratelimit.RateLimiter: estimated tokens are reserved
+# before the call and settled against the real `usage` afterwards (a failed
+# call is settled at 0, so its estimate goes back to the window).
+# With a tracing.TraceWriter every job is also timed into spans (queue, quota,
+# encode, request, retry_sleep, persist) and written as one trace line.
+# Adaptive runners (sampling.py --adaptive) can return follow-up jobs from
+# `on_result`, which join the same pool, and give a job a "stale" callable;
+# a stale job is dropped when its turn comes, before any quota is reserved.
+# A failed call has no entry for `on_result`; `on_error(job, error)` may
+# return follow-ups in its place, so a runner's queued work is not lost.
+# --------------------------------------------
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt
+
+import tracing
+
+
+class Engine:
+    """Run blocking `call(job) -> entry` functions concurrently under a quota."""
+
+    def __init__(self, name, call, concurrency=8, limiter=None, tracer=None):
+        self.name = name
+        self.call = call
+        self.concurrency = concurrency
+        self.limiter = limiter               # ratelimit.RateLimiter shared by this provider's workers
+        self.tracer = tracer                 # tracing.TraceWriter, or None
+        self.stats = {"requests": 0, "failed": 0, "skipped": 0, "elapsed": 0.0, "rps": 0.0}
+
+    def _timed_call(self, job, spans):
+        """self.call(job) in a worker thread, with nested spans collected into `spans`."""
+        start = time.monotonic()
+        try:
+            with tracing.collecting(spans):
+                return self.call(job)
+        finally:
+            inner = sum(v for k, v in spans.items() if k not in ("queue", "quota", "encode"))
+            inner += spans.get("encode", 0.0) - job.get("encode_sec", 0.0)
+            spans["request"] = max(0.0, time.monotonic() - start - inner)
+
+    async def _run_job(self, job, on_result, on_error=None):
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        spans = {"encode": job.get("encode_sec", 0.0)}
+        error = entry = None
+        async with self._sem:
+            spans["queue"] = time.monotonic() - submitted
+            if job.get("stale") and job["stale"]():
+                self.stats["skipped"] += 1
+                return None
+            reservation = None
+            if self.limiter:
+                reservation = await self.limiter.acquire_async(job.get("tokens", 0))
+            spans["quota"] = time.monotonic() - submitted - spans["queue"]
+            try:
+                entry = await loop.run_in_executor(self._pool, self._timed_call, job, spans)
+            except Exception as e:
+                # Leave the attempt unrecorded so `needs_rerun` picks it up next time.
+                self.stats["failed"] += 1
+                label = job.get("label") or f"puzzle {job['pid']} attempt {job['attempt']}"
+                print(f"{dt.now().time()}  ✘ {self.name} {label}: {e}")
+                error = str(e)
+            if reservation:
+                # a failed call is refunded: its estimate must not throttle the retries and other workers
+                self.limiter.settle(reservation, 0 if entry is None else entry.get("total_tokens"))
+        follow_ups = None
+        if entry is not None:
+            self.stats["requests"] += 1
+            with tracing.collecting(spans), tracing.span("persist"):
+                follow_ups = on_result(job, entry)
+        elif error is not None and on_error:
+            follow_ups = on_error(job, error)
+        if self.tracer:
+            self._trace(job, entry, error, spans, submitted)
+        return follow_ups
+
+    def _trace(self, job, entry, error, spans, submitted):
+        record = {"provider": self.name, "model": job.get("model"), "pid": job.get("pid"),
+                  "attempt": job.get("attempt"), "label": job.get("label"), "ok": error is None,
+                  "spans": {k: round(spans.get(k, 0.0), 4) for k in tracing.SPANS},
+                  "tokens": (entry or {}).get("total_tokens"), "cached_tokens": (entry or {}).get("cached_tokens")}
+        if error is not None:
+            record["error"] = error[:200]
+        self.tracer.write({k: v for k, v in record.items() if v is not None or k == "tokens"},
+                          submitted, time.monotonic())
+
+    async def run(self, jobs, on_result, on_error=None):
+        """Execute all `jobs`; `on_result(job, entry)` is called on the event loop thread.
+
+        Jobs `on_result` returns (a list, or None for none) are run as well, and
+        so are those `on_error(job, message)` returns for a call that failed.
+        """
+        self._sem = asyncio.Semaphore(self.concurrency)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency,
+                                thread_name_prefix=f"engine-{self.name}") as pool:
+            self._pool = pool
+            pending = {asyncio.ensure_future(self._run_job(job, on_result, on_error)) for job in jobs}
+            while pending:
+                done, pending = await asyncio.wait(pending)
+                for task in done:
+                    pending.update(asyncio.ensure_future(self._run_job(job, on_result, on_error))
+                                   for job in task.result() or ())
+        elapsed = time.monotonic() - start
+        self.stats["elapsed"] = elapsed
+        self.stats["rps"] = self.stats["requests"] / elapsed if elapsed > 0 else 0.0
+        return self.stats
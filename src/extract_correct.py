@@ -1,11 +1,15 @@
 #!/usr/bin/env python
-# extract_correct_llm.py
+# extract_correct.py
 # --------------------------------------------
 # For each model listed in models.txt, this script reads:
-# • correct_solutions_{MODEL}.json (contains all solutions with "correct" flag)
+# • correct_{MODEL}.json (written by grade.py, schema in its header: each
+#   entry has "correct" 1, or 0.5 for hand-marked partial credit)
 # Filters entries based on correct flag and writes to:
 # • full_correct_{MODEL}.json (correct: 1)
 # • partial_correct_{MODEL}.json (correct: 0.5)
+# A file from before the schema had "correct" (merge_correct_solutions listed
+# only correct entries, without the key) counts as all full credit, with a
+# warning to re-grade it.
 # --------------------------------------------
 import json
 import sys
@@ -29,7 +33,7 @@ def load_json(path: Path) -> dict:
 
 def extract_solutions(model_name: str):
     """Extract correct and partial correct solutions for a given model."""
-    input_path = RESULTS_DIR / f"correct_solutions_{model_name}.json"
+    input_path = RESULTS_DIR / f"correct_{model_name}.json"
     correct_output_path = RESULTS_DIR / f"full_correct_{model_name}.json"
     partial_output_path = RESULTS_DIR / f"partial_correct_{model_name}.json"
     
@@ -44,8 +48,12 @@ def extract_solutions(model_name: str):
     correct_solutions = {}
     partial_solutions = {}
     
+    legacy = sum(1 for record in all_solutions.values() if "correct" not in record)
+    if legacy:
+        print(f"[WARN] {legacy} entries of {input_path.name} have no \"correct\" flag; "
+              f"counted as correct (re-run grade.py to rewrite the file)")
     for puzzle_id, record in all_solutions.items():
-        correct_flag = record.get("correct")
+        correct_flag = record.get("correct", 1)
         if correct_flag == 1:
             correct_solutions[puzzle_id] = record
         elif correct_flag == 0.5:
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+# fake_provider.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Local stand-in for the OpenAI and Anthropic HTTP APIs so the benchmark
+# runners can be exercised and timed offline. Every request sleeps for a
+# configurable latency and returns a canned answer with plausible `usage`.
+#
+# Usage:
+#   python src/fake_provider.py --port 8765 --latency 0.5
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake \
+#   ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=fake \
+#        python src/benchmark_reasoning.py
+#
+# The OpenAI (/v1/files + /v1/batches) and Anthropic (/v1/messages/batches)
+# batch endpoints are emulated too; batches complete as soon as they are
+# created, so batch.py can be run end to end offline.
+#
+# Gemini is not emulated: the google-generativeai SDK talks gRPC by default.
+#
+# Streaming ("stream": true) is answered as server-sent events in each API's
+# format. A reply is FAKE_ANSWER (inside <answer>…</answer> when the prompt
+# asks for that tag) plus --ramble filler tokens, one event per token,
+# --token-latency seconds apart. Stop sequences and max_tokens cut it short
+# as the real APIs do, so streaming early termination can be timed offline.
+#
+# Fault injection (for retry.py / bench_retry.py): --fail-rate P makes that
+# share of completion requests fail with one of --faults, picked at random:
+#   429 / 500 / 503 / 529   that status, in the endpoint's error format;
+#                           429 and 503 carry Retry-After when --retry-after is set
+#   hang                    sleep --hang seconds before answering (client timeouts)
+#   reset                   close the connection without a response
+# --outage SEC answers every completion request with 503 for the first SEC
+# seconds after start, to exercise circuit breakers.
+#   python src/fake_provider.py --fail-rate 0.2 --faults 429 503 reset --retry-after 1
+#
+# Prompt caching is emulated as the APIs report it: a prompt of CACHE_MIN+
+# tokens seen before (any Anthropic one only if it carries cache_control) is
+# a cache hit, reported as usage.prompt_tokens_details.cached_tokens /
+# cache_read_input_tokens; a first Anthropic one as cache_creation_input_tokens.
+# --prefill SEC adds SEC per 1000 uncached prompt tokens to each reply.
+# --------------------------------------------
+
+import argparse
+import email.parser
+import email.policy
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT    = 8765
+DEFAULT_LATENCY = 0.5     # seconds per request
+DEFAULT_JITTER  = 0.2     # +/- fraction of latency
+FAKE_ANSWER     = "42"
+FILLER          = " because"  # one token of --ramble
+FAULTS          = ("429", "500", "503", "529", "hang", "reset")
+CACHE_MIN       = 1024    # shortest prompt (tokens) the providers cache
+ERROR_TYPES     = {429: "rate_limit_error", 500: "api_error", 503: "overloaded_error", 529: "overloaded_error"}
+
+
+def count_chars(payload) -> int:
+    """Total length of every string in a JSON payload (used for fake prompt usage)."""
+    if isinstance(payload, str):
+        return len(payload)
+    if isinstance(payload, dict):
+        return sum(count_chars(v) for v in payload.values())
+    if isinstance(payload, list):
+        return sum(count_chars(v) for v in payload)
+    return 0
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive, like the real endpoints
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sleep(self):
+        lat = self.server.latency
+        time.sleep(max(0.0, lat * (1 + random.uniform(-1, 1) * self.server.jitter)))
+
+    def _reply_text(self, text):
+        data = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/jsonl")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        path = self.path.split("?")[0].rstrip("/")
+
+        if path.endswith("/files"):
+            return self._reply(200, self.server.store_file(self._multipart_file(raw)))
+        req = json.loads(raw or b"{}")
+        if path.endswith("/messages/batches"):
+            return self._reply(200, self.server.create_anthropic_batch(req, self._base()))
+        if path.endswith("/batches"):
+            return self._reply(200, self.server.create_openai_batch(req))
+
+        self.server.count += 1
+        fault = self.server.pick_fault()
+        if fault and self._fault(fault, path):
+            return
+        self._sleep()
+        cache = self.server.prompt_cache(req, path)
+        if self.server.prefill:
+            time.sleep(self.server.prefill * (usage_counts(req, [])[0] - cache[0]) / 1000)
+        if req.get("stream") and path.endswith(("/chat/completions", "/messages")):
+            self._stream(req, path, cache)
+        elif path.endswith(("/chat/completions", "/messages")):
+            pieces, _ = generate(req, self.server.ramble)
+            time.sleep(self.server.token_latency * (len(pieces) - 1))    # the tokens a stream would pace out
+            make = openai_completion if path.endswith("/chat/completions") else anthropic_message
+            self._reply(200, make(req, self.server.ramble, cache))
+        else:
+            self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def _fault(self, fault, path):
+        """Serve an injected fault; returns False if the request should still be answered."""
+        if fault == "hang":
+            time.sleep(self.server.hang)
+            return False
+        if fault == "reset":
+            self.close_connection = True
+            return True
+        status = int(fault)
+        message = f"injected fault {status}"
+        if path.endswith("/messages"):
+            body = {"type": "error", "error": {"type": ERROR_TYPES[status], "message": message}}
+        else:
+            body = {"error": {"message": message, "type": ERROR_TYPES[status], "code": None}}
+        headers = {}
+        if status in (429, 503) and self.server.retry_after is not None:
+            headers["retry-after"] = str(self.server.retry_after)
+        self._reply(status, body, headers)
+        return True
+
+    def _stream(self, req, path, cache=(0, 0)):
+        """Send the reply as SSE events, one token each; stop early if the client hangs up."""
+        pieces, finish = generate(req, self.server.ramble)
+        make = openai_events if path.endswith("/chat/completions") else anthropic_events
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for i, event in enumerate(make(req, pieces, finish, cache)):
+            if i and self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            try:
+                self.wfile.write(event.encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                with self.server._lock:
+                    self.server.streams_cut += 1
+                return
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        parts = path.split("/")
+        srv = self.server
+        if path.endswith("/content") and parts[-2] in srv.files:
+            return self._reply_text(srv.files[parts[-2]]["content"])
+        if path.endswith("/results") and parts[-2] in srv.batches:
+            return self._reply_text(srv.batches[parts[-2]]["results"])
+        if parts[-1] in srv.batches:
+            return self._reply(200, srv.batches[parts[-1]]["object"])
+        self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def _base(self):
+        return f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+    def _multipart_file(self, raw):
+        """Contents of the `file` field of a multipart/form-data upload."""
+        head = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(head + raw)
+        for part in msg.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                return part.get_payload(decode=True).decode()
+        return ""
+
+
+def generate(req, ramble=0):
+    """(token pieces, finish) of the fake reply, after stop sequences and max_tokens.
+
+    finish is "stop", "stop_sequence" or "length".
+    """
+    wants_tag = "<answer>" in json.dumps(req.get("messages", [])) + str(req.get("system", ""))
+    pieces = (["<answer>", FAKE_ANSWER, "</answer>"] if wants_tag else [FAKE_ANSWER]) + [FILLER] * ramble
+    finish = "stop"
+    stops = req.get("stop") or req.get("stop_sequences") or []
+    text = "".join(pieces)
+    cut = min((text.find(s) for s in stops if s in text), default=-1)
+    if cut >= 0:
+        kept, n = [], 0
+        for p in pieces:
+            if n >= cut:
+                break
+            kept.append(p[:cut - n])
+            n += len(p)
+        pieces, finish = [p for p in kept if p], "stop_sequence"
+    limit = req.get("max_completion_tokens") or req.get("max_tokens")
+    if limit and len(pieces) > limit:
+        pieces, finish = pieces[:limit], "length"
+    return pieces, finish
+
+
+def usage_counts(req, pieces):
+    return count_chars(req.get("messages", [])) // 4 + 1, len(pieces)
+
+
+def openai_usage(prompt_tokens, completion_tokens, cache):
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cache[0]}}
+
+
+def anthropic_usage(prompt_tokens, completion_tokens, cache):
+    """input_tokens leave out what was read from or written to the cache, as in the real API."""
+    return {"input_tokens": prompt_tokens - cache[0] - cache[1], "output_tokens": completion_tokens,
+            "cache_read_input_tokens": cache[0], "cache_creation_input_tokens": cache[1]}
+
+
+def openai_completion(req, ramble=0, cache=(0, 0)):
+    pieces, finish = generate(req, ramble)
+    prompt_tokens, completion_tokens = usage_counts(req, pieces)
+    n = req.get("n") or 1
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": req.get("model", "fake"),
+        "choices": [{"index": i, "finish_reason": "length" if finish == "length" else "stop",
+                     "message": {"role": "assistant", "content": "".join(pieces)}} for i in range(n)],
+        "usage": openai_usage(prompt_tokens, completion_tokens * n, cache),
+    }
+
+
+def anthropic_message(req, ramble=0, cache=(0, 0)):
+    pieces, finish = generate(req, ramble)
+    prompt_tokens, completion_tokens = usage_counts(req, pieces)
+    return {
+        "id": f"msg_{uuid.uuid4().hex}",
+        "type": "message",
+        "role": "assistant",
+        "model": req.get("model", "fake"),
+        "content": [{"type": "text", "text": "".join(pieces)}],
+        "stop_reason": {"stop": "end_turn", "length": "max_tokens"}.get(finish, finish),
+        "stop_sequence": (req.get("stop_sequences") or [None])[0] if finish == "stop_sequence" else None,
+        "usage": anthropic_usage(prompt_tokens, completion_tokens, cache),
+    }
+
+
+def _sse(data, event=None):
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
+
+def openai_events(req, pieces, finish, cache=(0, 0)):
+    prompt_tokens, completion_tokens = usage_counts(req, pieces)
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": req.get("model", "fake")}
+    for i, p in enumerate(pieces):
+        delta = {"role": "assistant", "content": p} if i == 0 else {"content": p}
+        yield _sse({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+    reason = "length" if finish == "length" else "stop"
+    yield _sse({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": reason}]})
+    if (req.get("stream_options") or {}).get("include_usage"):
+        yield _sse({**base, "choices": [], "usage": openai_usage(prompt_tokens, completion_tokens, cache)})
+    yield "data: [DONE]\n\n"
+
+
+def anthropic_events(req, pieces, finish, cache=(0, 0)):
+    prompt_tokens, completion_tokens = usage_counts(req, pieces)
+    start = {"id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant",
+             "model": req.get("model", "fake"), "content": [], "stop_reason": None, "stop_sequence": None,
+             "usage": anthropic_usage(prompt_tokens, 1, cache)}
+    yield _sse({"type": "message_start", "message": start}, "message_start")
+    yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+               "content_block_start")
+    for p in pieces:
+        yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": p}},
+                   "content_block_delta")
+    yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+    stop_reason = {"stop": "end_turn", "length": "max_tokens"}.get(finish, finish)
+    stop_seq = (req.get("stop_sequences") or [None])[0] if finish == "stop_sequence" else None
+    yield _sse({"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": stop_seq},
+                "usage": {"output_tokens": completion_tokens}}, "message_delta")
+    yield _sse({"type": "message_stop"}, "message_stop")
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency, jitter, fail_rate=0.0, faults=FAULTS, retry_after=None,
+                 hang=30.0, outage=0.0, ramble=0, token_latency=0.0, prefill=0.0):
+        super().__init__(addr, FakeHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.ramble, self.token_latency = ramble, token_latency
+        self.prefill = prefill
+        self.cached_prompts = set()
+        self.streams_cut = 0
+        self.fail_rate, self.faults = fail_rate, list(faults)
+        self.retry_after, self.hang = retry_after, hang
+        self.outage_until = time.monotonic() + outage
+        self.count = 0
+        self.injected = {}
+        self._lock = threading.Lock()
+        self.files = {}
+        self.batches = {}
+
+    def handle_error(self, request, client_address):
+        pass                             # clients that timed out or were reset hang up mid-reply
+
+    def pick_fault(self):
+        """The fault to inject into this completion request, or None."""
+        if time.monotonic() < self.outage_until:
+            fault = "503"
+        elif self.fail_rate and random.random() < self.fail_rate:
+            fault = random.choice(self.faults)
+        else:
+            return None
+        with self._lock:
+            self.injected[fault] = self.injected.get(fault, 0) + 1
+        return fault
+
+    def prompt_cache(self, req, path):
+        """(cache read, cache write) prompt tokens of a completion request."""
+        prompt = json.dumps([req.get("model"), req.get("system"), req.get("messages")], sort_keys=True)
+        tokens = usage_counts(req, [])[0]
+        marked = path.endswith("/chat/completions") or "cache_control" in prompt
+        if tokens < CACHE_MIN or not marked:
+            return 0, 0
+        with self._lock:
+            hit = prompt in self.cached_prompts
+            self.cached_prompts.add(prompt)
+        if hit:
+            return tokens, 0
+        return 0, tokens if path.endswith("/messages") else 0
+
+    def store_file(self, content):
+        fid = f"file-{uuid.uuid4().hex}"
+        self.files[fid] = {"content": content}
+        return {"id": fid, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": "batch.jsonl", "purpose": "batch", "status": "processed"}
+
+    def create_openai_batch(self, req):
+        lines = [json.loads(l) for l in self.files[req["input_file_id"]]["content"].splitlines() if l.strip()]
+        out = "".join(json.dumps({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": l["custom_id"],
+                                  "response": {"status_code": 200, "body": openai_completion(l["body"])},
+                                  "error": None}) + "\n" for l in lines)
+        out_id = self.store_file(out)["id"]
+        bid = f"batch_{uuid.uuid4().hex}"
+        now = int(time.time())
+        self.count += len(lines)
+        self.batches[bid] = {"object": {
+            "id": bid, "object": "batch", "endpoint": req["endpoint"], "errors": None,
+            "input_file_id": req["input_file_id"], "completion_window": req["completion_window"],
+            "status": "completed", "output_file_id": out_id, "error_file_id": None,
+            "created_at": now, "completed_at": now,
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0},
+        }}
+        return self.batches[bid]["object"]
+
+    def create_anthropic_batch(self, req, base):
+        reqs = req["requests"]
+        out = "".join(json.dumps({"custom_id": r["custom_id"],
+                                  "result": {"type": "succeeded", "message": anthropic_message(r["params"])}}) + "\n"
+                      for r in reqs)
+        bid = f"msgbatch_{uuid.uuid4().hex}"
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.count += len(reqs)
+        self.batches[bid] = {"results": out, "object": {
+            "id": bid, "type": "message_batch", "processing_status": "ended",
+            "request_counts": {"processing": 0, "succeeded": len(reqs), "errored": 0,
+                               "canceled": 0, "expired": 0},
+            "created_at": now, "ended_at": now, "expires_at": now, "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{base}/v1/messages/batches/{bid}/results",
+        }}
+        return self.batches[bid]["object"]
+
+
+def serve(port=DEFAULT_PORT, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, background=False, **options):
+    """Start the fake server; with `background=True` return it running in a daemon thread.
+
+    `options` are FakeServer's fault-injection (fail_rate, faults, retry_after, hang, outage)
+    and reply-shape (ramble, token_latency, prefill) options.
+    """
+    server = FakeServer(("127.0.0.1", port), latency, jitter, **options)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"Fake provider on http://127.0.0.1:{server.server_port}  (latency {latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\nServed {server.count} requests" + (f", injected faults {server.injected}" if server.injected else ""))
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake OpenAI/Anthropic endpoint for offline runs")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    ap.add_argument("--jitter", type=float, default=DEFAULT_JITTER)
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of completion requests that fail")
+    ap.add_argument("--faults", nargs="+", choices=FAULTS, default=list(FAULTS))
+    ap.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds on 429 / 503")
+    ap.add_argument("--hang", type=float, default=30.0, help="seconds a 'hang' fault stalls")
+    ap.add_argument("--outage", type=float, default=0.0, help="answer 503 for the first SEC seconds")
+    ap.add_argument("--ramble", type=int, default=0, help="filler tokens after the answer")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed tokens")
+    ap.add_argument("--prefill", type=float, default=0.0, help="seconds per 1000 uncached prompt tokens")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+    random.seed(args.seed)
+    serve(args.port, args.latency, args.jitter, fail_rate=args.fail_rate, faults=args.faults,
+          retry_after=args.retry_after, hang=args.hang, outage=args.outage,
+          ramble=args.ramble, token_latency=args.token_latency, prefill=args.prefill)
+
+
+if __name__ == "__main__":
+    main()
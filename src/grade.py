@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# grade.py
+# --------------------------------------------
+# deps: openai, python-dotenv
+#
+# Tiered grading: one pass from results_{MODEL}.json to the merged
+# correct_{MODEL}.json, paying for an LLM call only where the cheap checks
+# cannot decide.
+#
+#   1. regex     – check_accuracy_regex.answers_match on either attempt;
+#                  a match is correct
+#   2. mismatch  – the ground truth and every attempt are plain numbers
+#                  (integers, decimals, fractions) that neither match nor
+#                  lie within CLOSE_REL_TOL of each other; incorrect
+#   3. llm       – everything else goes to the batched, deduplicated judge
+#                  of check_accuracy_llm (first non-empty attempt, as before);
+#                  answers it has judged before come from verdict_store
+#
+# Puzzles with no answer at all are counted as "empty". Per-tier counts are
+# printed for every model.
+#
+# correct_{MODEL}.json (the one schema; merge_correct_solutions.py writes it
+# too, extract_correct.py and the docs read it) maps puzzle id →
+#   {"name", "ground_truth", "model_answer", ["numSolvers"],
+#    "correct": 1 | 0.5, "tier": "regex" | "llm" | "manual"}
+# and lists only puzzles with credit. 1 is full credit from the check named
+# by "tier". 0.5 is partial credit, a hand call: an answer marked
+# "correct": 0.5 in the judge's correct_solutions_{MODEL}.json keeps it
+# ("tier": "manual") while the model's answer is unchanged and no check
+# gives it full credit.
+#
+# A model with answers left "undecided" (no verdict: --no-llm without a
+# stored one, or a judge request that failed) would get an incomplete file,
+# so its correct_{MODEL}.json is left as it is unless --partial is given.
+#
+# Usage:
+#   python src/grade.py [MODEL ...] [--no-llm] [--regrade] [--partial]
+# --------------------------------------------
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+from check_accuracy_llm import judge_incremental
+from check_accuracy_regex import answers_match
+from providers import read_models
+from puzzle_store import default_store
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR      = Path(__file__).resolve().parent.parent
+RESULTS_DIR   = BASE_DIR / "results"
+CLOSE_REL_TOL = 1e-3      # numbers this close are left to the judge ("extremely close")
+TIERS         = ("regex", "mismatch", "empty", "llm-correct", "llm-wrong", "undecided")
+PARTIAL       = 0.5       # "correct" of a hand-marked partial answer
+
+_plain_num_re  = re.compile(r"[-+]?\d+(?:,\d{3})*(?:\.\d+)?|[-+]?\.\d+")
+_plain_frac_re = re.compile(r"[-+]?\d+/\d+")
+_wrap_re       = re.compile(r"\\\(|\\\)|\$\$|\$|\\\[|\\\]|\*\*")
+
+
+def plain_number(s: str):
+    """Value of `s` if the whole answer is just a number or fraction, else None."""
+    s = _wrap_re.sub("", unicodedata.normalize("NFKC", s)).strip().rstrip(".").strip()
+    if _plain_frac_re.fullmatch(s):
+        n, d = s.split("/")
+        return int(n) / int(d) if int(d) else None
+    if _plain_num_re.fullmatch(s):
+        return float(s.replace(",", ""))
+    return None
+
+
+def classify(truth: str, answers: list[str]):
+    """(tier, chosen_answer) for one puzzle; tier is "regex", "mismatch", "empty" or "llm"."""
+    given = [a for a in answers if a]
+    if not given:
+        return "empty", ""
+    for a in given:
+        if answers_match(a, truth):
+            return "regex", a
+    t = plain_number(truth)
+    values = [plain_number(a) for a in given]
+    if t is not None and all(v is not None for v in values) \
+            and not any(math.isclose(v, t, rel_tol=CLOSE_REL_TOL) for v in values):
+        return "mismatch", given[0]
+    return "llm", given[0]
+
+
+def load_model(model_name, store):
+    """[(pid, entry, tier)] for every puzzle of a model that has a ground-truth answer."""
+    results_path = RESULTS_DIR / f"results_{model_name}.json"
+    if not results_path.exists():
+        print(f"[SKIP] results_{model_name}.json not found in {RESULTS_DIR}", file=sys.stderr)
+        return None
+    try:
+        results = json.loads(results_path.read_text())
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] Failed to parse {results_path}: {e}", file=sys.stderr)
+        return None
+
+    rows = []
+    for pid_str, rec in results.items():
+        row = store.get(int(pid_str)) if pid_str.isdigit() else None
+        if row is None or row["answer"] is None or str(row["answer"]).strip() == "":
+            continue
+        truth = str(row["answer"]).strip()
+        answers = [a.get("answer", "").strip() for a in rec.get("answers", [])[:2]]
+        tier, chosen = classify(truth, answers)
+        entry = {"name": rec.get("name", row["name"]), "ground_truth": truth, "model_answer": chosen}
+        if row.get("numSolvers") is not None:
+            entry["numSolvers"] = int(row["numSolvers"])
+        rows.append((pid_str, entry, tier))
+    return rows
+
+
+def partial_marks(model_name):
+    """{pid: model_answer} of the answers marked "correct": PARTIAL in correct_solutions_{MODEL}.json."""
+    path = RESULTS_DIR / f"correct_solutions_{model_name}.json"
+    try:
+        marked = json.loads(path.read_text()) if path.exists() else {}
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] Failed to parse {path}: {e}", file=sys.stderr)
+        return {}
+    return {pid: e.get("model_answer") for pid, e in marked.items() if e.get("correct") == PARTIAL}
+
+
+def grade_models(model_names, no_llm=False, regrade=False, partial=False):
+    """Grade each model and write its correct_{MODEL}.json; returns the models whose file was written."""
+    store = default_store()
+    graded = {}
+    for model_name in model_names:
+        rows = load_model(model_name, store)
+        if rows is not None:
+            graded[model_name] = rows
+
+    pending = [(pid, e["ground_truth"], e["model_answer"])
+               for rows in graded.values() for pid, e, tier in rows if tier == "llm"]
+    total = sum(len(rows) for rows in graded.values())
+    print(f"{total} answers across {len(graded)} models; {len(pending)} need the LLM judge")
+    verdicts = asyncio.run(judge_incremental(pending, regrade=regrade, stored_only=no_llm)) \
+        if pending else {}
+
+    written = []
+    for model_name, rows in graded.items():
+        counts = collections.Counter()
+        merged = {}
+        marks = partial_marks(model_name)
+        for pid_str, entry, tier in rows:
+            if tier == "llm":
+                verdict = verdicts.get((entry["ground_truth"], entry["model_answer"]))
+                tier = "undecided" if verdict is None else ("llm-correct" if verdict else "llm-wrong")
+            counts[tier] += 1
+            if tier in ("regex", "llm-correct"):
+                merged[pid_str] = {**entry, "correct": 1, "tier": tier.split("-")[0]}
+            elif tier in ("mismatch", "llm-wrong") and marks.get(pid_str) == entry["model_answer"]:
+                merged[pid_str] = {**entry, "correct": PARTIAL, "tier": "manual"}
+
+        out_path = RESULTS_DIR / f"correct_{model_name}.json"
+        half = sum(1 for e in merged.values() if e["correct"] == PARTIAL)
+        print(f"\nMODEL = {model_name}: {len(merged) - half}/{len(rows)} correct, {half} partial")
+        print("  " + "  ".join(f"{t}={counts[t]}" for t in TIERS))
+        if counts["undecided"] and not partial:
+            print(f"[WARN] {counts['undecided']} undecided answers: {out_path.name} not written "
+                  f"(judge them, or pass --partial)")
+            continue
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps({pid: merged[pid] for pid in sorted(merged, key=int)}, indent=2))
+        print(f"  → {out_path.name}")
+        written.append(model_name)
+    return written
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tiered regex → LLM grading into correct_{MODEL}.json")
+    ap.add_argument("models", nargs="*")
+    ap.add_argument("--no-llm", action="store_true",
+                    help="no judge requests; only stored verdicts are used, other undecided answers stay out")
+    ap.add_argument("--regrade", action="store_true", help="ignore stored judge verdicts")
+    ap.add_argument("--partial", action="store_true",
+                    help="write correct_{MODEL}.json even with undecided answers left out")
+    args = ap.parse_args()
+    grade_models(args.models or read_models(), args.no_llm, args.regrade, args.partial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# image_cache.py
+# --------------------------------------------
+# deps: pillow
+#
+# Shared jpeg_b64 with a persistent, content-addressed cache.
+#
+# Encoding a puzzle image (open → RGB → thumbnail → JPEG → base64) is done
+# once per (file content, IMG_MAX_PX, JPEG_Q) and stored under
+# .cache/images/<sha256>_<px>_<q>.b64. An in-process LRU keyed by
+# (path, mtime, size, px, q) sits in front, so repeated calls in one run do
+# not even re-hash the file. Editing an image changes its hash and therefore
+# its cache entry; changing IMG_MAX_PX / JPEG_Q does the same.
+#
+# Usage:
+#   python src/image_cache.py warm [--workers N]   # pre-encode every image
+#   python src/image_cache.py stats
+# --------------------------------------------
+
+import argparse
+import base64
+import functools
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+import tracing
+
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR   = Path(__file__).resolve().parent.parent
+CACHE_DIR  = BASE_DIR / ".cache" / "images"
+IMAGE_DIRS = [BASE_DIR / "data" / "puzzles" / "puzzle_images",
+              BASE_DIR / "data" / "puzzles" / "solution_images"]
+IMG_EXTS   = {".png", ".jpg", ".jpeg"}
+IMG_MAX_PX = 600
+JPEG_Q     = 70
+LRU_SIZE   = 512
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def encode(path: Path, max_px: int, q: int) -> str:
+    """Read an image, downsize to max_px, and return a base64‐encoded JPEG."""
+    from PIL import Image
+    with Image.open(path) as im:
+        im = im.convert("RGB")
+        im.thumbnail((max_px, max_px))
+        buf = io.BytesIO()
+        im.save(buf, format="JPEG", quality=q)
+        return base64.b64encode(buf.getvalue()).decode()
+
+
+def cache_path(digest: str, max_px: int, q: int) -> Path:
+    return CACHE_DIR / f"{digest}_{max_px}_{q}.b64"
+
+
+def _write_atomic(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+@functools.lru_cache(maxsize=LRU_SIZE)
+def _cached(path_str: str, mtime_ns: int, size: int, max_px: int, q: int) -> str:
+    path = Path(path_str)
+    cp = cache_path(file_sha256(path), max_px, q)
+    if cp.exists():
+        return cp.read_text()
+    b64 = encode(path, max_px, q)
+    _write_atomic(cp, b64)
+    return b64
+
+
+def jpeg_b64(path, max_px: int = IMG_MAX_PX, q: int = JPEG_Q) -> str:
+    """Base64 JPEG of `path` downsized to max_px, encoded at most once per content + setting."""
+    path = Path(path).resolve()
+    st = path.stat()
+    with tracing.span("encode"):
+        return _cached(str(path), st.st_mtime_ns, st.st_size, max_px, q)
+
+
+def all_images():
+    return sorted(p for d in IMAGE_DIRS if d.exists()
+                  for p in d.rglob("*") if p.suffix.lower() in IMG_EXTS)
+
+
+def _warm_one(args):
+    path, max_px, q = args
+    digest = file_sha256(path)
+    cp = cache_path(digest, max_px, q)
+    if cp.exists():
+        return False
+    _write_atomic(cp, encode(path, max_px, q))
+    return True
+
+
+def warm(max_px=IMG_MAX_PX, q=JPEG_Q, workers=None):
+    """Pre-encode every puzzle and solution image across processes."""
+    images = all_images()
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        done = list(pool.map(_warm_one, [(p, max_px, q) for p in images], chunksize=8))
+    print(f"Warmed {sum(done)} new / {len(images)} images at {max_px}px q{q} → {CACHE_DIR}")
+
+
+def stats():
+    files = list(CACHE_DIR.glob("*.b64")) if CACHE_DIR.exists() else []
+    size = sum(f.stat().st_size for f in files)
+    print(f"{len(files)} cached encodings, {size / 1e6:.1f} MB in {CACHE_DIR}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Encoded-image cache for jpeg_b64")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("warm", help="pre-encode all puzzle/solution images")
+    w.add_argument("--max-px", type=int, default=IMG_MAX_PX)
+    w.add_argument("--quality", type=int, default=JPEG_Q)
+    w.add_argument("--workers", type=int, default=None)
+    sub.add_parser("stats", help="show cache size")
+    args = ap.parse_args()
+    if args.cmd == "warm":
+        warm(args.max_px, args.quality, args.workers)
+    else:
+        stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# image_prep.py
+# --------------------------------------------
+# deps: pillow
+#
+# Puzzle images sized for the model they are sent to.
+#
+# jpeg_b64 squeezes every image into IMG_MAX_PX at JPEG_Q whatever the
+# provider bills for it, so a Hooks grid is blurry on one model and far
+# over-sized for another. prepare() runs an image through
+#
+#   1. flatten   – transparency onto white (RGBA puzzle PNGs)
+#   2. crop      – margins of the corner colour, keeping CROP_PAD px
+#   3. resize    – the largest tile-aligned size (one side a whole number
+#                  of the provider's tiles or patches) whose image token
+#                  cost (token_estimate.image_tokens) fits IMAGE_BUDGET and
+#                  whose long side fits MAX_PX; images are never enlarged
+#   4. encode    – JPEG at JPEG_Q, or a PALETTE_COLORS palette PNG when the
+#                  image is line-art (the palette changes pixels by at most
+#                  LINEART_ERR on average) and the PNG is smaller
+#
+# Results are cached like image_cache's: on disk under .cache/prepared/,
+# keyed by file content and the full setting, with an in-process LRU in
+# front. bench_images.py compares image tokens with accuracy per category.
+#
+# Usage:
+#   python src/image_prep.py warm [MODEL ...]    # prepare every puzzle image (default: models.txt)
+#   python src/image_prep.py stats [MODEL ...]   # tokens, bytes and formats against the 600px JPEG
+# --------------------------------------------
+
+import argparse
+import base64
+import functools
+import hashlib
+import io
+import json
+import math
+from pathlib import Path
+
+import image_cache
+import tracing
+from token_estimate import OPENAI_PATCHES, image_tokens
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR       = Path(__file__).resolve().parent.parent
+CACHE_DIR      = BASE_DIR / ".cache" / "prepared"
+IMAGE_BUDGET   = {            # image tokens per image, by provider or model prefix (longest match wins)
+    "openai": 765,            # 2×2 tiles of 512px
+    "gpt-4o-mini": 25_501,    # the same 2×2 tiles at its token rate
+    "o4-mini": 1_000,         # ~24×24 patches of 32px
+    "gpt-4.1-mini": 1_000,
+    "gpt-4.1-nano": 1_500,
+    "anthropic": 1_600,       # ~1.15 megapixels, the largest Claude takes without downscaling
+    "gemini": 1_032,          # 2×2 tiles of 768px (flat 258 per image before Gemini 2)
+}
+MAX_PX         = {"openai": 2048, "anthropic": 1568, "gemini": 3072}
+OPENAI_SHORT_PX = 768         # OpenAI tile models shrink the short side to this
+TILE_PX        = {"openai": 512, "openai-patch": 32, "anthropic": 28, "gemini": 768}
+JPEG_Q         = 80
+PALETTE_COLORS = 16
+LINEART_ERR    = 4.0          # mean per-channel change (0–255) the palette may make
+CROP_THRESHOLD = 24           # channel difference from the corner colour that counts as content
+CROP_PAD       = 8
+LRU_SIZE       = 512
+VERSION        = 1            # bump when the pipeline's output changes
+
+
+def budget_for(provider, model, scale=1.0):
+    keys = [k for k in IMAGE_BUDGET if model.startswith(k)]
+    return round((IMAGE_BUDGET[max(keys, key=len)] if keys else IMAGE_BUDGET[provider]) * scale)
+
+
+def tile_px(provider, model):
+    if provider == "openai" and any(model.startswith(k) for k in OPENAI_PATCHES):
+        return TILE_PX["openai-patch"]
+    return TILE_PX[provider]
+
+
+# ---------- pipeline -----------------------------------------------------
+def flatten(im):
+    from PIL import Image
+    if im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info):
+        im = im.convert("RGBA")
+        return Image.alpha_composite(Image.new("RGBA", im.size, "white"), im).convert("RGB")
+    return im.convert("RGB")
+
+
+def crop_margins(im):
+    """`im` without the border of its top-left corner's colour (CROP_PAD px of it are kept)."""
+    from PIL import Image, ImageChops
+    bg = Image.new("RGB", im.size, im.getpixel((0, 0)))
+    mask = ImageChops.difference(im, bg).convert("L").point(lambda p: 255 if p > CROP_THRESHOLD else 0)
+    box = mask.getbbox()
+    if not box:
+        return im
+    left, top, right, bottom = box
+    return im.crop((max(0, left - CROP_PAD), max(0, top - CROP_PAD),
+                    min(im.width, right + CROP_PAD), min(im.height, bottom + CROP_PAD)))
+
+
+def target_size(provider, model, w, h, budget):
+    """Largest tile-aligned (w, h), at most the original, that fits `budget` tokens and MAX_PX."""
+    unit = tile_px(provider, model)
+    scales = {1.0} | {k * unit / d for d in (w, h) for k in range(1, math.ceil(d / unit) + 1)}
+    short = OPENAI_SHORT_PX if provider == "openai" and unit != TILE_PX["openai-patch"] else math.inf
+    scales.add(short / min(w, h))               # past that OpenAI shrinks the image itself
+    fits = [s for s in scales if s <= 1 and max(w, h) * s <= MAX_PX[provider] and min(w, h) * s <= short
+            and image_tokens(provider, model, round(w * s), round(h * s)) <= budget]
+    s = max(fits, default=min(scales))
+    return max(1, round(w * s)), max(1, round(h * s))
+
+
+def encode(im):
+    """(media type, bytes): JPEG, or a palette PNG for line-art when that is smaller."""
+    from PIL import Image, ImageChops, ImageStat
+    buf = io.BytesIO()
+    im.save(buf, format="JPEG", quality=JPEG_Q)
+    best = ("image/jpeg", buf.getvalue())
+    pal = im.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    err = sum(ImageStat.Stat(ImageChops.difference(im, pal.convert("RGB"))).mean) / 3
+    if err <= LINEART_ERR:
+        buf = io.BytesIO()
+        pal.save(buf, format="PNG", optimize=True)
+        if len(buf.getvalue()) < len(best[1]):
+            best = ("image/png", buf.getvalue())
+    return best
+
+
+def process(path, provider, model, budget):
+    from PIL import Image
+    with Image.open(path) as im:
+        source = im.size
+        im = crop_margins(flatten(im))
+    size = target_size(provider, model, *im.size, budget)
+    if size != im.size:
+        im = im.resize(size, Image.LANCZOS)
+    media_type, data = encode(im)
+    return {"b64": base64.b64encode(data).decode(), "media_type": media_type, "size": list(size),
+            "source_size": list(source), "tokens": image_tokens(provider, model, *size), "bytes": len(data)}
+
+
+# ---------- cache --------------------------------------------------------
+def setting(provider, model, budget):
+    """Short hash of everything that decides prepare()'s output besides the file."""
+    key = (VERSION, provider, model, budget, MAX_PX[provider], tile_px(provider, model), JPEG_Q,
+           PALETTE_COLORS, LINEART_ERR, CROP_THRESHOLD, CROP_PAD)
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:12]
+
+
+@functools.lru_cache(maxsize=LRU_SIZE)
+def _cached(path_str, mtime_ns, size, provider, model, budget):
+    path = Path(path_str)
+    cp = CACHE_DIR / f"{image_cache.file_sha256(path)}_{setting(provider, model, budget)}.json"
+    if cp.exists():
+        return json.loads(cp.read_text())
+    prepared = process(path, provider, model, budget)
+    image_cache._write_atomic(cp, json.dumps(prepared))
+    return prepared
+
+
+def prepare(path, provider, model, scale=1.0):
+    """{"b64", "media_type", "size", "source_size", "tokens", "bytes"} of `path` for `model`.
+
+    `scale` multiplies the model's IMAGE_BUDGET (bench_images tries several).
+    """
+    path = Path(path).resolve()
+    st = path.stat()
+    with tracing.span("encode"):
+        return _cached(str(path), st.st_mtime_ns, st.st_size, provider, model, budget_for(provider, model, scale))
+
+
+# ---------- CLI ----------------------------------------------------------
+def puzzle_images():
+    from puzzle_store import default_store
+    return [r for r in default_store().rows() if r.get("hasImage") and r.get("imagePath")]
+
+
+def stats(model, rows):
+    from providers import classify_provider
+    from token_estimate import b64_size
+    provider = classify_provider(model)
+    preps = [prepare(r["imagePath"], provider, model) for r in rows]
+    legacy = [image_tokens(provider, model, *b64_size(image_cache.jpeg_b64(r["imagePath"]))) for r in rows]
+    png = sum(p["media_type"] == "image/png" for p in preps)
+    print(f"\n{model} ({provider}): {len(preps)} images, budget {budget_for(provider, model):,.0f} tokens")
+    print(f"  image tokens: {sum(p['tokens'] for p in preps) / len(preps):,.0f} mean "
+          f"(600px JPEG: {sum(legacy) / len(legacy):,.0f}), "
+          f"long side {sum(max(p['size']) for p in preps) / len(preps):.0f}px mean")
+    print(f"  {png} palette PNG, {len(preps) - png} JPEG, {sum(p['bytes'] for p in preps) / 1e6:.1f} MB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-provider puzzle image preparation")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, text in (("warm", "prepare every puzzle image for each model"),
+                       ("stats", "image tokens, bytes and formats per model")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("models", nargs="*", help="default: models.txt")
+    args = ap.parse_args()
+
+    from providers import classify_provider, read_models
+    rows = puzzle_images()
+    for model in args.models or read_models():
+        if args.cmd == "stats":
+            stats(model, rows)
+            continue
+        for r in rows:
+            prepare(r["imagePath"], classify_provider(model), model)
+        print(f"Prepared {len(rows)} images for {model} → {CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
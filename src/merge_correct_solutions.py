@@ -1,14 +1,17 @@
 #!/usr/bin/env python
 # merge_correct_solutions.py
 # --------------------------------------------
-# deps: pandas
+# deps: (stdlib only)
 #
 # For each model listed in models.txt, this script reads:
-# • correct_solutions_llm_{MODEL}.json (LLM‐based checker, each record has a "correct" flag)
+# • correct_solutions_{MODEL}.json (LLM‐based checker, each record has a "correct" flag)
 # • correct_solutions_regex_{MODEL}.json (regex‐based checker)
 # It takes the union of all puzzle IDs marked correct by either method, and
 # writes out a merged JSON correct_{MODEL}.json containing only those entries.
-# Incorrect entries (e.g. "correct": 0 in the LLM file) are dropped.
+# Incorrect entries (e.g. "correct": 0 in the LLM file) are dropped; partial
+# ones ("correct": 0.5) are kept. The file follows the schema documented in
+# grade.py ("correct" and "tier" on every entry). The pipeline builds it with
+# grade.py; this script is kept for manual runs.
 # --------------------------------------------
 import json
 import sys
@@ -29,6 +32,40 @@ def load_json(path: Path) -> dict:
         print(f"[ERROR] Cannot parse {path}: {e}", file=sys.stderr)
         return {}
 
+def merge_model(model_name: str):
+    """Write correct_{MODEL}.json from the two checkers; returns its path, or None if nothing is correct."""
+    # Paths of LLM-based and regex-based correct-solutions files
+    llm_path = RESULTS_DIR / f"correct_solutions_{model_name}.json"
+    regex_path = RESULTS_DIR / f"correct_solutions_regex_{model_name}.json"
+    merged_path = RESULTS_DIR / f"correct_{model_name}.json"
+
+    llm_data = load_json(llm_path)
+    regex_data = load_json(regex_path)
+
+    merged = {}
+
+    # 1) Add all entries from regex file (all are correct by definition)
+    for pid, record in regex_data.items():
+        merged[pid] = {**record, "correct": 1, "tier": "regex"}
+
+    # 2) Add entries the LLM judged correct (its file also lists "correct": 0 verdicts)
+    for pid, record in llm_data.items():
+        correct = record.get("correct", 1)
+        if not correct or (correct < 1 and pid in merged):     # partial credit never replaces a regex match
+            continue
+        # LLM version takes priority (it might have additional info like numSolvers)
+        merged[pid] = {**record, "correct": correct, "tier": "llm" if correct == 1 else "manual"}
+
+    if not merged:
+        print(f"No correct entries for model {model_name}; skipping.")
+        return None
+    merged_path.parent.mkdir(parents=True, exist_ok=True)
+    # Sort by puzzle ID for consistent output
+    sorted_merged = {pid: merged[pid] for pid in sorted(merged.keys(), key=lambda x: int(x))}
+    merged_path.write_text(json.dumps(sorted_merged, indent=2))
+    print(f"Wrote {merged_path.name} ({len(merged)} entries)")
+    return merged_path
+
 def main():
     if not MODELS_FILE.exists():
         print(f"[ERROR] models.txt not found at {MODELS_FILE}", file=sys.stderr)
@@ -39,33 +76,7 @@ def main():
         models = [line.strip() for line in mf if line.strip()]
     
     for model_name in models:
-        # Paths of LLM-based and regex-based correct-solutions files
-        llm_path = RESULTS_DIR / f"correct_solutions_llm_{model_name}.json"
-        regex_path = RESULTS_DIR / f"correct_solutions_regex_{model_name}.json"
-        merged_path = RESULTS_DIR / f"correct_{model_name}.json"
-        
-        llm_data = load_json(llm_path)
-        regex_data = load_json(regex_path)
-        
-        merged = {}
-        
-        # 1) Add all entries from regex file (all are correct by definition)
-        for pid, record in regex_data.items():
-            merged[pid] = record
-        
-        # 2) Add entries from LLM file (they're already filtered to correct == 1)
-        for pid, record in llm_data.items():
-            # LLM version takes priority (it might have additional info like numSolvers)
-            merged[pid] = record
-        
-        if merged:
-            merged_path.parent.mkdir(parents=True, exist_ok=True)
-            # Sort by puzzle ID for consistent output
-            sorted_merged = {pid: merged[pid] for pid in sorted(merged.keys(), key=lambda x: int(x))}
-            merged_path.write_text(json.dumps(sorted_merged, indent=2))
-            print(f"Wrote {merged_path.name} ({len(merged)} entries)")
-        else:
-            print(f"No correct entries for model {model_name}; skipping.")
+        merge_model(model_name)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
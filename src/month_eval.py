@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# month_eval.py
+# --------------------------------------------
+# deps: openai, anthropic, google-generativeai, pillow, python-dotenv (via clients)
+#
+# The evaluation loop shared by eval_curr_month.py and eval_last_month.py.
+#
+# evaluate(row_index, out_path) reads models from models.txt, skips any
+# already in `out_path`, sends the puzzle at `row_index` of puzzles.csv (via
+# puzzle_store) to each new model with two different temperatures as
+# "attempts", asks for very brief reasoning + final answer, and writes the
+# merged outputs back to `out_path`.
+#
+# Every attempt goes through clients.complete, which reuses one pooled client
+# per provider. An attempt's "usage" keeps the provider's own fields the
+# files always had (OpenAI prompt_tokens / completion_tokens / total_tokens,
+# Anthropic input_tokens / output_tokens, Gemini prompt_token_count /
+# candidates_token_count / total_token_count) next to the normalized
+# prompt_tokens / completion_tokens / total_tokens.
+# --------------------------------------------
+
+import argparse
+import json
+from pathlib import Path
+
+from clients import complete, image_part
+from image_prep import prepare
+from providers import classify_provider
+from puzzle_store import default_store
+from response_cache import add_cli_flags, apply_cli_flags
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR       = Path(__file__).resolve().parent.parent
+MODELS_FILE    = BASE_DIR / "models.txt"
+RESULTS_DIR    = BASE_DIR / "results"
+
+# We will send two attempts at different temperatures
+ATTEMPTS = [
+    {"attempt": 1, "temperature": 0.25},
+    {"attempt": 2, "temperature": 0.30},
+]
+
+MAX_TOKENS = 600  # For models that require max_tokens / max_output_tokens
+
+# ---------- HELPERS ------------------------------------------------------
+def build_msgs(text, img_path, provider, model):
+    """Provider-neutral messages for clients.complete, the image prepared for `model` (image_prep)."""
+    system = {"role":"system","content":
+        "You are an expert Jane Street puzzle solver. Provide a very brief reasoning (2–3 sentences) and then the final answer."}
+    # stable part first, so the second attempt can hit the provider's prompt cache
+    user = []
+    if img_path:
+        image = prepare(img_path, provider, model)
+        user.append(image_part(img_path, image["b64"], image["media_type"]))
+    user.append({"type":"text","text":text})
+    return [system, {"role":"user","content":user}]
+
+
+def ask(model_name, msgs):
+    """The ATTEMPTS entries of one model; a failed attempt records its error."""
+    answers = []
+    for att in ATTEMPTS:
+        entry = {"attempt": att["attempt"], "temperature": att["temperature"], "answer": None, "usage": {}, "error": None}
+        try:
+            answer, usage = complete(model_name, msgs, {"temperature":att["temperature"], "max_tokens":MAX_TOKENS},
+                                     attempt=att["attempt"], native_usage=True)
+            entry["answer"], entry["usage"] = answer, usage
+        except Exception as e:
+            entry["error"] = str(e)
+        answers.append(entry)
+    return answers
+
+# ---------- MAIN ---------------------------------------------------------
+def evaluate(row_index, out_path, description):
+    """Command-line entry point of an eval_*_month script: puzzle `row_index` → `out_path`."""
+    ap = argparse.ArgumentParser(description=description)
+    add_cli_flags(ap)
+    apply_cli_flags(ap.parse_args())
+
+    # 1) Load existing results (if any) to skip already‐done
+    if out_path.exists():
+        final_output = json.loads(out_path.read_text())
+    else:
+        final_output = {}
+
+    # 2) Read models.txt
+    if not MODELS_FILE.exists():
+        print(f"[ERROR] {MODELS_FILE} not found."); return
+    with open(MODELS_FILE) as mf:
+        all_models = [m.strip() for m in mf if m.strip()]
+
+    # 3) Load the puzzle
+    row = default_store().at(row_index)
+    if row is None:
+        print(f"[ERROR] puzzles.csv has fewer than {row_index + 1} rows."); return
+    text = str(row["puzzleText"]).strip()
+    img_path = row["imagePath"] if row.get("hasImage", False) else None
+
+    # 4) Evaluate new models
+    for model_name in all_models:
+        if model_name in final_output:
+            print(f"[SKIP] {model_name}: already evaluated.")
+            continue
+        try:
+            provider = classify_provider(model_name)
+        except ValueError as e:
+            print(f"[SKIP] {model_name}: {e}")
+            continue
+
+        print(f"\n→ Querying {provider.upper()} model '{model_name}' …")
+        answers = ask(model_name, build_msgs(text, img_path, provider, model_name))
+        final_output[model_name] = {"model":model_name, "answers":answers}
+
+    # 5) Write merged results
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out_path.write_text(json.dumps(final_output, indent=2))
+    print(f"\nWrote merged results to {out_path}")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# pipeline.py
+# --------------------------------------------
+# deps: those of the stages it runs (see each script)
+#
+# One command for the whole benchmark → publish flow, rebuilding only what is
+# out of date, make-style but keyed on content hashes instead of timestamps.
+#
+# Every stage has one target per model (plus one for the month files):
+#
+#   benchmark  results_{M}.json                 ← puzzles.csv
+#   grade      correct_{M}.json                 ← results_{M}.json, puzzles.csv
+#                                                  (+ correct_solutions_{M}.json's partial marks)
+#   extract    full_correct_{M}.json,
+#              partial_correct_{M}.json         ← correct_{M}.json
+#   publish    docs/results/ copies             ← results, full/partial_correct
+#                                                  (+ curr/last_month_solutions)
+#
+# grade is grade.py's tiered grading (regex, numeric mismatch, then the LLM
+# judge for the rest), so correct_{M}.json has its one shape; a model whose
+# answers are not all decided stays stale and is retried on the next run.
+#
+# The scripts that implement a stage (SCRIPTS: the stage's own script and
+# the checker modules it grades with) are inputs of its targets too, so
+# changing a checker's normalization or judge prompt re-grades. After a target is built, the sha256 of its
+# inputs and outputs is recorded in .cache/pipeline.json. A target is rebuilt
+# when it was never built, an input's hash changed, or a recorded output is
+# missing. A rebuild that writes identical bytes leaves everything
+# downstream fresh. Models are independent: a model added to models.txt only
+# gets its own targets built. Stale targets of a stage run together (one
+# benchmark run across providers, one grading pass with a single deduplicated
+# judge run, a thread pool for the per-file stages) before the next stage.
+#
+# Usage:
+#   python src/pipeline.py run [MODEL ...] [--skip benchmark] [--only grade extract] [--force] [--dry-run]
+#   python src/pipeline.py run --touch     # adopt existing outputs as up to date
+#   python src/pipeline.py status [MODEL ...]
+# --------------------------------------------
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from providers import read_models
+from puzzle_store import CSV_PATH
+
+# ---------- CONFIG -------------------------------------------------------
+SRC_DIR      = Path(__file__).resolve().parent
+BASE_DIR     = SRC_DIR.parent
+RESULTS_DIR  = BASE_DIR / "results"
+DOCS_RESULTS = BASE_DIR / "docs" / "results"
+STATE_PATH   = BASE_DIR / ".cache" / "pipeline.json"
+STAGES       = ("benchmark", "grade", "extract", "publish")
+MONTH_FILES  = ("curr_month_solutions.json", "last_month_solutions.json")
+JOBS         = 8          # threads for the per-file stages
+
+
+# ---------- targets ------------------------------------------------------
+def _r(name):
+    return RESULTS_DIR / name
+
+
+SCRIPTS = {"benchmark": ("benchmark_reasoning",),
+           "grade": ("grade", "check_accuracy_regex", "check_accuracy_llm"),
+           "extract": ("extract_correct",),
+           "publish": ("pipeline",)}
+
+
+class Target:
+    """One stage's output(s) for one model, with the files it is built from."""
+
+    def __init__(self, stage, model, inputs, outputs, required=None):
+        self.stage, self.model = stage, model
+        self.key = f"{stage}:{model}"
+        self.inputs = [*inputs, *(SRC_DIR / f"{name}.py" for name in SCRIPTS[stage])]
+        self.outputs = outputs
+        self.required = inputs if required is None else required    # must exist to build at all
+
+    def __repr__(self):
+        return self.key
+
+
+def targets(stage, models):
+    if stage == "benchmark":
+        return [Target(stage, m, [CSV_PATH], [_r(f"results_{m}.json")]) for m in models]
+    if stage == "grade":                 # correct_solutions_{M}.json holds the hand-marked partial credit
+        return [Target(stage, m, [_r(f"results_{m}.json"), CSV_PATH, _r(f"correct_solutions_{m}.json")],
+                       [_r(f"correct_{m}.json")], required=[_r(f"results_{m}.json"), CSV_PATH])
+                for m in models]
+    if stage == "extract":
+        return [Target(stage, m, [_r(f"correct_{m}.json")],
+                       [_r(f"full_correct_{m}.json"), _r(f"partial_correct_{m}.json")]) for m in models]
+    # publish
+    names = [[f"results_{m}.json", f"full_correct_{m}.json", f"partial_correct_{m}.json"] for m in models]
+    names.append(list(MONTH_FILES))
+    return [Target(stage, m, [_r(n) for n in ns], [DOCS_RESULTS / n for n in ns], required=[])
+            for m, ns in zip([*models, "month"], names)]
+
+
+# ---------- state --------------------------------------------------------
+@functools.lru_cache(maxsize=4096)
+def _digest(path_str: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path_str, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest(path: Path):
+    """sha256 of a file's bytes (memoized per mtime/size), or None if it does not exist."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return _digest(str(path), st.st_mtime_ns, st.st_size)
+
+
+def _rel(path: Path) -> str:
+    return str(path.relative_to(BASE_DIR))
+
+
+def _write_atomic(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class State:
+    """Input / output hashes of every built target (.cache/pipeline.json)."""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.targets = json.loads(path.read_text()) if path.exists() else {}
+
+    def why_stale(self, target, dirty=frozenset()):
+        """Reason `target` must be rebuilt, or None if it is up to date."""
+        rec = self.targets.get(target.key)
+        if rec is None:
+            return "never built"
+        changed = [_rel(p) for p in target.inputs if p in dirty or rec["inputs"].get(_rel(p)) != digest(p)]
+        if changed:
+            return "changed: " + ", ".join(Path(c).name for c in changed)
+        missing = [o for o in rec["outputs"] if not (BASE_DIR / o).exists()]
+        if missing:
+            return "missing: " + ", ".join(Path(m).name for m in missing)
+        return None
+
+    def record(self, target):
+        self.targets[target.key] = {"inputs": {_rel(p): digest(p) for p in target.inputs},
+                                    "outputs": [_rel(p) for p in target.outputs if p.exists()]}
+
+    def save(self):
+        _write_atomic(self.path, json.dumps(self.targets, indent=2, sort_keys=True))
+
+
+# ---------- stage actions ------------------------------------------------
+# Each takes the stale targets of its stage and returns the ones built successfully.
+def run_benchmark(todo):
+    import benchmark_reasoning as br
+    models = [t.model for t in todo]
+    asyncio.run(br.run_models(models))
+    attempts = range(1, len(br.ATTEMPTS) + 1)
+    rows = [str(int(r["id"])) for r in br.puzzle_rows() if isinstance(r.get("puzzleText"), str)]
+
+    def complete(model):
+        results = br.load_results(model)
+        return all(not br.needs_rerun(results.get(pid, {"answers": []})["answers"], a)
+                   for pid in rows for a in attempts)
+    return [t for t in todo if complete(t.model)]
+
+
+def run_grade(todo):
+    from grade import grade_models
+    written = set(grade_models([t.model for t in todo]))
+    return [t for t in todo if t.model in written]      # undecided models stay stale for a retry
+
+
+def _per_model(fn):
+    """Run `fn(target)` for every target on a thread pool; keep those returning True."""
+    def run(todo):
+        with ThreadPoolExecutor(max_workers=JOBS) as pool:
+            return [t for t, ok in zip(todo, pool.map(fn, todo)) if ok]
+    return run
+
+
+def _extract(t):
+    from extract_correct import extract_solutions
+    extract_solutions(t.model)
+    return True
+
+
+def _publish(t):
+    for src, dst in zip(t.inputs, t.outputs):
+        if src.exists() and digest(src) != digest(dst):
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(src, dst)
+            print(f"Published {dst.relative_to(BASE_DIR)}")
+    return True
+
+
+ACTIONS = {"benchmark": run_benchmark, "grade": run_grade,
+           "extract": _per_model(_extract), "publish": _per_model(_publish)}
+
+
+# ---------- runner -------------------------------------------------------
+def plan(stages, models, state, force=False, dirty=None):
+    """{stage: [(target, reason)]} for stale targets; `dirty` marks outputs a dry run would rewrite."""
+    out = {}
+    for stage in stages:
+        stale = []
+        for t in targets(stage, models):
+            reason = "forced" if force else state.why_stale(t, dirty or frozenset())
+            if reason:
+                stale.append((t, reason))
+                if dirty is not None:
+                    dirty.update(t.outputs)
+        out[stage] = stale
+    return out
+
+
+def run(stages, models, force=False, dry_run=False, touch=False):
+    state = State()
+    if dry_run:
+        for stage, stale in plan(stages, models, state, force, dirty=set()).items():
+            for t, reason in stale:
+                print(f"[would build] {t.key:<45} {reason}")
+        return
+
+    for stage in stages:
+        stale = plan([stage], models, state, force)[stage]
+        if not stale:
+            print(f"── {stage}: up to date")
+            continue
+        print(f"── {stage}: {len(stale)} target(s)")
+        for t, reason in stale:
+            print(f"   {t.key:<45} {reason}")
+        todo = []
+        for t, _ in stale:
+            missing = [p.name for p in t.required if not p.exists()]
+            if missing:
+                print(f"[SKIP] {t.key}: no {', '.join(missing)}")
+            else:
+                todo.append(t)
+        built = todo if touch else ACTIONS[stage](todo)
+        for t in built:
+            state.record(t)
+        state.save()
+        if len(built) < len(todo):
+            print(f"[WARN] {stage}: {len(todo) - len(built)} target(s) not built; they stay stale")
+
+
+def status(models):
+    state = State()
+    for stage in STAGES:
+        for t in targets(stage, models):
+            print(f"{t.key:<45} {state.why_stale(t) or 'up to date'}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental benchmark → grade → extract → publish pipeline")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="build every out-of-date target")
+    r.add_argument("models", nargs="*", help="default: models.txt")
+    r.add_argument("--only", nargs="+", choices=STAGES, help="run just these stages")
+    r.add_argument("--skip", nargs="+", choices=STAGES, default=[], help="leave these stages out")
+    r.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    r.add_argument("--dry-run", action="store_true", help="list what would be rebuilt")
+    r.add_argument("--touch", action="store_true", help="record current outputs as up to date without building")
+    s = sub.add_parser("status", help="show which targets are out of date")
+    s.add_argument("models", nargs="*")
+    args = ap.parse_args()
+
+    models = args.models or read_models()
+    if args.cmd == "status":
+        return status(models)
+    stages = [st for st in (args.only or STAGES) if st not in args.skip]
+    run(stages, models, args.force, args.dry_run, args.touch)
+
+
+if __name__ == "__main__":
+    main()
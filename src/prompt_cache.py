@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# prompt_cache.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Provider prompt caching for the runners.
+#
+# Requests are built stable part first: system text, then the puzzle image,
+# then the puzzle text. The attempts of a puzzle differ only in temperature,
+# so each one after the first can be served from the provider's cache of
+# that prompt, at a discount and without re-reading the image:
+#
+#   • Anthropic caches marked prefixes only. mark() puts
+#     cache_control {"type": "ephemeral"} on the last block of the prompt;
+#     the first attempt writes the cache (input billed at ANTHROPIC_WRITE ×)
+#     and later ones within 5 minutes read it (ANTHROPIC_READ ×).
+#   • OpenAI caches prompts of 1024+ tokens by itself. Requests carry a
+#     prompt_cache_key per puzzle so its attempts reach the same cache.
+#   • Gemini is left as is: explicit caching needs 32k+ token prompts.
+#
+# A cache entry exists only once its first request has been processed, so
+# benchmark_reasoning runs every puzzle's first attempt before any second
+# one. split_usage() reads cache-hit (cached_tokens) and cache-write
+# (cache_write_tokens) counts from a response's usage; the runners store
+# them on each attempt entry, and the engine adds cached_tokens to traces.
+#
+# Usage:
+#   python src/prompt_cache.py report [MODEL ...] [--trace TRACE.jsonl ...]
+#       per model: prompt tokens read from / written to cache, input cost
+#       saved (USD where INPUT_USD_PER_MTOK has a price, else in full-price
+#       tokens), and request latency of cache hits against a miss of the
+#       same puzzle, from the traces (default: every run in results/traces/)
+# --------------------------------------------
+
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR        = Path(__file__).resolve().parent.parent
+RESULTS_DIR     = BASE_DIR / "results"
+CACHE_CONTROL   = {"type": "ephemeral"}
+ANTHROPIC_READ  = 0.10       # cache reads, × the input price
+ANTHROPIC_WRITE = 1.25       # cache writes, × the input price
+OPENAI_READ     = {          # cached input, × the input price, by model prefix (longest match wins)
+    "gpt-4o": 0.50,
+    "gpt-4.1": 0.25,
+    "o3-": 0.25,
+    "o4-": 0.25,
+}
+INPUT_USD_PER_MTOK = {       # list input prices, for the report only
+    "gpt-4o-mini": 0.15,
+    "gpt-4o-2024-08-06": 2.50,
+    "gpt-4.1-2025-04-14": 2.00,
+    "o3-2025-04-16": 2.00,
+    "o4-mini-2025-04-16": 1.10,
+    "claude-3-haiku-20240307": 0.25,
+    "claude-3-opus-20240229": 15.00,
+}
+
+
+# ---------- requests -----------------------------------------------------
+def mark(parts):
+    """Anthropic content parts with the cache breakpoint on the last one (copies, inputs untouched)."""
+    if not parts:
+        return parts
+    return [*parts[:-1], {**parts[-1], "cache_control": CACHE_CONTROL}]
+
+
+def cache_key(model, pid):
+    """prompt_cache_key for an OpenAI request about one puzzle."""
+    return f"jsb-{model}-{pid}"
+
+
+# ---------- usage --------------------------------------------------------
+def _get(obj, name, default=None):
+    if obj is None:
+        return default
+    value = obj.get(name, default) if isinstance(obj, dict) else getattr(obj, name, default)
+    return default if value is None else value
+
+
+def split_usage(provider, usage):
+    """((prompt, completion, total), (cached, written)) from an OpenAI / Anthropic usage object or dict.
+
+    Anthropic's input_tokens leave out cached and newly cached tokens; they are added
+    back, so prompt tokens mean the same with and without caching.
+    """
+    if provider == "anthropic":
+        cached, written = _get(usage, "cache_read_input_tokens", 0), _get(usage, "cache_creation_input_tokens", 0)
+        prompt = _get(usage, "input_tokens", 0) + cached + written
+        completion = _get(usage, "output_tokens", 0)
+        return (prompt, completion, prompt + completion), (cached, written)
+    cached = _get(_get(usage, "prompt_tokens_details"), "cached_tokens", 0)
+    return ((_get(usage, "prompt_tokens"), _get(usage, "completion_tokens"), _get(usage, "total_tokens")),
+            (cached, 0))
+
+
+def read_rate(provider, model):
+    """Price of a cache read as a fraction of the normal input price."""
+    if provider == "anthropic":
+        return ANTHROPIC_READ
+    prefixes = [p for p in OPENAI_READ if model.startswith(p)]
+    return OPENAI_READ[max(prefixes, key=len)] if prefixes else 0.5
+
+
+def tokens_saved(provider, model, cached, written):
+    """Input cost saved, in full-price input tokens (negative if writes cost more than reads saved)."""
+    saved = cached * (1 - read_rate(provider, model))
+    if provider == "anthropic":
+        saved -= written * (ANTHROPIC_WRITE - 1)
+    return saved
+
+
+# ---------- report -------------------------------------------------------
+def latency_pairs(trace_rows, model):
+    """Request seconds of each cache-hit attempt and of a cache miss on the same puzzle."""
+    hits, misses = {}, {}
+    for r in trace_rows:
+        if r.get("model") != model or not r.get("ok", True) or "request" not in r.get("spans", {}):
+            continue
+        (hits if r.get("cached_tokens") else misses).setdefault(r["pid"], []).append(r["spans"]["request"])
+    return [(miss, hit) for pid, hs in hits.items() if pid in misses
+            for miss, hit in zip(misses[pid], hs)]
+
+
+def report(model, results, trace_rows):
+    """Report lines for one model's results_{MODEL}.json entries and traced attempts."""
+    from providers import classify_provider
+    provider = classify_provider(model)
+    entries = [a for rec in results.values() for a in rec.get("answers", [])]
+    prompt = sum(a.get("prompt_tokens") or 0 for a in entries)
+    cached = sum(a.get("cached_tokens", 0) for a in entries)
+    written = sum(a.get("cache_write_tokens", 0) for a in entries)
+    hits = sum(1 for a in entries if a.get("cached_tokens"))
+    saved = tokens_saved(provider, model, cached, written)
+    lines = [f"\n{model}: {len(entries)} attempts, {hits} cache hits"]
+    if not prompt:
+        return lines + ["  no prompt token counts recorded"]
+    lines.append(f"  prompt tokens {prompt:,}: {cached:,} read from cache ({cached / prompt:.0%}), "
+                 f"{written:,} written")
+    price = INPUT_USD_PER_MTOK.get(model)
+    usd = f" = ${saved * price / 1e6:,.2f} of ${prompt * price / 1e6:,.2f}" if price else ""
+    lines.append(f"  input cost saved: {saved:,.0f} full-price tokens ({saved / prompt:.0%} of input){usd}")
+    pairs = latency_pairs(trace_rows, model)
+    if pairs:
+        diffs = [miss - hit for miss, hit in pairs]
+        lines.append(f"  request latency, {len(pairs)} hit/miss pairs on the same puzzle: "
+                     f"miss p50 {statistics.median(m for m, _ in pairs):.2f}s, "
+                     f"hit p50 {statistics.median(h for _, h in pairs):.2f}s, "
+                     f"saved p50 {statistics.median(diffs):.2f}s per hit, {sum(diffs):.1f}s in total")
+    else:
+        lines.append("  request latency: no traced cache hits with a miss on the same puzzle")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prompt-cache hits, cost and latency saved per model")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("report", help="cache-hit tokens, input cost and latency saved per model")
+    r.add_argument("models", nargs="*", help="default: models.txt")
+    r.add_argument("--trace", nargs="+", type=Path, help="trace files (default: every results/traces/run_*.jsonl)")
+    args = ap.parse_args()
+
+    import results_log
+    import tracing
+    from providers import read_models
+    traces = args.trace or sorted(tracing.TRACE_DIR.glob("run_*.jsonl"))
+    rows = tracing.load(traces) if traces else []
+    for model in args.models or read_models():
+        path = RESULTS_DIR / f"results_{model}.json"
+        if not path.exists() and not path.with_suffix(".jsonl").exists():
+            print(f"[SKIP] {path.name} not found in {RESULTS_DIR}", file=sys.stderr)
+            continue
+        for line in report(model, results_log.load(path), rows):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# providers.py
+# --------------------------------------------
+# Shared provider bookkeeping: which provider serves a model, which models
+# are listed in models.txt, and the per-provider quota / worker-pool sizes
+# the schedulers use. Each provider gets its own independent limits, so
+# providers can be run side by side without sharing a budget.
+#
+# load_env() reads .env (API keys, base URLs, RESPONSE_CACHE) the first time
+# a client or the response cache needs it, not when a script is imported.
+# --------------------------------------------
+
+import functools
+from pathlib import Path
+
+BASE_DIR    = Path(__file__).resolve().parent.parent
+MODELS_FILE = BASE_DIR / "models.txt"
+
+# Per-provider quota and in-flight request cap (tpm=None disables TPM throttling).
+PROVIDER_LIMITS = {
+    "openai":    {"rpm": 1000, "tpm": 200_000, "concurrency": 16},
+    "anthropic": {"rpm": 1000, "tpm": None,    "concurrency": 16},
+    "gemini":    {"rpm": 1000, "tpm": None,    "concurrency": 16},
+}
+
+
+@functools.cache
+def load_env():
+    """Load .env into os.environ once per process (python-dotenv is imported only here)."""
+    from dotenv import find_dotenv, load_dotenv
+    load_dotenv(find_dotenv())
+
+
+def classify_provider(model_name: str) -> str:
+    ml = model_name.lower()
+    if ml.startswith(("gpt-","o4-","o3-")):
+        return "openai"
+    if ml.startswith("claude-"):
+        return "anthropic"
+    if ml.startswith("gemini-"):
+        return "gemini"
+    raise ValueError(f"Cannot infer provider for model '{model_name}'")
+
+
+def is_reasoning_model(model_name: str) -> bool:
+    """OpenAI o-series models reject temperature / max_tokens."""
+    return model_name.startswith(("o4-","o3-"))
+
+
+def read_models(path: Path = MODELS_FILE) -> list[str]:
+    """Model names from models.txt, one per line, blank lines skipped."""
+    with open(path) as mf:
+        return [m.strip() for m in mf if m.strip()]
+
+
+def group_by_provider(models) -> dict[str, list[str]]:
+    """{provider: [model, ...]}; models with an unknown provider are reported and dropped."""
+    groups = {}
+    for model_name in models:
+        try:
+            provider = classify_provider(model_name)
+        except ValueError as e:
+            print(f"[SKIP] {model_name}: {e}")
+            continue
+        groups.setdefault(provider, []).append(model_name)
+    return groups
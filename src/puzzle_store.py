@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# puzzle_store.py
+# --------------------------------------------
+# deps: (stdlib only; image_cache needs pillow for image_b64)
+#
+# Compiled puzzle store: puzzles.csv + the image directories resolved once
+# into .cache/puzzles.sqlite, so runners and checkers stop re-reading the CSV
+# and probing five image extensions per row.
+#
+# Each row keeps the CSV fields (same camelCase keys, so build_msgs_* and the
+# checkers take a store row wherever they took a DataFrame row), plus the
+# resolved puzzle / solution image paths. Encoded images are not stored:
+# the runners prepare them per model (image_prep), and image_b64() serves
+# the legacy JPEG from image_cache's disk cache.
+#
+# Opening the store compares the CSV's hash with the one it was built from;
+# if it changed, only rows whose content (CSV fields + the bytes of both
+# images) changed are re-resolved. `build` forces that pass, e.g. after
+# replacing an image file. A store of an older SCHEMA_VERSION is rebuilt.
+#
+# Usage:
+#   python src/puzzle_store.py build
+#   python src/puzzle_store.py show 12
+# --------------------------------------------
+
+import argparse
+import csv
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import image_cache
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR     = Path(__file__).resolve().parent.parent
+CSV_PATH     = BASE_DIR / "data" / "puzzles" / "puzzles.csv"
+PUZZLE_IMGS  = BASE_DIR / "data" / "puzzles" / "puzzle_images"
+SOL_IMGS     = BASE_DIR / "data" / "puzzles" / "solution_images"
+STORE_PATH   = BASE_DIR / ".cache" / "puzzles.sqlite"
+IMG_EXTS     = ("png", "jpg", "jpeg", "PNG", "JPG")
+BOOL_COLS    = ("hasImage", "hasSolution", "solutionHasImages")
+SCHEMA_VERSION = "2"      # bump when the puzzles table changes
+
+csv.field_size_limit(sys.maxsize)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS puzzles (
+    id                INTEGER PRIMARY KEY,
+    pos               INTEGER NOT NULL,      -- row position in puzzles.csv
+    row_hash          TEXT NOT NULL,
+    fields            TEXT NOT NULL,         -- JSON of the CSV row
+    image_path        TEXT,
+    solution_image    TEXT
+);
+"""
+
+
+def _parse(row: dict) -> dict:
+    """CSV strings → the types pandas would have produced (empty cell → None)."""
+    out = {}
+    for k, v in row.items():
+        if v == "":
+            out[k] = None
+        elif k in BOOL_COLS:
+            out[k] = v.lower() == "true"
+        elif k == "id":
+            out[k] = int(v)
+        elif k == "numSolvers":
+            out[k] = float(v)
+        else:
+            out[k] = v
+    return out
+
+
+def find_image(root: Path, name: str):
+    for ext in IMG_EXTS:
+        p = root / name / f"0_0.{ext}"
+        if p.exists():
+            return p
+    return None
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _image_hash(path):
+    """Path and content hash of a resolved image ("" for none)."""
+    return f"{path}:{image_cache.file_sha256(path)}" if path else ""
+
+
+class PuzzleStore:
+    """Lazy, id-addressed view of puzzles.csv; rebuilds changed rows on open."""
+
+    def __init__(self, path: Path = STORE_PATH, csv_path: Path = CSV_PATH):
+        self.path = path
+        self.csv_path = csv_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    # ---------- connection / build -------------------------------------
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+            if self._meta("schema") != SCHEMA_VERSION:    # e.g. the image_b64 columns of version 1
+                self._conn.executescript("DROP TABLE puzzles; DELETE FROM meta;" + SCHEMA)
+                self._conn.execute("INSERT INTO meta VALUES ('schema', ?)", (SCHEMA_VERSION,))
+                self._conn.commit()
+            self._checked = False
+        return self._conn
+
+    def _db(self):
+        """Connection, after rebuilding changed rows if puzzles.csv moved on since the last build."""
+        self._connect()
+        if not self._checked:
+            csv_hash = _sha(self.csv_path.read_bytes())
+            if self._meta("csv_hash") != csv_hash:
+                self._build(csv_hash)
+            self._checked = True
+        return self._conn
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def build(self):
+        """Incremental rebuild: re-resolve only rows whose CSV fields or image bytes changed."""
+        with self._lock:
+            self._connect()
+            self._checked = True
+            return self._build(_sha(self.csv_path.read_bytes()))
+
+    def _build(self, csv_hash):
+        db = self._conn
+        old = dict(db.execute("SELECT id, row_hash FROM puzzles"))
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            rows = [_parse(r) for r in csv.DictReader(f)]
+
+        changed = 0
+        for pos, rec in enumerate(rows):
+            name = rec["name"]
+            img = find_image(PUZZLE_IMGS, name) if rec.get("hasImage") else None
+            sol = find_image(SOL_IMGS, name) if rec.get("solutionHasImages") else None
+            fields = json.dumps(rec, sort_keys=True)
+            row_hash = _sha((fields + _image_hash(img) + _image_hash(sol)).encode())
+            if old.get(rec["id"]) == row_hash:
+                db.execute("UPDATE puzzles SET pos = ? WHERE id = ?", (pos, rec["id"]))
+                continue
+            db.execute("INSERT OR REPLACE INTO puzzles VALUES (?, ?, ?, ?, ?, ?)",
+                       (rec["id"], pos, row_hash, fields,
+                        str(img) if img else None, str(sol) if sol else None))
+            changed += 1
+
+        gone = set(old) - {r["id"] for r in rows}
+        db.executemany("DELETE FROM puzzles WHERE id = ?", [(i,) for i in gone])
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('csv_hash', ?)", (csv_hash,))
+        db.commit()
+        print(f"[puzzle_store] rebuilt {changed} / {len(rows)} rows, dropped {len(gone)}", file=sys.stderr)
+        return changed
+
+    # ---------- reads ----------------------------------------------------
+    def _row(self, r):
+        rec = json.loads(r[0])
+        rec["imagePath"] = Path(r[1]) if r[1] else None
+        rec["solutionImagePath"] = Path(r[2]) if r[2] else None
+        return rec
+
+    def get(self, pid):
+        """CSV row for puzzle `pid` (+ imagePath / solutionImagePath), or None."""
+        with self._lock:
+            r = self._db().execute(
+                "SELECT fields, image_path, solution_image FROM puzzles WHERE id = ?", (int(pid),)).fetchone()
+        return self._row(r) if r else None
+
+    def at(self, pos):
+        """Row by position in puzzles.csv (0 = current month, 1 = last month)."""
+        with self._lock:
+            r = self._db().execute(
+                "SELECT fields, image_path, solution_image FROM puzzles WHERE pos = ?", (pos,)).fetchone()
+        return self._row(r) if r else None
+
+    def rows(self):
+        """All rows in CSV order."""
+        with self._lock:
+            rs = self._db().execute(
+                "SELECT fields, image_path, solution_image FROM puzzles ORDER BY pos").fetchall()
+        return [self._row(r) for r in rs]
+
+    def __len__(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM puzzles").fetchone()[0]
+
+    def __contains__(self, pid):
+        return self.get(pid) is not None
+
+    def image_b64(self, pid, max_px=image_cache.IMG_MAX_PX, q=image_cache.JPEG_Q):
+        """Puzzle image as image_cache.jpeg_b64 encodes it (the pre-image_prep JPEG), or None."""
+        with self._lock:
+            r = self._db().execute("SELECT image_path FROM puzzles WHERE id = ?", (int(pid),)).fetchone()
+        if not r or not r[0]:
+            return None
+        return image_cache.jpeg_b64(r[0], max_px, q)
+
+
+_default = None
+
+
+def default_store() -> PuzzleStore:
+    """Process-wide store, opened on first use."""
+    global _default
+    if _default is None:
+        _default = PuzzleStore()
+    return _default
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compiled puzzle store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build", help="incrementally rebuild changed rows")
+    s = sub.add_parser("show", help="print one puzzle row")
+    s.add_argument("pid", type=int)
+    args = ap.parse_args()
+    store = default_store()
+    if args.cmd == "build":
+        store.build()
+        print(f"{len(store)} puzzles in {store.path}")
+    else:
+        rec = store.get(args.pid)
+        print(json.dumps(rec, indent=2, default=str) if rec else f"no puzzle {args.pid}")
+
+
+if __name__ == "__main__":
+    main()
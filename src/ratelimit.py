@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# ratelimit.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# RPM + TPM limiter shared by every worker of one provider.
+#
+# Each quota is a 60 s bucket of reservations with a running total, so
+# checking capacity is O(1) instead of re-summing a deque on every call.
+# (A refilling token bucket would let up to 2x the limit through in any
+# 60 s window; bench_ratelimit.py shows that turning into 429s.)
+#
+# A request reserves its *estimated* tokens up front; once the response is
+# in, `settle` rewrites that reservation to the real `usage`, so
+# over-estimates are refunded straight away and under-estimates are charged
+# to the window. When the provider reports its remaining quota in response
+# headers the buckets are tightened to match, so we never run ahead of the
+# server.
+#
+# `acquire` blocks a thread, `acquire_async` yields to the event loop; both
+# re-check after every sleep. See bench_ratelimit.py for a simulated-clock
+# harness that measures utilization.
+# --------------------------------------------
+
+import asyncio
+import collections
+import threading
+import time
+
+WINDOW_SEC = 60.0
+MIN_WAIT   = 0.01     # floor on sleeps so float rounding can't spin at ~0 s
+
+# Remaining-quota response headers: (requests header, tokens header)
+REMAINING_HEADERS = (
+    ("x-ratelimit-remaining-requests", "x-ratelimit-remaining-tokens"),               # OpenAI
+    ("anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-tokens-remaining"),  # Anthropic
+)
+
+
+class WindowBucket:
+    """`capacity` units per WINDOW_SEC; each reservation frees up WINDOW_SEC after it was made."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = collections.deque()   # [timestamp, amount], mutable so settle can adjust
+        self.used = 0
+
+    def prune(self, now):
+        while self.entries and now - self.entries[0][0] >= WINDOW_SEC:
+            self.used -= self.entries.popleft()[1]
+
+    def wait_for(self, amount, now):
+        """Seconds until `amount` more units fit (0 if they already do)."""
+        amount = min(amount, self.capacity)    # an oversize request only has to wait for an empty window
+        excess = self.used + amount - self.capacity
+        if excess <= 0:
+            return 0.0
+        for t, n in self.entries:
+            excess -= n
+            if excess <= 0:
+                return max(t + WINDOW_SEC - now, MIN_WAIT)
+        return WINDOW_SEC
+
+    def take(self, amount, now):
+        entry = [now, amount]
+        self.entries.append(entry)
+        self.used += amount
+        return entry
+
+    def adjust(self, entry, delta, now):
+        self.prune(now)
+        if now - entry[0] < WINDOW_SEC:      # still inside the window, so still in `entries`
+            entry[1] += delta
+            self.used += delta
+
+    def clamp(self, remaining, now):
+        """Charge a placeholder so at most `remaining` units are free right now."""
+        phantom = (self.capacity - self.used) - remaining
+        if phantom > 0:
+            self.take(phantom, now)
+
+
+class Reservation:
+    """What one request took from the limiter; handed back to `settle`."""
+
+    __slots__ = ("tokens", "granted_at", "waited", "_entry")
+
+    def __init__(self, tokens, granted_at, waited, entry=None):
+        self.tokens = tokens
+        self.granted_at = granted_at
+        self.waited = waited
+        self._entry = entry
+
+
+class RateLimiter:
+    """Enforce requests-per-minute and tokens-per-minute together (None disables either)."""
+
+    def __init__(self, rpm=None, tpm=None, clock=time.monotonic):
+        self.clock = clock
+        self.requests = WindowBucket(rpm) if rpm else None
+        self.tokens = WindowBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+        self.stats = {"granted": 0, "waited_sec": 0.0, "reserved": 0, "settled": 0}
+
+    def _prune(self, now):
+        for b in (self.requests, self.tokens):
+            if b:
+                b.prune(now)
+
+    def try_acquire(self, tokens=0):
+        """Reserve one request + `tokens` and return a Reservation if both fit now; else seconds to wait."""
+        with self._lock:
+            now = self.clock()
+            self._prune(now)
+            wait = max(self.requests.wait_for(1, now) if self.requests else 0.0,
+                       self.tokens.wait_for(tokens, now) if self.tokens else 0.0)
+            if wait > 0:
+                return wait
+            if self.requests:
+                self.requests.take(1, now)
+            entry = self.tokens.take(tokens, now) if self.tokens else None
+            self.stats["granted"] += 1
+            self.stats["reserved"] += tokens
+            return Reservation(tokens, now, 0.0, entry)
+
+    def acquire(self, tokens=0):
+        """Blocking reserve for worker threads."""
+        start = self.clock()
+        while not isinstance(res := self.try_acquire(tokens), Reservation):
+            time.sleep(res)
+        return self._waited(res, start)
+
+    async def acquire_async(self, tokens=0):
+        """Non-blocking reserve for asyncio tasks."""
+        start = self.clock()
+        while not isinstance(res := self.try_acquire(tokens), Reservation):
+            await asyncio.sleep(res)
+        return self._waited(res, start)
+
+    def _waited(self, res, start):
+        res.waited = res.granted_at - start
+        with self._lock:
+            self.stats["waited_sec"] += res.waited
+        return res
+
+    def settle(self, reservation, actual_tokens):
+        """Rewrite the reservation to the real `usage` once it is known."""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.stats["settled"] += actual_tokens
+            if self.tokens and reservation._entry is not None:
+                self.tokens.adjust(reservation._entry, actual_tokens - reservation.tokens, self.clock())
+
+    def update_from_headers(self, headers):
+        """Tighten the buckets to the remaining quota the provider reports, if any."""
+        if not headers:
+            return
+        with self._lock:
+            now = self.clock()
+            self._prune(now)
+            for req_h, tok_h in REMAINING_HEADERS:
+                for bucket, name in ((self.requests, req_h), (self.tokens, tok_h)):
+                    value = headers.get(name)
+                    if bucket is None or value is None:
+                        continue
+                    try:
+                        bucket.clamp(float(value), now)
+                    except ValueError:
+                        continue
@@ -2,42 +2,50 @@
 # extract_answers.py
 # --------------------------------------------
 # deps: openai, pandas, pillow, python-dotenv
+#
+# Reads each puzzle's official solution text (and solution image) and asks
+# MODEL for the final answer, filling the `answer` column of
+# puzzles_with_answers.csv.
+#
+# Rows are extracted concurrently through engine.Engine under the OpenAI
+# RPM/TPM quota; 429s back off by the server's hint (safe_call_openai)
+# rather than a fixed pause. Each extracted answer is appended, with a hash
+# of the solution text + image it came from, to the side file
+# puzzles_with_answers.jsonl, and the CSV is written once at the end (also
+# when interrupted). A rerun skips every row whose solution hash matches its
+# last extraction, so only new or edited solutions are sent again. Answers
+# already in the CSV but not yet in the side file are adopted as-is.
+# Failed rows are not written and are retried on the next run.
+#
+# Usage:
+#   python src/read_solution_text.py [--force]
+# --------------------------------------------
 
-import base64
-import io
-import json
-import re
-import time
+import argparse
+import asyncio
+import hashlib
 from datetime import datetime as dt
 from pathlib import Path
 
-import pandas as pd
-from dotenv import load_dotenv
-from openai import OpenAI, RateLimitError
-from PIL import Image
+import results_log
+from clients import get_client, safe_call_openai
+from engine import Engine
+from image_cache import file_sha256, jpeg_b64
+from providers import PROVIDER_LIMITS
+from puzzle_store import default_store
+from ratelimit import RateLimiter
+from token_estimate import estimate
 
 # ------------- CONFIG -----------------------
 BASE        = Path(__file__).resolve().parent.parent
 CSV_IN      = BASE / "data" / "puzzles" / "puzzles.csv"
 CSV_OUT     = BASE / "data" / "puzzles" / "puzzles_with_answers.csv"
 MODEL       = "gpt-4o-mini"
-FIXED_PAUSE = 3.0               # seconds between calls
+MAX_TOKENS  = 50
 JPEG_PX     = 600
 JPEG_Q      = 70                # jpeg quality
 # --------------------------------------------
 
-load_dotenv()
-client = OpenAI()
-
-# helper to encode images
-def jpeg_b64(path: Path, max_px=JPEG_PX, q=JPEG_Q) -> str:
-    with Image.open(path) as im:
-        im = im.convert("RGB")
-        im.thumbnail((max_px, max_px))
-        buf = io.BytesIO()
-        im.save(buf, format="JPEG", quality=q)
-        return base64.b64encode(buf.getvalue()).decode()
-
 # build messages for solution extraction
 def build_prompt(sol_text: str, img_path: Path | None):
     system = {
@@ -52,70 +60,110 @@ def build_prompt(sol_text: str, img_path: Path | None):
     if img_path:
         user_parts.append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/jpeg;base64,{jpeg_b64(img_path)}"}
+            "image_url": {"url": f"data:image/jpeg;base64,{jpeg_b64(img_path, JPEG_PX, JPEG_Q)}"}
         })
     return [system, {"role": "user", "content": user_parts}]
 
-# Load CSV and prepare column
-df = pd.read_csv(CSV_IN)
-if "answer" not in df.columns:
-    df["answer"] = pd.NA
-
-# regex for retry delay extraction
-retry_re = re.compile(r"in (\d+)ms")
-
-def get_retry_seconds(err: RateLimitError, default=10) -> float:
-    m = retry_re.search(str(err))
-    return (int(m.group(1)) / 1000 + 0.5) if m else default
-
-# Ensure output directory exists
-CSV_OUT.parent.mkdir(parents=True, exist_ok=True)
-
-# Iterate puzzles
-for idx, row in df.iterrows():
-    # skip if no solution available
-    if not row.get("hasSolution", False):
-        continue
-    # skip if already filled
-    if pd.notna(row["answer"]):
-        continue
-
-    sol_text = str(row.get("solutionText", "")).strip()
-    img_path = None
-    if row.get("solutionHasImages", False):
-        name = row["name"]
-        for ext in ("png", "jpg", "jpeg", "PNG", "JPG"):
-            p = BASE / "data" / "puzzles" / "solution_images" / name / f"0_0.{ext}"
-            if p.exists():
-                img_path = p
-                break
-
-    messages = build_prompt(sol_text, img_path)
-
-    # call until success or non-retriable error
-    while True:
-        try:
-            resp = client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                temperature=0.1,
-                max_tokens=50,
-            )
-            ans = resp.choices[0].message.content.strip()
-            df.at[idx, "answer"] = ans
-            print(f"[{dt.now().strftime('%H:%M:%S')}] ✔ id={row['id']} → {ans}")
-            break
-        except RateLimitError as e:
-            wait = get_retry_seconds(e)
-            print(f"↳ 429 hit; sleeping {wait:.2f}s")
-            time.sleep(wait)
-        except Exception as e:
-            print(f"[{dt.now().strftime('%H:%M:%S')}] ✘ id={row['id']}  ({e})")
-            df.at[idx, "answer"] = f"ERROR: {e}"
-            break
-
-    # incremental save and pause
+def solution_hash(sol_text: str, img_path: Path | None) -> str:
+    """What an extraction depends on: the solution text, the image bytes and the extractor model."""
+    h = hashlib.sha256(f"{MODEL}\0{sol_text}\0".encode())
+    if img_path:
+        h.update(file_sha256(img_path).encode())
+    return h.hexdigest()
+
+def load_checkpoint() -> dict:
+    """{puzzle id: latest side-file record}."""
+    return {rec["id"]: rec for rec in results_log.read_records(results_log.log_path(CSV_OUT))}
+
+def plan(df, store, done, force=False):
+    """Jobs for rows whose solution changed since their last extraction (+ records adopting CSV answers)."""
+    import pandas as pd
+    jobs, adopted = [], []
+    for _, row in df.iterrows():
+        # skip if no solution available
+        if not row.get("hasSolution", False):
+            continue
+        pid = int(row["id"])
+        sol_text = str(row.get("solutionText", "")).strip()
+        img_path = None
+        if row.get("solutionHasImages", False):
+            rec = store.get(pid)
+            img_path = rec["solutionImagePath"] if rec else None
+        digest = solution_hash(sol_text, img_path)
+
+        last = done.get(pid)
+        if not force and last and last["hash"] == digest:
+            continue
+        if not force and not last and pd.notna(row["answer"]):
+            # Answer predates the side file: record it against the current solution
+            adopted.append({"id": pid, "hash": digest, "answer": row["answer"], "source": "csv"})
+            continue
+        messages = build_prompt(sol_text, img_path)
+        jobs.append({"label": f"id={pid}", "id": pid, "hash": digest, "messages": messages,
+                     "tokens": estimate("openai", MODEL, messages) + MAX_TOKENS})
+    return jobs, adopted
+
+def extract(client, limiter, job):
+    """One extraction request (runs in a worker thread)."""
+    resp = safe_call_openai(client=client, limiter=limiter, model=MODEL, messages=job["messages"],
+                            temperature=0.1, max_tokens=MAX_TOKENS)
+    ans = resp.choices[0].message.content.strip()
+    print(f"[{dt.now().strftime('%H:%M:%S')}] ✔ id={job['id']} → {ans}")
+    return {"answer": ans, "total_tokens": resp.usage.total_tokens if resp.usage else None}
+
+async def run(jobs, log):
+    limits = PROVIDER_LIMITS["openai"]
+    limiter = RateLimiter(rpm=limits["rpm"], tpm=limits["tpm"])
+    client = get_client("openai")
+
+    def record(job, entry):
+        log.write({"id": job["id"], "hash": job["hash"], "answer": entry["answer"], "source": MODEL})
+
+    engine = Engine("extract", lambda job: extract(client, limiter, job),
+                    concurrency=limits["concurrency"], limiter=limiter)
+    return await engine.run(jobs, record)
+
+def merge(df) -> int:
+    """Write every checkpointed answer into the CSV in one go; returns how many cells changed."""
+    done = load_checkpoint()
+    changed = 0
+    for idx, pid in df["id"].items():
+        rec = done.get(int(pid))
+        if rec and df.at[idx, "answer"] != rec["answer"]:
+            df.at[idx, "answer"] = rec["answer"]
+            changed += 1
+    CSV_OUT.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(CSV_OUT, index=False)
-    time.sleep(FIXED_PAUSE)
-
-print(f"\nAll done! Answers written to {CSV_OUT}")
+    return changed
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract final answers from the official solutions")
+    ap.add_argument("--force", action="store_true", help="re-extract every row with a solution")
+    args = ap.parse_args()
+
+    import pandas as pd
+    # Load CSV and prepare column; solution images are resolved by the puzzle store
+    df = pd.read_csv(CSV_IN)
+    if "answer" not in df.columns:
+        df["answer"] = pd.NA
+    df["answer"] = df["answer"].astype(object)
+
+    jobs, adopted = plan(df, default_store(), load_checkpoint(), args.force)
+    print(f"{len(jobs)} solutions to extract, {len(adopted)} existing answers adopted")
+
+    log = results_log.ResultsLog(CSV_OUT)
+    try:
+        for rec in adopted:
+            log.write(rec)
+        if jobs:
+            stats = asyncio.run(run(jobs, log))
+            print(f"Extracted {stats['requests']} answers ({stats['failed']} failed, "
+                  f"{stats['elapsed']:.1f}s, {stats['rps']:.2f} req/s)")
+    finally:
+        log.close()
+        changed = merge(df)
+
+    print(f"\nAll done! {changed} answers updated in {CSV_OUT}")
+
+if __name__ == "__main__":
+    main()
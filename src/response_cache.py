@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# response_cache.py
+# --------------------------------------------
+# deps: (stdlib only; openai / anthropic to decode their cached responses)
+#
+# Local cache of provider responses, sitting under every safe_call_* (and so
+# under clients.complete), so re-running a script after changing a checker
+# or adding a model only pays for prompts that were never sent before.
+#
+# Key: sha256 of the fully built request payload (messages, images, model,
+# sampling params, max tokens), the endpoint it goes to and the attempt
+# number. Gemini payloads carry no model (it is on the client), so the
+# client's model_name is added to them. Two attempts with identical payloads (o-series models take no
+# temperature) therefore stay two independent samples.
+#
+# Streamed calls (clients.stream_*) are stored as their finished
+# streaming.StreamResult, under a "<provider>-stream" provider.
+#
+# Stored in .cache/responses.sqlite (WAL, safe across worker threads and
+# concurrent scripts). When the stored bodies exceed MAX_BYTES the least
+# recently used entries are evicted down to EVICT_TO of that.
+#
+# Modes (RESPONSE_CACHE env var, or the runners' flags):
+#   use         read hits, store misses (default)
+#   cache-only  never call a provider; a miss raises CacheMiss   (--cache-only)
+#   refresh     always call and overwrite the stored response      (--refresh)
+#   off         bypass the cache                                   (--no-cache)
+#
+# Usage:
+#   python src/response_cache.py stats
+#   python src/response_cache.py evict --max-mb 100
+#   python src/response_cache.py clear
+# --------------------------------------------
+
+import argparse
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from providers import load_env
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR   = Path(__file__).resolve().parent.parent
+CACHE_PATH = BASE_DIR / ".cache" / "responses.sqlite"
+MAX_BYTES  = 512 * 1024 * 1024
+EVICT_TO   = 0.9
+MODES      = ("use", "cache-only", "refresh", "off")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    provider   TEXT NOT NULL,
+    model      TEXT NOT NULL,
+    body       TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created    REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+class CacheMiss(RuntimeError):
+    """Raised in cache-only mode when a request has no stored response."""
+
+
+# ---------- keys ---------------------------------------------------------
+def _jsonable(o):
+    """json.dumps fallback for the non-JSON parts of a payload (PIL images, configs, paths)."""
+    if hasattr(o, "tobytes") and hasattr(o, "mode") and hasattr(o, "size"):     # PIL.Image
+        return {"image": hashlib.sha256(o.tobytes()).hexdigest(), "mode": o.mode, "size": list(o.size)}
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if isinstance(o, Path):
+        return str(o)
+    if hasattr(o, "__dict__"):
+        return {k: v for k, v in vars(o).items() if not k.startswith("_")}
+    return repr(o)
+
+
+def endpoint_of(client):
+    """Where a client sends requests (so fake_provider answers never serve real runs)."""
+    return str(getattr(client, "base_url", "") or "")
+
+
+def model_of(provider, client, payload):
+    if provider.startswith("gemini"):
+        return getattr(client, "model_name", "")
+    return payload.get("model", "")
+
+
+def cache_key(provider, client, payload, attempt=None):
+    """request_key of a call; the model joins the payload when the payload lacks it (Gemini's is on the client)."""
+    if "model" not in payload:
+        payload = {**payload, "model": model_of(provider, client, payload)}
+    return request_key(provider, endpoint_of(client), payload, attempt)
+
+
+def request_key(provider, endpoint, payload, attempt=None):
+    blob = json.dumps({"provider": provider, "endpoint": endpoint, "payload": payload, "attempt": attempt},
+                      sort_keys=True, default=_jsonable)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+# ---------- (de)serialising responses -----------------------------------
+class CachedGeminiResponse:
+    """The parts of a GenerateContentResponse the runners read (.text, usage, block reason)."""
+
+    def __init__(self, d):
+        self._text = d.get("text")
+        self.usage_metadata = _Namespace(d.get("usage") or {}) if d.get("usage") else None
+        self.prompt_feedback = _Namespace({"block_reason": d.get("block_reason")})
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("cached Gemini response has no text")
+        return self._text
+
+
+class _Namespace:
+    def __init__(self, d):
+        self.__dict__.update(d)
+
+
+def encode(provider, resp) -> str:
+    if provider.endswith("-stream"):                 # streaming.StreamResult
+        return json.dumps(dataclasses.asdict(resp))
+    if provider in ("openai", "anthropic"):
+        return resp.model_dump_json()
+    try:
+        text = resp.text
+    except Exception:
+        text = None
+    meta = getattr(resp, "usage_metadata", None)
+    feedback = getattr(resp, "prompt_feedback", None)
+    return json.dumps({
+        "text": text,
+        "usage": {k: getattr(meta, k, 0) for k in
+                  ("prompt_token_count", "candidates_token_count", "total_token_count")} if meta else None,
+        "block_reason": str(getattr(feedback, "block_reason", "") or "") or None,
+    })
+
+
+def decode(provider, body):
+    if provider.endswith("-stream"):
+        from streaming import StreamResult
+        return StreamResult(**json.loads(body))
+    if provider == "openai":
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate_json(body)
+    if provider == "anthropic":
+        from anthropic.types import Message
+        return Message.model_validate_json(body)
+    return CachedGeminiResponse(json.loads(body))
+
+
+# ---------- store --------------------------------------------------------
+class ResponseCache:
+    """SQLite-backed response store with LRU eviction by total body size."""
+
+    def __init__(self, path: Path = CACHE_PATH, max_bytes=MAX_BYTES, mode=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode or os.getenv("RESPONSE_CACHE", "use")
+        if self.mode not in MODES:
+            raise ValueError(f"RESPONSE_CACHE must be one of {MODES}, not {self.mode!r}")
+        self._conn = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, provider, model, body):
+        with self._lock:
+            db = self._db()
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (key, provider, model, body, len(body), now, now))
+            self._bytes += len(body) - (old[0] if old else 0)
+            self.stats["stored"] += 1
+            if self._bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO))
+            db.commit()
+
+    def _evict(self, target):
+        db = self._conn
+        # Another process may have added or evicted entries since we last summed
+        self._bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if self._bytes <= target:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._bytes -= size
+            self.stats["evicted"] += 1
+
+    def evict(self, max_bytes):
+        with self._lock:
+            self._db()
+            self._evict(max_bytes)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM responses")
+            self._conn.commit()
+            self._bytes = 0
+
+    def summary(self):
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT provider, model, COUNT(*), SUM(size) FROM responses GROUP BY provider, model").fetchall()
+        return rows
+
+    def call(self, provider, client, payload, call, attempt=None):
+        """Return the stored response for this request, else `call()` (and store it)."""
+        if self.mode == "off":
+            return call()
+        key = cache_key(provider, client, payload, attempt)
+        if self.mode != "refresh":
+            body = self.get(key)
+            if body is not None:
+                return decode(provider, body)
+        if self.mode == "cache-only":
+            raise CacheMiss(f"{model_of(provider, client, payload)}: no cached response "
+                            f"(attempt {attempt}, key {key[:12]})")
+        resp = call()
+        self.put(key, provider, model_of(provider, client, payload), encode(provider, resp))
+        return resp
+
+
+_default = None
+
+
+def default_cache() -> ResponseCache:
+    """Process-wide cache, opened on first use."""
+    global _default
+    if _default is None:
+        load_env()                          # RESPONSE_CACHE may be set in .env
+        _default = ResponseCache()
+    return _default
+
+
+def cached_call(provider, client, payload, call, attempt=None):
+    return default_cache().call(provider, client, payload, call, attempt)
+
+
+def set_mode(mode):
+    if mode not in MODES:
+        raise ValueError(f"cache mode must be one of {MODES}")
+    default_cache().mode = mode
+
+
+def add_cli_flags(ap: argparse.ArgumentParser):
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("--cache-only", dest="cache_mode", action="store_const", const="cache-only",
+                   help="answer only from the response cache; no API calls")
+    g.add_argument("--refresh", dest="cache_mode", action="store_const", const="refresh",
+                   help="ignore cached responses and overwrite them")
+    g.add_argument("--no-cache", dest="cache_mode", action="store_const", const="off",
+                   help="bypass the response cache")
+
+
+def apply_cli_flags(args):
+    if getattr(args, "cache_mode", None):
+        set_mode(args.cache_mode)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Provider response cache")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="entries and size per model")
+    e = sub.add_parser("evict", help="drop least recently used entries down to a size")
+    e.add_argument("--max-mb", type=float, required=True)
+    sub.add_parser("clear", help="drop every entry")
+    args = ap.parse_args()
+
+    cache = ResponseCache(mode="use")
+    if args.cmd == "stats":
+        rows = cache.summary()
+        for provider, model, n, size in rows:
+            print(f"{provider:<10} {model:<40} {n:>6} responses  {size / 1e6:8.2f} MB")
+        print(f"{sum(r[2] for r in rows)} responses, {sum(r[3] for r in rows) / 1e6:.2f} MB in {cache.path}")
+    elif args.cmd == "evict":
+        cache.evict(int(args.max_mb * 1e6))
+        print(f"Evicted {cache.stats['evicted']} responses")
+    else:
+        cache.clear()
+        print(f"Cleared {cache.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# results_log.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Append-only attempt log behind results_{MODEL}.json.
+#
+# While a run is in flight every finished attempt is appended as one JSON
+# line to results_{MODEL}.jsonl (next to the JSON), instead of rewriting the
+# whole results file after each answer. Appends are flushed and fsync'd in
+# batches (every FSYNC_EVERY records or FSYNC_SEC seconds, and on close), so
+# a crash loses at most the last unsynced batch and never the earlier ones.
+#
+# `load` replays the log on top of the last compacted JSON, which is how an
+# interrupted run resumes. `compact` writes the merged results back to
+# results_{MODEL}.json (atomically, in the usual {pid: {name, answers}}
+# layout the checkers and docs/ expect) and then drops the log. Replaying is
+# idempotent, so a crash between those two steps is harmless.
+#
+# Attempts finish out of order, but the checkers read answers[0] / answers[1]
+# as attempts 1 and 2, so `apply` and `compact` keep every puzzle's answers
+# sorted by "attempt" whatever order they were logged in.
+#
+# Usage:
+#   python src/results_log.py compact [MODEL ...]   # fold leftover logs into the JSON
+# --------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR     = Path(__file__).resolve().parent.parent
+RESULTS_DIR  = BASE_DIR / "results"
+FSYNC_EVERY  = 32        # records per fsync
+FSYNC_SEC    = 1.0       # ... or at least this often while records arrive
+
+
+def log_path(json_path: Path) -> Path:
+    return json_path.with_suffix(".jsonl")
+
+
+def by_attempt(answers):
+    """`answers` in attempt order (entries without an attempt number last, in their order)."""
+    return sorted(answers, key=lambda a: (a.get("attempt") is None, a.get("attempt") or 0))
+
+
+def apply(results, pid, name, entry):
+    """Replace any existing entry for this attempt in a model's results dict, keeping attempt order."""
+    answers = results.get(pid, {"answers": []})["answers"]
+    answers = [a for a in answers if a.get("attempt") != entry.get("attempt")] + [entry]
+    results[pid] = {"name": name, "answers": by_attempt(answers)}
+
+
+def read_records(path: Path):
+    """Yield every record of a JSONL log, skipping a torn line left by a crash mid-append."""
+    if not path.exists():
+        return
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Only the tail can be torn (crash mid-append); anything after it is lost anyway
+                print(f"[WARN] {path.name}:{lineno}: skipping truncated record", file=sys.stderr)
+
+
+def replay(path: Path, results):
+    """Apply every record of the log at `path` to `results`; returns the number applied."""
+    n = 0
+    for rec in read_records(path):
+        apply(results, rec["pid"], rec["name"], rec["entry"])
+        n += 1
+    return n
+
+
+def load(json_path: Path):
+    """Compacted results plus whatever the log recorded since."""
+    results = json.loads(json_path.read_text()) if json_path.exists() else {}
+    replay(log_path(json_path), results)
+    return results
+
+
+def _write_atomic(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def compact(json_path: Path, results):
+    """Write `results` (answers in attempt order) as the JSON file, then drop the log it supersedes."""
+    for rec in results.values():          # samples files hold plain answer strings, already positional
+        if isinstance(rec, dict) and all(isinstance(a, dict) for a in rec.get("answers", [None])):
+            rec["answers"] = by_attempt(rec["answers"])
+    _write_atomic(json_path, json.dumps(results, indent=2))
+    log_path(json_path).unlink(missing_ok=True)
+
+
+class ResultsLog:
+    """Appender for one model's attempt log with batched fsync."""
+
+    def __init__(self, json_path: Path, fsync_every=FSYNC_EVERY, fsync_sec=FSYNC_SEC):
+        self.path = log_path(json_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self.fsync_sec = fsync_sec
+        self._f = open(self.path, "a")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, pid, name, entry):
+        self.write({"pid": pid, "name": name, "entry": entry})
+
+    def write(self, record):
+        """Append any JSON record (the fsync batching is the same)."""
+        self._f.write(json.dumps(record) + "\n")
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_sec:
+            self.sync()
+
+    def sync(self):
+        if self._pending:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compact results_{MODEL}.jsonl attempt logs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("compact", help="fold attempt logs into results_{MODEL}.json")
+    c.add_argument("models", nargs="*", help="default: every model with a leftover log")
+    args = ap.parse_args()
+
+    paths = ([RESULTS_DIR / f"results_{m}.json" for m in args.models] if args.models
+             else sorted(p.with_suffix(".json") for p in RESULTS_DIR.glob("results_*.jsonl")))
+    for json_path in paths:
+        if not log_path(json_path).exists():
+            print(f"[SKIP] no log for {json_path.name}")
+            continue
+        results = json.loads(json_path.read_text()) if json_path.exists() else {}
+        n = replay(log_path(json_path), results)
+        compact(json_path, results)
+        print(f"Compacted {n} records into {json_path.name}")
+
+
+if __name__ == "__main__":
+    main()
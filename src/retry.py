@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# retry.py
+# --------------------------------------------
+# deps: (stdlib only; errors are classified by duck typing, so no SDK import)
+#
+# One retry policy for every provider call (the safe_call_* helpers in
+# clients.py), replacing their per-SDK loops.
+#
+#   • classify(exc) sorts an exception into an error class – rate_limit
+#     (429, quota exhausted), overloaded (503 / 529), server (other 5xx),
+#     timeout, connection – or None for errors a retry cannot fix
+#     (400 / 401 / 404 …), which are raised at once.
+#   • Waits use exponential backoff with decorrelated jitter
+#     (next = uniform(BASE_DELAY, 3 × previous), capped at MAX_DELAY), so
+#     workers that failed together do not retry together. A Retry-After /
+#     retry-after-ms header, or a "try again in …" hint in the error text,
+#     overrides the backoff when present.
+#   • Each error class has its own budget of retries per call (BUDGETS);
+#     rate limits get the most since they always clear eventually.
+#   • One circuit breaker per provider: BREAKER_THRESHOLD consecutive
+#     server / overloaded / timeout / connection failures open it. While it
+#     is open no call goes out; callers wait out BREAKER_COOLDOWN, then a
+#     single probe is let through and its success closes the breaker (its
+#     failure re-opens it). Once a provider has been down for longer than
+#     BREAKER_MAX_OPEN, calls fail fast with CircuitOpen instead, and the
+#     runner leaves those attempts for the next run. Rate limits never open it.
+#   • Per-provider metrics: calls, retries by class, seconds lost waiting,
+#     give-ups and breaker trips; summary() formats them for the runners.
+#     Each wait is also added to the attempt's retry_sleep span (tracing.py).
+#
+# bench_retry.py drives this against fake_provider.py with injected faults.
+# --------------------------------------------
+
+import email.utils
+import random
+import re
+import threading
+import time
+
+import tracing
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DELAY        = 1.0      # seconds; first backoff is uniform(BASE_DELAY, 3 × BASE_DELAY)
+MAX_DELAY         = 60.0     # cap on any single wait, Retry-After included
+RETRY_CUSHION     = 0.3      # added to server-provided waits
+BREAKER_THRESHOLD = 5        # consecutive failures that open a provider's breaker
+BREAKER_COOLDOWN  = 30.0     # seconds an open breaker holds calls back before a probe
+BREAKER_MAX_OPEN  = 600.0    # provider down this long: fail calls fast instead of waiting
+BUDGETS = {                  # retries per call, by error class
+    "rate_limit": 12,
+    "overloaded": 6,
+    "server":     4,
+    "timeout":    3,
+    "connection": 4,
+}
+TRIPS_BREAKER = {"overloaded", "server", "timeout", "connection"}
+
+_HINT = re.compile(r"(?:try again|retry) in (\d+(?:\.\d+)?)\s*(ms|s)\b", re.I)
+
+
+class CircuitOpen(RuntimeError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+# ---------- classification ----------------------------------------------
+def _status(exc):
+    for obj in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "code"):
+            value = getattr(obj, attr, None)
+            if isinstance(value, int):
+                return int(value)
+    return None
+
+
+def classify(exc):
+    """Error class of a provider exception, or None if it should not be retried."""
+    status = _status(exc)
+    name = type(exc).__name__
+    if status == 429 or name in ("RateLimitError", "ResourceExhausted"):
+        return "rate_limit"
+    if status in (503, 529) or name in ("OverloadedError", "ServiceUnavailable"):
+        return "overloaded"
+    if status == 504 or "Timeout" in name or name == "DeadlineExceeded" or isinstance(exc, TimeoutError):
+        return "timeout"
+    if status is not None and status >= 500:
+        return "server"
+    if "Connection" in name or isinstance(exc, ConnectionError):
+        return "connection"
+    if status is None and any(s in str(exc).lower() for s in ("rate limit", "quota", "exhausted")):
+        return "rate_limit"              # SDKs that only say so in the message
+    return None
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait (Retry-After headers or the message), or None."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                when = email.utils.parsedate_to_datetime(value)
+                return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    m = _HINT.search(str(exc))
+    if m:
+        return float(m.group(1)) / (1000 if m.group(2).lower() == "ms" else 1)
+    return None
+
+
+# ---------- breaker + metrics --------------------------------------------
+class Breaker:
+    """Consecutive-failure circuit breaker for one provider (closed → open → half-open)."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.threshold, self.cooldown, self.clock = threshold, cooldown, clock
+        self.failures = 0
+        self.opened_at = None       # last (re-)open
+        self.down_since = None      # first open of the current outage
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """0 if a call may go out now, else seconds to wait; while half-open one probe goes out."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            remaining = self.opened_at + self.cooldown - self.clock()
+            if remaining > 0:
+                return remaining
+            if self.probing:
+                return self.cooldown / 4
+            self.probing = True
+            return 0.0
+
+    def down_for(self):
+        with self._lock:
+            return 0.0 if self.down_since is None else self.clock() - self.down_since
+
+    def success(self):
+        with self._lock:
+            self.failures, self.opened_at, self.down_since, self.probing = 0, None, None, False
+
+    def failure(self):
+        """Count a failure; returns True if this one opened (or re-opened) the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at, self.probing = self.clock(), False
+                self.down_since = self.down_since or self.opened_at
+                return True
+            return False
+
+
+class Metrics:
+    """Per-provider retry counters, safe to update from worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_provider = {}
+
+    def _get(self, provider):
+        return self.by_provider.setdefault(provider, {
+            "calls": 0, "retries": {}, "wait_sec": 0.0, "gave_up": 0, "rejected": 0, "breaker_opened": 0})
+
+    def add(self, provider, key, n=1):
+        with self._lock:
+            self._get(provider)[key] += n
+
+    def retried(self, provider, kind, wait):
+        with self._lock:
+            m = self._get(provider)
+            m["retries"][kind] = m["retries"].get(kind, 0) + 1
+            m["wait_sec"] += wait
+
+    def snapshot(self):
+        with self._lock:
+            return {p: {**m, "retries": dict(m["retries"])} for p, m in self.by_provider.items()}
+
+
+# ---------- policy -------------------------------------------------------
+class RetryPolicy:
+    """Backoff, budgets and one breaker per provider; call() runs a function under them."""
+
+    def __init__(self, base_delay=BASE_DELAY, max_delay=MAX_DELAY, budgets=None,
+                 breaker_threshold=BREAKER_THRESHOLD, breaker_cooldown=BREAKER_COOLDOWN,
+                 breaker_max_open=BREAKER_MAX_OPEN, sleep=time.sleep, clock=time.monotonic):
+        self.base_delay, self.max_delay = base_delay, max_delay
+        self.budgets = {**BUDGETS, **(budgets or {})}
+        self.breaker_threshold, self.breaker_cooldown = breaker_threshold, breaker_cooldown
+        self.breaker_max_open = breaker_max_open
+        self.sleep, self.clock = sleep, clock
+        self.metrics = Metrics()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider):
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = Breaker(self.breaker_threshold, self.breaker_cooldown, self.clock)
+            return self._breakers[provider]
+
+    def backoff(self, previous):
+        """Decorrelated jitter: uniform(base, 3 × previous wait), capped."""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous) * 3))
+
+    def call(self, provider, fn):
+        """fn() with retries on transient errors; raises the last error once its class's budget is spent."""
+        breaker = self.breaker(provider)
+        used = {}
+        delay = self.base_delay
+        self.metrics.add(provider, "calls")
+        while True:
+            hold = breaker.admit()
+            if hold:
+                if breaker.down_for() > self.breaker_max_open:
+                    self.metrics.add(provider, "rejected")
+                    raise CircuitOpen(f"{provider}: down for {breaker.down_for():.0f}s "
+                                      f"({breaker.failures} consecutive failures)")
+                self.metrics.add(provider, "wait_sec", hold)
+                self.sleep(hold)
+                tracing.add("retry_sleep", hold)
+                continue
+            try:
+                result = fn()
+            except Exception as e:
+                kind = classify(e)
+                if kind not in TRIPS_BREAKER:
+                    breaker.success()            # the provider answered, just not with a result
+                elif breaker.failure():
+                    self.metrics.add(provider, "breaker_opened")
+                    print(f"[WARN] {provider}: circuit breaker open for {breaker.cooldown:.0f}s ({kind}: {e})")
+                if kind is None:
+                    raise
+                used[kind] = used.get(kind, 0) + 1
+                if used[kind] > self.budgets.get(kind, 0):
+                    self.metrics.add(provider, "gave_up")
+                    raise
+                hint = retry_after(e)
+                delay = self.backoff(delay)
+                wait = min(self.max_delay, hint + RETRY_CUSHION) if hint is not None else delay
+                self.metrics.retried(provider, kind, wait)
+                self.sleep(wait)
+                tracing.add("retry_sleep", wait)
+                continue
+            breaker.success()
+            return result
+
+
+_policy = RetryPolicy()
+
+
+def get_policy() -> RetryPolicy:
+    return _policy
+
+
+def set_policy(policy: RetryPolicy):
+    """Swap the process-wide policy (fresh breakers and metrics), e.g. for benchmarks."""
+    global _policy
+    _policy = policy
+
+
+def with_retries(provider, fn):
+    return _policy.call(provider, fn)
+
+
+def summary():
+    """One line per provider: retries by class, seconds lost waiting, give-ups, breaker trips."""
+    lines = []
+    for provider, m in sorted(_policy.metrics.snapshot().items()):
+        retries = ", ".join(f"{k} {v}" for k, v in sorted(m["retries"].items())) or "none"
+        lines.append(f"{provider}: {m['calls']} calls, retries: {retries}; {m['wait_sec']:.1f}s waiting, "
+                     f"{m['gave_up']} gave up, breaker opened {m['breaker_opened']}x, {m['rejected']} rejected")
+    return lines
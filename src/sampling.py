@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# sampling.py
+# --------------------------------------------
+# deps: openai, anthropic, google-generativeai, pillow, python-dotenv
+#
+# Multi-sample mode: k independent answers per puzzle instead of the two
+# fixed attempts of benchmark_reasoning.py, for pass@k, majority-vote and
+# self-consistency accuracy (graded by check_accuracy_regex.py --samples and
+# check_accuracy_llm.py --samples).
+#
+# The k samples of a puzzle go out concurrently through the same engine.Engine
+# setup as benchmark_reasoning (one Engine per provider under its quota,
+# providers in parallel). OpenAI chat models take the `n` parameter, so their
+# samples are requested N_PER_REQUEST at a time in one call, sharing the
+# prompt tokens; o-series, Claude and Gemini get one request per sample. Each
+# request is its own response-cache entry (keyed "samples-" + its first sample
+# number, so a sample never replays benchmark_reasoning's attempt), and a re-run with a larger k only requests the missing samples.
+#
+# Results are stored compactly in results/samples_{MODEL}.json, one record per
+# puzzle:
+#   {"name": …, "temperature": T, "answers": [k strings], "completion_tokens": [k ints],
+#    "prompt_tokens": n}
+# with answers[i] the (i+1)-th sample; null marks a sample still missing. As
+# with results_{MODEL}.json, finished requests are appended to
+# samples_{MODEL}.jsonl while a run is in flight and folded in at the end.
+#
+# --adaptive stops sampling a puzzle once its outcome is decided. Each puzzle
+# starts with WAVE samples in flight; every sample that comes back is graded
+# at once with check_accuracy_regex.answers_match, and the puzzle stops when
+#   • solved – a sample matches the ground truth (solved within k is decided), or
+#   • agreed – AGREE samples agree on one answer, or the leading answer can no
+#     longer be overtaken within k (the majority vote is decided);
+# otherwise its next sample (the next WAVE for models that take `n`) is
+# requested, up to k. Queued samples of a stopped puzzle are dropped, so the
+# quota goes to puzzles that are still undecided. A failed request does not
+# end its puzzle: the next queued sample goes out in its place, and puzzles
+# left undecided short of k samples are reported for a re-run.
+# Stopped puzzles have fewer than k samples: their majority vote and solved
+# flag are final, but pass@k for k > 1 is only exact on full-k puzzles. The
+# run reports the samples and API calls saved against plain k sampling.
+#
+# Usage:
+#   python src/sampling.py [MODEL ...] [-k 8] [--temperature 0.7] [--adaptive [--agree 3] [--stop solved agreed]]
+#                          [--cache-only | --refresh | --no-cache]
+# --------------------------------------------
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+from datetime import datetime as dt
+from pathlib import Path
+
+import results_log
+from token_estimate import estimate
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR      = Path(__file__).resolve().parent.parent
+RESULTS_DIR   = BASE_DIR / "results"
+DEFAULT_K     = 8
+MAX_K         = 32
+TEMPERATURE   = 0.7       # enough spread for the samples to disagree
+N_PER_REQUEST = 8         # OpenAI `n` per request (bounds the cost of one failed call)
+WAVE          = 2         # --adaptive: samples in flight per undecided puzzle
+AGREE         = 3         # --adaptive: agreeing samples that settle a puzzle's majority vote
+STOP_RULES    = ("solved", "agreed")
+
+
+def samples_path(model):
+    return RESULTS_DIR / f"samples_{model}.json"
+
+
+def apply(samples, pid, name, entry):
+    """Put a request's answers at their sample positions (idempotent, so a log replays safely)."""
+    rec = samples.setdefault(pid, {"name": name, "temperature": entry["temperature"],
+                                   "answers": [], "completion_tokens": [], "prompt_tokens": None})
+    end = entry["sample"] - 1 + len(entry["answers"])
+    for key in ("answers", "completion_tokens"):
+        rec[key].extend([None] * (end - len(rec[key])))
+        rec[key][entry["sample"] - 1:end] = entry[key]
+    rec["prompt_tokens"] = entry["prompt_tokens"]
+
+
+def load_samples(model):
+    """samples_{MODEL}.json with the log of an interrupted run replayed on top."""
+    path = samples_path(model)
+    samples = json.loads(path.read_text()) if path.exists() else {}
+    for rec in results_log.read_records(results_log.log_path(path)):
+        apply(samples, rec["pid"], rec["name"], rec["entry"])
+    return samples
+
+
+def missing(rec, k):
+    """Sample numbers 1..k with no non-empty answer yet."""
+    answers = rec.get("answers", []) if rec else []
+    return [i for i in range(1, k + 1) if i > len(answers) or not (answers[i - 1] or "").strip()]
+
+
+def uses_n(provider, model):
+    from providers import is_reasoning_model
+    return provider == "openai" and not is_reasoning_model(model)
+
+
+def runs(numbers, size):
+    """Consecutive stretches of `numbers` as (first, count), each at most `size` long."""
+    out = []
+    for i in numbers:
+        if out and out[-1][0] + out[-1][1] == i and out[-1][1] < size:
+            out[-1] = (out[-1][0], out[-1][1] + 1)
+        else:
+            out.append((i, 1))
+    return out
+
+
+# ---------- adaptive early stopping ---------------------------------------
+class EarlyStop:
+    """Incremental regex grading of each puzzle's samples, and the rule that stops it."""
+
+    def __init__(self, k, agree=AGREE, rules=STOP_RULES):
+        self.k, self.agree, self.rules = k, agree, set(rules)
+        self.puzzles = {}                 # (model, pid) → grading state
+        self.budget = collections.defaultdict(collections.Counter)   # model → what plain k sampling would request
+
+    def track(self, key, truth, answers):
+        """Start grading a puzzle from the answers it already has; returns its stop reason or None."""
+        self.puzzles[key] = {"truth": truth, "forms": [], "solved": False, "drawn": 0, "stopped": None}
+        return self.add(key, answers)
+
+    def add(self, key, answers):
+        """Grade newly drawn samples of a puzzle; returns its stop reason or None."""
+        from check_accuracy_regex import answers_match, canonical
+        st = self.puzzles[key]
+        for a in answers:
+            st["drawn"] += 1
+            a = (a or "").strip()
+            if a:
+                st["forms"].append(canonical(a))
+                st["solved"] = st["solved"] or bool(st["truth"]) and answers_match(a, st["truth"])
+        if st["stopped"] is None:
+            if "solved" in self.rules and st["solved"]:
+                st["stopped"] = "solved"
+            elif "agreed" in self.rules and self._agreed(st):
+                st["stopped"] = "agreed"
+            elif st["drawn"] >= self.k:
+                st["stopped"] = "budget"
+        return st["stopped"]
+
+    def _agreed(self, st):
+        forms = st["forms"]
+        support = [sum(1 for g in forms if not f.isdisjoint(g)) for f in forms]
+        if not support:
+            return False
+        lead = max(support)
+        leader = forms[support.index(lead)]
+        rival = max((n for f, n in zip(forms, support) if f.isdisjoint(leader)), default=0)
+        return lead >= self.agree or lead > rival + self.k - st["drawn"]
+
+    def stopped(self, key):
+        return self.puzzles[key]["stopped"] is not None
+
+    def summary(self, model, drawn, calls):
+        """One report line for a model: samples / API calls saved and why its puzzles stopped."""
+        reasons = collections.Counter(st["stopped"] or "open" for (m, _), st in self.puzzles.items() if m == model)
+        budget = self.budget[model]
+        if not reasons:
+            return "adaptive: nothing left to sample"
+        return (f"adaptive: {drawn}/{budget['samples']} samples drawn, {budget['samples'] - drawn} saved; "
+                f"{calls}/{budget['calls']} API calls, {budget['calls'] - calls} saved; "
+                f"stopped: {', '.join(f'{r} {n}' for r, n in reasons.most_common())}")
+
+
+def build_jobs(provider, model, samples, k, temperature, stopper=None):
+    """One job per request still needed for k samples of every puzzle.
+
+    With an EarlyStop `stopper` only the first WAVE samples of each undecided
+    puzzle become jobs; the rest wait in the job's shared "queued" list.
+    """
+    import benchmark_reasoning as br
+    size = N_PER_REQUEST if uses_n(provider, model) else 1
+    jobs = []
+    for row in br.puzzle_rows():
+        if not isinstance(row.get("puzzleText"), str):
+            continue
+        pid = str(int(row["id"]))
+        todo = missing(samples.get(pid), k)
+        if not todo:
+            continue
+        queued = []
+        if stopper:
+            truth = "" if row["answer"] is None else str(row["answer"]).strip()
+            have = [a for a in samples.get(pid, {}).get("answers", []) if (a or "").strip()]
+            if stopper.track((model, pid), truth, have):
+                continue
+            stopper.budget[model]["samples"] += len(todo)
+            stopper.budget[model]["calls"] += len(runs(todo, size))
+            todo, queued = todo[:WAVE], todo[WAVE:]
+        built = time.monotonic()
+        prompt = br.build_prompt(provider, row, model=model)
+        encode_sec = time.monotonic() - built
+        tokens = estimate(provider, model, prompt, key=(pid, False))
+        for first, n in runs(todo, size):
+            job = {"model": model, "pid": pid, "name": row["name"], "attempt": first, "n": n,
+                   "temperature": temperature, "prompt": prompt, "tokens": tokens,
+                   "encode_sec": encode_sec}
+            if stopper:
+                job.update(queued=queued, step=min(size, WAVE),
+                           stale=lambda key=(model, pid): stopper.stopped(key))
+            jobs.append(job)
+            encode_sec = 0.0
+    return jobs
+
+
+def next_job(job):
+    """The follow-up request for the next of `job`'s queued samples, as a list (empty when none are left)."""
+    if not job["queued"]:
+        return []
+    first, n = runs(job["queued"], job["step"])[0]
+    del job["queued"][:n]
+    return [{**job, "attempt": first, "n": n, "encode_sec": 0.0}]
+
+
+def call_samples(provider, client, model, job, limiter=None):
+    """One request for job["n"] samples; returns the entry `apply` stores (runs in a worker thread)."""
+    import benchmark_reasoning as br
+    if job["n"] == 1:
+        # the same cache namespace as the n > 1 request, apart from benchmark_reasoning's attempts
+        e = br.call_attempt(provider, client, model, {**job, "attempt": f"samples-{job['attempt']}"}, limiter)
+        answers, completion, prompt = [e["answer"]], [e["completion_tokens"]], e["prompt_tokens"]
+    else:
+        from clients import safe_call_openai
+        print(f"{dt.now().time()}  {model}  Puzzle {job['pid']}  samples {job['attempt']}-"
+              f"{job['attempt'] + job['n'] - 1}")
+        kwargs = {**br.openai_kwargs(model, job), "n": job["n"]}          # max_tokens is per choice
+        resp = safe_call_openai(client=client, limiter=limiter, attempt=f"samples-{job['attempt']}", **kwargs)
+        answers = [(c.message.content or "").strip() for c in resp.choices]
+        # usage is only reported for the whole request; split it evenly over the choices
+        completion = [resp.usage.completion_tokens // max(1, len(answers))] * len(answers)
+        prompt = resp.usage.prompt_tokens
+    return {"sample": job["attempt"], "temperature": job["temperature"], "answers": answers,
+            "completion_tokens": completion, "prompt_tokens": prompt,
+            "total_tokens": prompt + sum(c or 0 for c in completion)}
+
+
+async def run_provider(provider, models, k, temperature, tracer=None, stopper=None):
+    """k samples per puzzle for every model of one provider through a single Engine (shared quota)."""
+    from clients import get_client
+    from engine import Engine
+    from providers import PROVIDER_LIMITS
+    from ratelimit import RateLimiter
+    from response_cache import default_cache
+    print(f"\n=== Sampling {provider.upper()} k={k} T={temperature}: {', '.join(models)} ===")
+
+    samples = {model: load_samples(model) for model in models}
+    jobs = await asyncio.to_thread(
+        lambda: [job for m in models for job in build_jobs(provider, m, samples[m], k, temperature, stopper)])
+    limits = PROVIDER_LIMITS[provider]
+    limiter = None if default_cache().mode == "cache-only" else RateLimiter(rpm=limits["rpm"], tpm=limits["tpm"])
+    call = lambda job: call_samples(provider, get_client(provider, job["model"]), job["model"], job, limiter)
+    logs = {model: results_log.ResultsLog(samples_path(model)) for model in models}
+
+    drawn = collections.Counter()
+    calls = collections.Counter()
+
+    def record(job, entry):
+        apply(samples[job["model"]], job["pid"], job["name"], entry)
+        logs[job["model"]].append(job["pid"], job["name"], entry)
+        if stopper is None:
+            return None
+        drawn[job["model"]] += len(entry["answers"])
+        calls[job["model"]] += 1
+        # undecided: its next sample takes the place of this one
+        if stopper.add((job["model"], job["pid"]), entry["answers"]):
+            return None
+        return next_job(job)
+
+    def failed(job, error):
+        # the failed samples stay missing for a re-run; the queued ones still go out
+        if stopper is None or stopper.stopped((job["model"], job["pid"])):
+            return None
+        return next_job(job)
+
+    engine = Engine(provider, call, concurrency=limits["concurrency"], limiter=limiter, tracer=tracer)
+    try:
+        stats = await engine.run(jobs, record, failed)
+    finally:
+        for model, log in logs.items():
+            log.close()
+            results_log.compact(samples_path(model), samples[model])
+
+    for model in models:
+        if stopper:
+            short = sum(1 for (m, _), st in stopper.puzzles.items() if m == model and st["stopped"] is None)
+            print(f"✓ {model}: {len(samples[model])} puzzles → {samples_path(model).name}"
+                  + (f"  ({short} undecided and short of {k} samples)" if short else ""))
+            print(f"  {stopper.summary(model, drawn[model], calls[model])}")
+            continue
+        short = sum(1 for rec in samples[model].values() if missing(rec, k))
+        print(f"✓ {model}: {len(samples[model])} puzzles → {samples_path(model).name}"
+              + (f"  ({short} still short of {k} samples)" if short else ""))
+    print(f"  {provider}: {stats['requests']} requests, {stats['failed']} failed, "
+          + (f"{stats['skipped']} dropped, " if stats["skipped"] else "")
+          + f"{stats['elapsed']:.1f}s, {stats['rps']:.2f} req/s")
+    return stats
+
+
+async def run_models(models, k, temperature, trace=True, stopper=None):
+    """Sample every provider present in `models` at the same time."""
+    import retry
+    import tracing
+    from providers import group_by_provider
+    from response_cache import default_cache
+    start = time.monotonic()
+    tracer = tracing.TraceWriter() if trace else None
+    try:
+        await asyncio.gather(*(run_provider(p, ms, k, temperature, tracer, stopper)
+                               for p, ms in group_by_provider(models).items()))
+    finally:
+        if tracer:
+            tracer.close()
+    cache = default_cache().stats
+    print(f"\nAll providers done in {time.monotonic() - start:.1f}s  "
+          f"(response cache: {cache['hits']} hits, {cache['misses']} misses)")
+    for line in retry.summary():
+        print(f"  retries  {line}")
+
+
+def main():
+    from benchmark_reasoning import MODELS
+    from response_cache import add_cli_flags, apply_cli_flags
+    ap = argparse.ArgumentParser(description="k samples per puzzle for pass@k / majority-vote grading")
+    ap.add_argument("models", nargs="*", default=MODELS)
+    ap.add_argument("-k", type=int, default=DEFAULT_K, help=f"samples per puzzle (1-{MAX_K})")
+    ap.add_argument("--temperature", type=float, default=TEMPERATURE,
+                    help="sampling temperature (o-series models ignore it)")
+    ap.add_argument("--adaptive", action="store_true", help="stop sampling a puzzle once its outcome is decided")
+    ap.add_argument("--agree", type=int, default=AGREE, help="--adaptive: agreeing samples that stop a puzzle")
+    ap.add_argument("--stop", nargs="+", choices=STOP_RULES, default=list(STOP_RULES),
+                    help="--adaptive: rules that stop a puzzle before k samples")
+    ap.add_argument("--no-trace", action="store_true", help="don't write results/traces/run_*.jsonl")
+    add_cli_flags(ap)
+    args = ap.parse_args()
+    if not 1 <= args.k <= MAX_K:
+        ap.error(f"-k must be between 1 and {MAX_K}")
+    apply_cli_flags(args)
+    stopper = EarlyStop(args.k, args.agree, args.stop) if args.adaptive else None
+    asyncio.run(run_models(args.models, args.k, args.temperature, not args.no_trace, stopper))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# scraper.py
+# --------------------------------------------
+# deps: requests, beautifulsoup4, pandas
+#
+# Jane Street puzzle archive scraper (replaces notebooks/scrape_janestreet.ipynb).
+#
+#   • one pooled requests.Session (keep-alive, retries with backoff on
+#     429/5xx) shared by CONCURRENCY workers running through engine.Engine
+#   • conditional requests: every page and image is kept in .cache/http/
+#     with its ETag / Last-Modified, and re-requested with If-None-Match /
+#     If-Modified-Since, so a refresh of unchanged pages is a string of 304s
+#   • solver counts are parsed from the solution page's HTML
+#     (p.correct-submissions, one <br> per solver) with no browser; if a page
+#     does not carry the list, the existing count is kept
+#   • incremental by default: the archive is walked newest-first and stops at
+#     the first page with nothing new; only puzzles missing from puzzles.csv
+#     (or whose solution has been published since) are fetched. --full
+#     re-scrapes every puzzle.
+#
+# Rows are matched by puzzle name, since a puzzle's link changes when it
+# stops being the current puzzle. Existing puzzles keep their id and
+# `answer`; new puzzles get the next ids
+# and go to the top of the CSV, so row 0 stays the current month. Images are
+# saved as <i>_0.<ext> under puzzle_images/<name>/ and solution_images/<name>/
+# next to the CSV; files already present are not downloaded again.
+#
+# Offline: --fixtures DIR serves every URL from saved pages (see
+# data/fixtures/janestreet/); --record DIR saves what a live run fetched.
+#
+# Usage:
+#   python src/scraper.py                    # add new puzzles to puzzles.csv
+#   python src/scraper.py --full
+#   python src/scraper.py --fixtures data/fixtures/janestreet --csv /tmp/puzzles.csv
+# --------------------------------------------
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+from engine import Engine
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR     = Path(__file__).resolve().parent.parent
+CSV_PATH     = BASE_DIR / "data" / "puzzles" / "puzzles.csv"
+HTTP_CACHE   = BASE_DIR / ".cache" / "http"
+SITE_URL     = "https://www.janestreet.com/"
+ARCHIVE_URL  = "https://www.janestreet.com/puzzles/archive/"
+CONCURRENCY  = 8
+TIMEOUT      = 30
+USER_AGENT   = "jane-street-bench scraper"
+COLUMNS      = ["id", "name", "date", "puzzleLink", "puzzleText", "hasImage", "imagePaths",
+                "hasSolution", "solutionLink", "solutionText", "solutionHasImages",
+                "solutionImagePaths", "numSolvers", "answer"]
+
+
+# ---------- HTTP ---------------------------------------------------------
+def fixture_name(url: str) -> str:
+    """File name a URL is saved under in a fixture directory."""
+    path = urlparse(url).path.strip("/") or "index"
+    name = path.replace("/", "_")
+    return name if os.path.splitext(name)[1] else name + ".html"
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class Fetcher:
+    """Pooled, conditional GETs with an on-disk validator cache; safe to share across threads."""
+
+    def __init__(self, cache_dir=HTTP_CACHE, record_dir=None, concurrency=CONCURRENCY):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self.cache_dir = cache_dir
+        self.record_dir = record_dir
+        retry = Retry(total=4, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def _count(self, what):
+        with self._lock:
+            self.stats[what] += 1
+
+    def get(self, url):
+        """(status, body bytes); a 304 is answered from the cache as a 200."""
+        meta_path, body_path = self._paths(url)
+        headers = {}
+        if meta_path.exists() and body_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        r = self.session.get(url, headers=headers, timeout=TIMEOUT)
+        if r.status_code == 304:
+            self._count("not_modified")
+            body = body_path.read_bytes()
+        elif r.status_code == 200:
+            self._count("fetched")
+            body = r.content
+            _write_atomic(body_path, body)
+            _write_atomic(meta_path, json.dumps({"url": url, "etag": r.headers.get("ETag"),
+                                                 "last_modified": r.headers.get("Last-Modified")}).encode())
+        else:
+            self._count(f"http_{r.status_code}")
+            return r.status_code, b""
+        if self.record_dir:
+            _write_atomic(Path(self.record_dir) / fixture_name(url), body)
+        return 200, body
+
+
+class FixtureFetcher:
+    """Fetcher stand-in that serves URLs from a directory of saved pages (404 if absent)."""
+
+    def __init__(self, fixture_dir):
+        self.dir = Path(fixture_dir)
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        path = self.dir / fixture_name(url)
+        with self._lock:
+            self.stats["fetched" if path.exists() else "http_404"] += 1
+        return (200, path.read_bytes()) if path.exists() else (404, b"")
+
+
+# ---------- PARSING ------------------------------------------------------
+def _soup(html):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, "html.parser")
+
+
+def parse_archive(html, page_url=ARCHIVE_URL):
+    """Archive listing → [{date, name, puzzleLink, solutionLink}] in page order."""
+    soup = _soup(html)
+    entries = []
+    for row in soup.find_all("div", class_="row puzzle-row archive-list"):
+        date_tag = row.find("span", class_="date")
+        name_tag = row.find("span", class_="name")
+        puzzle_link_tag = row.find("a", class_="puzzle-link")
+        solution_link_tag = row.find("a", class_="solution-link")
+        if not puzzle_link_tag:
+            continue
+        entries.append({
+            "date": date_tag.text.strip().rstrip(":") if date_tag else "",
+            "name": name_tag.text.strip() if name_tag else "",
+            "puzzleLink": urljoin(page_url, puzzle_link_tag["href"]),
+            "solutionLink": urljoin(page_url, solution_link_tag["href"]) if solution_link_tag else None,
+        })
+    return entries
+
+
+def parse_body(html):
+    """Puzzle / solution page → (text, [image urls]) from the main page column."""
+    soup = _soup(html)
+    body = soup.find("div", class_="page-column row")
+    if not body:
+        return "", []
+    text = "\n".join(t for p in body.find_all("p") if (t := p.get_text(strip=True)))
+    images = [urljoin(SITE_URL, img["src"]) for img in body.find_all("img") if img.get("src")]
+    return text, images
+
+
+def parse_solvers(html):
+    """Number of solvers listed on a page (one <br> per name), or None if the list is absent."""
+    soup = _soup(html)
+    tag = soup.select_one("p.correct-submissions")
+    return None if tag is None else len(tag.find_all("br"))
+
+
+# ---------- SCRAPING -----------------------------------------------------
+def archive_url(page):
+    return ARCHIVE_URL if page == 1 else f"{ARCHIVE_URL}page{page}/index.html"
+
+
+def pending(entry, existing):
+    """True if an archive entry is missing from the CSV or has gained a solution since."""
+    old = existing.get(entry["name"])
+    return old is None or (bool(entry["solutionLink"]) and not old.get("hasSolution"))
+
+
+def walk_archive(fetcher, existing=None, incremental=True):
+    """Archive entries newest-first; in incremental mode stop after the first page with nothing new."""
+    existing = existing or {}
+    entries, page = [], 1
+    while True:
+        status, html = fetcher.get(archive_url(page))
+        if status != 200:
+            print(f"Stopped at page {page}")
+            break
+        found = parse_archive(html, archive_url(page))
+        if not found:
+            print(f"No puzzles, stopped at page {page}")
+            break
+        entries.extend(found)
+        if incremental and not any(pending(e, existing) for e in found):
+            break
+        page += 1
+    return entries
+
+
+def download_images(fetcher, urls, folder: Path, root: Path):
+    """Save images as <i>_0.<ext> (skipping files already there); paths relative to `root`."""
+    paths = []
+    for i, url in enumerate(urls):
+        path = folder / f"{i}_0{os.path.splitext(urlparse(url).path)[1]}"
+        if not path.exists():
+            status, data = fetcher.get(url)
+            if status != 200:
+                continue
+            _write_atomic(path, data)
+        paths.append(str(path.relative_to(root)))
+    return paths
+
+
+def scrape_entry(fetcher, entry, root: Path):
+    """Full CSV row (minus id / answer) for one archive entry."""
+    row = {
+        "name": entry["name"],
+        "date": entry["date"],
+        "puzzleLink": entry["puzzleLink"],
+        "puzzleText": "",
+        "hasImage": False,
+        "imagePaths": "",
+        "hasSolution": bool(entry["solutionLink"]),
+        "solutionLink": entry["solutionLink"] or "",
+        "solutionText": "",
+        "solutionHasImages": False,
+        "solutionImagePaths": "",
+        "numSolvers": None,
+    }
+    status, html = fetcher.get(entry["puzzleLink"])
+    if status != 200:
+        raise RuntimeError(f"puzzle page {entry['puzzleLink']}: HTTP {status}")
+    row["puzzleText"], images = parse_body(html)
+    paths = download_images(fetcher, images, root / "puzzle_images" / entry["name"], root)
+    row["hasImage"], row["imagePaths"] = bool(paths), ";".join(paths)
+    solvers_html = html
+
+    if entry["solutionLink"]:
+        status, sol_html = fetcher.get(entry["solutionLink"])
+        if status == 200:
+            row["solutionText"], images = parse_body(sol_html)
+            paths = download_images(fetcher, images, root / "solution_images" / entry["name"], root)
+            row["solutionHasImages"], row["solutionImagePaths"] = bool(paths), ";".join(paths)
+            solvers_html = sol_html
+        else:
+            print(f"[WARN] {entry['name']}: solution page HTTP {status}")
+    row["numSolvers"] = parse_solvers(solvers_html)
+    return row
+
+
+async def scrape_entries(fetcher, entries, root, concurrency):
+    rows = {}
+    jobs = [{"label": e["name"], "entry": e} for e in entries]
+    engine = Engine("scrape", lambda job: scrape_entry(fetcher, job["entry"], root), concurrency=concurrency)
+    stats = await engine.run(jobs, lambda job, row: rows.__setitem__(job["entry"]["name"], row))
+    return rows, stats
+
+
+def merge(existing, entries, scraped):
+    """New puzzles on top with fresh ids; re-scraped ones keep id, answer and (if unparsed) numSolvers."""
+    import pandas as pd
+    by_name = {r["name"]: r for r in existing.to_dict("records")}
+    next_id = int(existing["id"].max()) + 1 if len(existing) else 0
+    new_rows = []
+    for entry in reversed(entries):                 # oldest new puzzle gets the smallest new id
+        name = entry["name"]
+        if name not in scraped:
+            continue
+        row = scraped[name]
+        if name in by_name:
+            old = by_name[name]
+            if row["numSolvers"] is None:
+                row["numSolvers"] = old.get("numSolvers")
+            by_name[name] = {**old, **row}
+        else:
+            new_rows.append({"id": next_id, **row, "answer": None})
+            next_id += 1
+    if not len(existing):                           # first scrape: number in archive order, like the notebook did
+        for i, row in enumerate(reversed(new_rows)):
+            row["id"] = i
+    rows = list(reversed(new_rows)) + [by_name[r["name"]] for r in existing.to_dict("records")]
+    return pd.DataFrame(rows, columns=COLUMNS), len(new_rows)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scrape the Jane Street puzzle archive into puzzles.csv")
+    ap.add_argument("--csv", type=Path, default=CSV_PATH)
+    ap.add_argument("--full", action="store_true", help="re-scrape every puzzle, not just new ones")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--fixtures", type=Path, help="serve pages from saved fixtures (offline)")
+    ap.add_argument("--record", type=Path, help="save every fetched page into this fixture dir")
+    args = ap.parse_args()
+
+    import pandas as pd
+    fetcher = FixtureFetcher(args.fixtures) if args.fixtures \
+        else Fetcher(record_dir=args.record, concurrency=args.concurrency)
+    existing = pd.read_csv(args.csv) if args.csv.exists() else pd.DataFrame(columns=COLUMNS)
+    known = {r["name"]: r for r in existing.to_dict("records")}
+
+    entries = walk_archive(fetcher, known, incremental=not args.full)
+    todo = entries if args.full else [e for e in entries if pending(e, known)]
+    print(f"{len(entries)} archive entries seen, {len(todo)} to scrape")
+    if not todo:
+        return
+
+    scraped, stats = asyncio.run(scrape_entries(fetcher, todo, args.csv.parent, args.concurrency))
+    df, added = merge(existing, entries, scraped)
+    args.csv.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(args.csv, df.to_csv(index=False).encode())
+    print(f"Wrote {args.csv} ({added} new, {len(scraped) - added} refreshed, {stats['failed']} failed, "
+          f"{stats['elapsed']:.1f}s)  http: {dict(fetcher.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# streaming.py
+# --------------------------------------------
+# deps: (stdlib only; the provider streams are opened in clients.py)
+#
+# Reads a streamed completion and stops as soon as it has what we need,
+# instead of waiting for the whole response:
+#
+#   • a stop tag – the closing ANSWER_CLOSE of an answer the prompt asked to
+#     be wrapped in <answer>…</answer>. Where the API takes stop sequences
+#     the tag is also sent as one, so the provider itself ends the stream
+#     (and still reports usage); the tag is then not in the text;
+#   • a cap on completion tokens (estimated at CHARS_PER_TOKEN while reading,
+#     since usage only arrives with the final chunk).
+#
+# Each call records time-to-first-token and total latency. read_stream()
+# takes the provider's event iterator plus small accessors (text, usage and
+# finish reason of an event) and returns a StreamResult; clients.stream_*
+# wire it to the three SDKs. Closing the stream early drops the connection,
+# so the provider stops generating (and billing) visible tokens. Reasoning
+# models think before their first visible token, so their hidden budget is
+# capped on the request instead (see benchmark_reasoning.REASONING_CAP).
+# --------------------------------------------
+
+from __future__ import annotations
+
+import dataclasses
+import re
+import time
+
+# ---------- CONFIG -------------------------------------------------------
+ANSWER_OPEN     = "<answer>"
+ANSWER_CLOSE    = "</answer>"
+ANSWER_HINT     = f"Put the final answer between {ANSWER_OPEN} and {ANSWER_CLOSE}."
+CHARS_PER_TOKEN = 4
+
+_ANSWER = re.compile(re.escape(ANSWER_OPEN) + r"(.*?)" + re.escape(ANSWER_CLOSE), re.S)
+
+
+@dataclasses.dataclass
+class StreamResult:
+    """Text read from a stream, its usage, timings and why reading stopped."""
+    text: str
+    prompt_tokens: int | None
+    completion_tokens: int | None
+    ttft_sec: float | None           # None if no visible token arrived
+    latency_sec: float
+    stop: str                        # "tag", "cap" or "end" (the stream finished on its own)
+    cached_tokens: int = 0           # prompt tokens served from the provider's prompt cache
+    cache_write_tokens: int = 0      # ... and written to it (Anthropic)
+
+    @property
+    def total_tokens(self):
+        if self.prompt_tokens is None or self.completion_tokens is None:
+            return None
+        return self.prompt_tokens + self.completion_tokens
+
+
+def answer_of(text: str) -> str:
+    """The text inside the first <answer>…</answer> (closing tag optional), else the whole text, stripped."""
+    m = _ANSWER.search(text)
+    if m:
+        return m.group(1).strip()
+    head, tag, rest = text.partition(ANSWER_OPEN)
+    return (rest if tag else head).strip()
+
+
+def read_stream(events, text_of, usage_of, finish_of=lambda e: None, stop_tags=(ANSWER_CLOSE,),
+                max_tokens=None, close=None, start=None):
+    """Consume `events` until a stop tag, the token cap or the end of the stream.
+
+    text_of(event) -> new text or "", usage_of(event) -> (prompt, completion) with None
+    for unknown parts, optionally followed by (cache read, cache write), finish_of(event) -> "tag" / "cap" when the provider ended the
+    stream on a stop sequence / its token limit, else None. `close()` is called when
+    reading stops early; `start` is the monotonic time the request was sent (default now).
+    """
+    start = time.monotonic() if start is None else start
+    parts, chars, ttft = [], 0, None
+    prompt_tokens = completion_tokens = None
+    cache = [0, 0]
+    stop = finished = None
+    for event in events:
+        finished = finish_of(event) or finished
+        p, c, *cached = usage_of(event)
+        prompt_tokens = p if p is not None else prompt_tokens
+        completion_tokens = c if c is not None else completion_tokens
+        cache = [new if new is not None else old for new, old in zip(cached, cache)] + cache[len(cached):]
+        piece = text_of(event)
+        if not piece:
+            continue
+        if ttft is None:
+            ttft = time.monotonic() - start
+        parts.append(piece)
+        chars += len(piece)
+        # a tag can straddle two events, so look at the tail of what has been read
+        tail = "".join(parts[-3:])
+        if any(tag in tail for tag in stop_tags):
+            stop = "tag"
+        elif max_tokens is not None and chars >= max_tokens * CHARS_PER_TOKEN:
+            stop = "cap"
+        if stop:
+            if close:
+                close()
+            break
+    text = "".join(parts)
+    if stop or completion_tokens is None:
+        completion_tokens = max(completion_tokens or 0, -(-len(text) // CHARS_PER_TOKEN))
+    if stop is None:
+        # an API-side stop sequence drops the closing tag, leaving an unclosed answer
+        unclosed = ANSWER_OPEN in text and ANSWER_CLOSE not in text
+        stop = finished or ("tag" if unclosed else "end")
+    return StreamResult(text, prompt_tokens, completion_tokens, ttft, time.monotonic() - start, stop, *cache)
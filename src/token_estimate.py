@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# token_estimate.py
+# --------------------------------------------
+# deps: pillow; tiktoken (optional – without it text is estimated at
+#       CHARS_PER_TOKEN characters per token)
+#
+# Prompt token estimates for the rate limiters' TPM budget.
+#
+# Counting len() of a prompt / 4 charges an image puzzle for its whole
+# base64 data URL – tens of thousands of "tokens" for a picture the provider
+# bills at a few hundred – so the TPM budget throttled image-heavy runs far
+# too hard. Here text goes through a real tokenizer (tiktoken; other
+# providers' tokenizers are not public, so OPENAI_ENCODING stands in for
+# them) and every image is charged what its provider bills for it:
+#
+#   • OpenAI, tiles: scaled to fit 2048×2048, then so its short side is at
+#     most 768; BASE + TILE per 512px tile (OPENAI_TILES, by model prefix).
+#   • OpenAI, patches (OPENAI_PATCHES models): one token per 32px patch,
+#     at most 1536 patches, times the model's multiplier.
+#   • Anthropic: width × height / 750, after scaling the long side to 1568.
+#   • Gemini: 258 per image; GEMINI_TILED models charge that per 768px tile
+#     of images larger than 384px.
+#
+# Image sizes come from the encoded JPEG header (or the PIL image for
+# Gemini). estimate() is memoized per puzzle when given a key, so the
+# attempts and samples of a puzzle share one count.
+#
+# Usage:
+#   python src/token_estimate.py calibrate [MODEL ...]   # default: models.txt
+#       per model: estimate / stored usage prompt_tokens (p10 / p50 / p90)
+#       and mean absolute error over results_{MODEL}.json, for puzzles with
+#       and without an image, next to the old chars/4 estimate
+# --------------------------------------------
+
+import argparse
+import base64
+import functools
+import io
+import math
+import statistics
+import sys
+import threading
+from pathlib import Path
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR         = Path(__file__).resolve().parent.parent
+RESULTS_DIR      = BASE_DIR / "results"
+CHARS_PER_TOKEN  = 4
+OPENAI_ENCODING  = "o200k_base"   # for models tiktoken does not know, and for other providers
+MESSAGE_OVERHEAD = 3              # tokens per chat message (role + separators) ...
+REPLY_PRIMING    = 3              # ... and for the start of the reply
+OPENAI_TILES     = {              # (base, per 512px tile), by model prefix (longest match wins)
+    "gpt-4o": (85, 170),
+    "gpt-4o-mini": (2833, 5667),
+    "gpt-4.1": (85, 170),
+    "o1": (75, 150),
+    "o3": (75, 150),
+}
+OPENAI_PATCHES   = {              # 32px-patch models: multiplier on the patch count
+    "gpt-4.1-mini": 1.62,
+    "gpt-4.1-nano": 2.46,
+    "o4-mini": 1.72,
+}
+MAX_PATCHES      = 1536
+ANTHROPIC_MAX_PX = 1568
+GEMINI_TOKENS    = 258            # per image, or per 768px tile of a larger one ...
+GEMINI_TILED     = ("gemini-2",)  # ... on these models
+
+_memo = {}
+_warned = []
+_memo_lock = threading.Lock()
+
+
+# ---------- text ---------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def _encoding(name):
+    """tiktoken encoding `name`, or None (no tiktoken / no encoding files)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except ImportError:
+        reason = "tiktoken not installed"
+    except Exception as e:  # encodings are downloaded on first use
+        reason = f"tiktoken encoding {name} unavailable ({type(e).__name__})"
+    if not _warned:
+        _warned.append(reason)
+        print(f"[WARN] {reason}: text tokens estimated at {CHARS_PER_TOKEN} chars each", file=sys.stderr)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding_name(model):
+    try:
+        import tiktoken
+        return tiktoken.encoding_name_for_model(model)
+    except (ImportError, KeyError):
+        return OPENAI_ENCODING
+
+
+def text_tokens(text, model=""):
+    enc = _encoding(_encoding_name(model))
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+# ---------- images -------------------------------------------------------
+@functools.lru_cache(maxsize=512)
+def b64_size(b64):
+    """(width, height) of a base64-encoded image (data URL prefix allowed)."""
+    from PIL import Image
+    data = base64.b64decode(b64.partition("base64,")[2] or b64)
+    with Image.open(io.BytesIO(data)) as im:
+        return im.size
+
+
+def _prefixed(table, model):
+    keys = [k for k in table if model.startswith(k)]
+    return table[max(keys, key=len)] if keys else None
+
+
+def _fit(w, h, scale):
+    """(w, h) scaled down by `scale` if it is below 1."""
+    scale = min(1.0, scale)
+    return w * scale, h * scale
+
+
+def openai_image_tokens(model, w, h):
+    multiplier = _prefixed(OPENAI_PATCHES, model)
+    if multiplier is not None:
+        patches = math.ceil(w / 32) * math.ceil(h / 32)
+        if patches > MAX_PATCHES:
+            scale = math.sqrt(32 * 32 * MAX_PATCHES / (w * h))
+            scale *= min(math.floor(w * scale / 32) / (w * scale / 32),
+                         math.floor(h * scale / 32) / (h * scale / 32))
+            patches = math.ceil(w * scale / 32) * math.ceil(h * scale / 32)
+        return math.ceil(min(patches, MAX_PATCHES) * multiplier)
+    base, tile = _prefixed(OPENAI_TILES, model) or OPENAI_TILES["gpt-4o"]
+    w, h = _fit(w, h, 2048 / max(w, h))
+    w, h = _fit(w, h, 768 / min(w, h))
+    return base + tile * math.ceil(w / 512) * math.ceil(h / 512)
+
+
+def anthropic_image_tokens(w, h):
+    scale = min(1.0, ANTHROPIC_MAX_PX / max(w, h))
+    return math.ceil(w * scale * h * scale / 750)
+
+
+def gemini_image_tokens(model, w, h):
+    if not model.startswith(GEMINI_TILED) or (w <= 384 and h <= 384):
+        return GEMINI_TOKENS
+    return GEMINI_TOKENS * math.ceil(w / 768) * math.ceil(h / 768)
+
+
+def image_tokens(provider, model, w, h):
+    """Billed tokens of a w × h image sent to `model`."""
+    if provider == "openai":
+        return openai_image_tokens(model, w, h)
+    if provider == "anthropic":
+        return anthropic_image_tokens(w, h)
+    return gemini_image_tokens(model, w, h)
+
+
+# ---------- prompts ------------------------------------------------------
+def _openai(model, messages):
+    total = REPLY_PRIMING
+    for m in messages:
+        total += MESSAGE_OVERHEAD
+        content = m.get("content", "")
+        for part in [{"type": "text", "text": content}] if isinstance(content, str) else content:
+            if part.get("type") == "image_url":
+                total += image_tokens("openai", model, *b64_size(part["image_url"]["url"]))
+            else:
+                total += text_tokens(part.get("text", ""), model)
+    return total
+
+
+def _anthropic(model, prompt):
+    system, parts = prompt
+    total = text_tokens(system, model) + MESSAGE_OVERHEAD * 2
+    for part in parts:
+        if part.get("type") == "image":
+            total += image_tokens("anthropic", model, *b64_size(part["source"]["data"]))
+        else:
+            total += text_tokens(part.get("text", ""), model)
+    return total
+
+
+def _gemini(model, prompt):
+    return sum(text_tokens(p, model) if isinstance(p, str) else image_tokens("gemini", model, *p.size)
+               for p in prompt)
+
+
+def estimate(provider, model, prompt, key=None):
+    """Prompt tokens of a provider-shaped prompt (benchmark_reasoning.build_prompt); memoized under `key`."""
+    if key is not None:
+        with _memo_lock:
+            if (provider, model, key) in _memo:
+                return _memo[(provider, model, key)]
+    count = {"openai": _openai, "anthropic": _anthropic}.get(provider, _gemini)(model, prompt)
+    if key is not None:
+        with _memo_lock:
+            _memo[(provider, model, key)] = count
+    return count
+
+
+def chars_estimate(provider, prompt):
+    """The old estimate: every character of the prompt, base64 images included, / 4."""
+    if provider == "openai":
+        parts = [p for m in prompt for p in
+                 ([m["content"]] if isinstance(m["content"], str) else m["content"])]
+        chars = sum(len(p) if isinstance(p, str) else len(p.get("text", "") or p["image_url"]["url"])
+                    for p in parts)
+    elif provider == "anthropic":
+        chars = len(prompt[0]) + sum(len(p.get("text", "") or p["source"]["data"]) for p in prompt[1])
+    else:
+        chars = sum(len(p) for p in prompt if isinstance(p, str))
+    return chars // 4 + 1
+
+
+# ---------- calibration --------------------------------------------------
+def calibrate(model, results, rows):
+    """Report lines comparing estimates with the usage prompt_tokens stored for `model`; `rows` by puzzle name."""
+    import benchmark_reasoning as br
+    from providers import classify_provider
+    provider = classify_provider(model)
+    pairs = {"image": [], "text": []}
+    for rec in results.values():
+        row = rows.get(str(rec.get("name", "")).strip())
+        if row is None or not isinstance(row.get("puzzleText"), str):
+            continue
+        for stream in sorted({"stop" in a for a in rec.get("answers", []) if a.get("prompt_tokens")}):
+            actual = [a["prompt_tokens"] for a in rec["answers"]
+                      if a.get("prompt_tokens") and ("stop" in a) == stream]
+            prompt = br.build_prompt(provider, row, stream)   # no model: the images the results were run with
+            kind = "image" if br.puzzle_image_b64(row) else "text"
+            pairs[kind].append((estimate(provider, model, prompt), chars_estimate(provider, prompt),
+                                statistics.median(actual)))
+    lines = [f"\n{model} ({provider})"]
+    if not any(pairs.values()):
+        return lines + ["  no prompt token counts recorded"]
+    lines.append(f"  {'':<6}{'n':>5}   {'estimate / actual p10 / p50 / p90':<34}{'mean abs err':>14}"
+                 f"   {'chars/4 p50':>11}{'mean abs err':>14}")
+    for kind, ps in pairs.items():
+        if not ps:
+            continue
+        cells = []
+        for i in (0, 1):
+            ratios = sorted(p[i] / p[2] for p in ps)
+            q = [ratios[min(len(ratios) - 1, int(f * len(ratios)))] for f in (0.1, 0.5, 0.9)]
+            mae = statistics.mean(abs(p[i] - p[2]) for p in ps)
+            cells.append((q, mae))
+        (q, mae), (q_old, mae_old) = cells
+        lines.append(f"  {kind:<6}{len(ps):>5}   {' / '.join(f'{r:.2f}' for r in q):<34}{mae:>14,.0f}"
+                     f"   {q_old[1]:>11.2f}{mae_old:>14,.0f}")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prompt token estimates and their calibration")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("calibrate", help="compare estimates with stored usage prompt_tokens")
+    c.add_argument("models", nargs="*", help="default: models.txt")
+    args = ap.parse_args()
+
+    import results_log
+    from providers import read_models
+    from puzzle_store import default_store
+    # by name: stored results ids are offset from the current puzzles.csv ids
+    rows = {str(r["name"]).strip(): r for r in default_store().rows()}
+    for model in args.models or read_models():
+        path = RESULTS_DIR / f"results_{model}.json"
+        if not path.exists() and not path.with_suffix(".jsonl").exists():
+            print(f"[SKIP] {path.name} not found in {RESULTS_DIR}", file=sys.stderr)
+            continue
+        for line in calibrate(model, results_log.load(path), rows):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# tracing.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Per-attempt timing spans, written as JSONL traces, and a summary of them.
+#
+# Engine times every job it runs and splits the time into spans:
+#
+#   queue        waiting for a free worker slot (engine concurrency)
+#   quota        waiting for RPM / TPM headroom (ratelimit.RateLimiter)
+#   encode       building the prompt / encoding images (jpeg_b64), including
+#                any done before the run for that attempt
+#   request      in the provider call, minus the spans below
+#   retry_sleep  backing off in retry.py (Retry-After, jitter, breaker holds)
+#   persist      recording the result (results dict + results_{MODEL}.jsonl)
+#
+# Code running inside an attempt reports nested time with span(name) /
+# add(name, sec); they go to the attempt running on the current thread and
+# cost nothing outside one. Each attempt becomes one line of
+# results/traces/run_{YYYYmmdd-HHMMSS}.jsonl, with its spans, start and end
+# offsets from the start of the run, and whether it succeeded.
+#
+# Usage:
+#   python src/tracing.py summary [TRACE.jsonl ...]   # default: the latest trace
+#       p50 / p95 / p99 of every span per model, then requests started per
+#       minute per provider against its RPM limit (providers.PROVIDER_LIMITS)
+# --------------------------------------------
+
+import argparse
+import contextlib
+import json
+import math
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR   = Path(__file__).resolve().parent.parent
+TRACE_DIR  = BASE_DIR / "results" / "traces"
+SPANS      = ("queue", "quota", "encode", "request", "retry_sleep", "persist")
+BAR_WIDTH  = 40          # characters for a full-RPM bar in the timeline
+
+_local = threading.local()
+
+
+# ---------- recording ----------------------------------------------------
+def add(name, sec):
+    """Add `sec` to span `name` of the attempt running on this thread, if any."""
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + sec
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the enclosed block into span `name` of the current attempt."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        add(name, time.monotonic() - start)
+
+
+@contextlib.contextmanager
+def collecting(spans):
+    """Route add()/span() on this thread into the `spans` dict while the block runs."""
+    outer = getattr(_local, "spans", None)
+    _local.spans = spans
+    try:
+        yield spans
+    finally:
+        _local.spans = outer
+
+
+class TraceWriter:
+    """Appends one JSON line per attempt to a run's trace file."""
+
+    def __init__(self, path: Path = None):
+        self.path = path or TRACE_DIR / f"run_{datetime.now():%Y%m%d-%H%M%S}.jsonl"
+        self.t0 = time.monotonic()
+        self._f = None
+        self._lock = threading.Lock()
+
+    def write(self, record, start, end):
+        """`record` plus start / end (monotonic) as offsets from the start of the run."""
+        line = json.dumps({**record, "start": round(start - self.t0, 4), "end": round(end - self.t0, 4)})
+        with self._lock:
+            if self._f is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._f = open(self.path, "a", encoding="utf-8")
+            self._f.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+# ---------- summary ------------------------------------------------------
+def load(paths):
+    rows = []
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            rows.extend(json.loads(line) for line in f if line.strip())
+    return rows
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize(rows, rpm_limits=None):
+    """Lines of the per-model span table and the per-provider requests/minute timeline."""
+    lines = []
+    by_model = {}
+    for r in rows:
+        by_model.setdefault(r.get("model", "?"), []).append(r)
+    cols = [*SPANS, "total"]
+    for model, rs in sorted(by_model.items()):
+        failed = sum(1 for r in rs if not r.get("ok", True))
+        lines.append(f"\n{model}: {len(rs)} attempts, {failed} failed")
+        lines.append(f"  {'':<4}" + "".join(f"{c:>12}" for c in cols))
+        for q in (0.50, 0.95, 0.99):
+            cells = []
+            for c in cols:
+                vals = [r["end"] - r["start"] if c == "total" else r["spans"].get(c, 0.0) for r in rs]
+                cells.append(f"{percentile(vals, q):>11.2f}s")
+            lines.append(f"  p{int(q * 100):<3}" + "".join(cells))
+        spent = {c: sum(r["spans"].get(c, 0.0) for r in rs) for c in SPANS}
+        total = sum(spent.values()) or 1.0
+        lines.append("  share " + ", ".join(f"{c} {100 * v / total:.0f}%" for c, v in spent.items()))
+
+    by_provider = {}
+    for r in rows:
+        sent = r["start"] + r["spans"].get("queue", 0.0) + r["spans"].get("quota", 0.0)
+        by_provider.setdefault(r.get("provider", "?"), []).append(sent)
+    for provider, starts in sorted(by_provider.items()):
+        limit = (rpm_limits or {}).get(provider)
+        per_min = {}
+        for t in starts:
+            per_min[int(t // 60)] = per_min.get(int(t // 60), 0) + 1
+        scale = limit or max(per_min.values())
+        lines.append(f"\n{provider}: requests started per minute" + (f" (RPM limit {limit})" if limit else ""))
+        for minute in range(max(per_min) + 1):
+            n = per_min.get(minute, 0)
+            bar = "#" * round(BAR_WIDTH * min(n, scale) / scale)
+            pct = f"{100 * n / limit:>4.0f}%" if limit else ""
+            lines.append(f"  {minute:>4}m {n:>6} {pct} |{bar:<{BAR_WIDTH}}|")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize per-attempt timing traces")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("summary", help="span percentiles per model and requests/minute per provider")
+    s.add_argument("traces", nargs="*", type=Path, help=f"default: newest file in {TRACE_DIR}")
+    args = ap.parse_args()
+
+    paths = args.traces or sorted(TRACE_DIR.glob("run_*.jsonl"))[-1:]
+    if not paths:
+        print(f"[ERROR] no traces in {TRACE_DIR}")
+        return
+    from providers import PROVIDER_LIMITS
+    print(f"Trace: {', '.join(str(p) for p in paths)}")
+    for line in summarize(load(paths), {p: lim["rpm"] for p, lim in PROVIDER_LIMITS.items()}):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
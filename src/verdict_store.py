@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# verdict_store.py
+# --------------------------------------------
+# deps: (stdlib only)
+#
+# Persistent LLM-judge verdicts, so re-grading only pays for answers that
+# changed since the last run instead of re-judging every model from scratch.
+#
+# Key: (puzzle id, sha256 of the ground truth, sha256 of the model answer,
+# judge). The judge id is the judge model plus a hash of its prompt, so
+# switching models or rewording the prompt starts a fresh set of verdicts
+# while the old ones stay for switching back. A re-run attempt, a new model
+# or a corrected ground truth changes the key and gets judged; everything
+# else is answered from the store.
+#
+# Stored in .cache/verdicts.sqlite (WAL, safe across concurrent scripts).
+#
+# Usage:
+#   python src/verdict_store.py stats
+#   python src/verdict_store.py clear [--judge gpt-4o-mini]
+# --------------------------------------------
+
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# ---------- CONFIG -------------------------------------------------------
+BASE_DIR   = Path(__file__).resolve().parent.parent
+STORE_PATH = BASE_DIR / ".cache" / "verdicts.sqlite"
+LOOKUP_CHUNK = 500          # keys per SELECT (SQLite caps bound parameters)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    puzzle_id    INTEGER NOT NULL,
+    truth_sha    TEXT NOT NULL,
+    answer_sha   TEXT NOT NULL,
+    judge        TEXT NOT NULL,
+    correct      INTEGER NOT NULL,
+    judged_at    REAL NOT NULL,
+    PRIMARY KEY (puzzle_id, truth_sha, answer_sha, judge)
+) WITHOUT ROWID;
+"""
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def judge_id(model: str, prompt: str) -> str:
+    """Judge identity stored with each verdict: model@prompt-hash."""
+    return f"{model}@{_sha(prompt)[:12]}"
+
+
+def verdict_key(puzzle_id, truth: str, answer: str, judge: str):
+    return int(puzzle_id), _sha(truth), _sha(answer), judge
+
+
+class VerdictStore:
+    """SQLite table of 0/1 verdicts keyed by verdict_key()."""
+
+    def __init__(self, path: Path = STORE_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def lookup(self, keys):
+        """{key: 0/1} for the keys that have a stored verdict."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[i:i + LOOKUP_CHUNK]
+                marks = ",".join("(?, ?, ?, ?)" for _ in chunk)
+                rows = db.execute(
+                    "SELECT puzzle_id, truth_sha, answer_sha, judge, correct FROM verdicts "
+                    f"WHERE (puzzle_id, truth_sha, answer_sha, judge) IN (VALUES {marks})",
+                    [v for k in chunk for v in k]).fetchall()
+                found.update({tuple(r[:4]): r[4] for r in rows})
+        return found
+
+    def put_many(self, items):
+        """Store [(key, 0/1)], replacing earlier verdicts for the same keys."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                           [(*key, int(correct), now) for key, correct in items])
+            db.commit()
+
+    def clear(self, judge=None):
+        """Drop every verdict, or those of one judge model (any prompt); returns the count removed."""
+        with self._lock:
+            db = self._db()
+            if judge is None:
+                n = db.execute("DELETE FROM verdicts").rowcount
+            else:
+                n = db.execute("DELETE FROM verdicts WHERE judge = ? OR judge LIKE ?",
+                               (judge, f"{judge}@%")).rowcount
+            db.commit()
+        return n
+
+    def summary(self):
+        with self._lock:
+            return self._db().execute(
+                "SELECT judge, COUNT(*), SUM(correct) FROM verdicts GROUP BY judge ORDER BY judge").fetchall()
+
+
+_default = None
+
+
+def default_verdicts() -> VerdictStore:
+    """Process-wide store, opened on first use."""
+    global _default
+    if _default is None:
+        _default = VerdictStore()
+    return _default
+
+
+# ---------- CLI ----------------------------------------------------------
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or clear the stored LLM-judge verdicts")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="verdict counts per judge")
+    c = sub.add_parser("clear", help="drop stored verdicts")
+    c.add_argument("--judge", help="only this judge model's verdicts")
+    args = ap.parse_args()
+
+    store = default_verdicts()
+    if args.cmd == "stats":
+        rows = store.summary()
+        if not rows:
+            print(f"{STORE_PATH}: empty")
+        for judge, n, correct in rows:
+            print(f"{judge:<40} {n:>7} verdicts  {correct:>6} correct")
+    else:
+        print(f"Removed {store.clear(args.judge)} verdicts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import benchmark_reasoning as br  # noqa: E402
+
+
+def test_gemini_prompt_does_not_hold_the_image_file_open(tmp_path):
+    from PIL import Image
+    path = tmp_path / "0_0.png"
+    Image.new("RGB", (4, 4), "red").save(path)
+
+    prompt = br.build_msgs_gemini({"puzzleText": "Hooks", "hasImage": True, "imagePath": str(path)})
+    image = prompt[1]
+    assert image.fp is None
+    assert image.getpixel((0, 0)) == (255, 0, 0)
@@ -0,0 +1,57 @@
+import itertools
+import math
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from check_accuracy_regex import canonical, grade_samples, pass_at_k, samples_frame, score_samples  # noqa: E402
+
+
+def _brute_pass_at_k(n, c, k):
+    """Share of k-subsets of n samples (c of them correct) holding at least one correct sample."""
+    samples = [True] * c + [False] * (n - c)
+    subsets = list(itertools.combinations(range(n), k))
+    return sum(any(samples[i] for i in s) for s in subsets) / len(subsets)
+
+
+def test_pass_at_k_matches_the_closed_form():
+    cases = [(n, c) for n in range(1, 9) for c in range(n + 1)]
+    n, c = [x[0] for x in cases], [x[1] for x in cases]
+    for k in (1, 2, 4, 8):
+        got = pass_at_k(n, c, k)
+        for (nn, cc), value in zip(cases, got):
+            if nn < k:
+                assert math.isnan(value)
+            else:
+                assert value == pytest.approx(_brute_pass_at_k(nn, cc, k))
+                assert value == pytest.approx(1 - math.comb(nn - cc, k) / math.comb(nn, k))
+
+
+def _truths(answers):
+    pids = list(answers)
+    return pd.DataFrame({"truth": [answers[p] for p in pids], "truth_name": [f"p{p}" for p in pids],
+                         "numSolvers": [None] * len(pids),
+                         "truth_norm": [canonical(answers[p]) for p in pids]},
+                        index=pd.Index(pids, name="pid"))
+
+
+def test_majority_vote_and_agreement():
+    samples = {"m": {"1": {"name": "Hooks", "answers": ["42", "41", "42", None, "The answer is 7"]},
+                     "2": {"name": "Knight Moves", "answers": ["9", "9", "12", ""]}}}
+    per = score_samples(grade_samples(samples_frame(samples), _truths({1: "42", 2: "12"})), ks=(1, 2))
+    by_pid = per.set_index("pid")
+
+    hooks = by_pid.loc[1]
+    assert (hooks["n"], hooks["correct"]) == (4, 2)             # the missing sample is left out
+    assert hooks["majority_answer"] == "42" and hooks["majority_ok"]
+    assert hooks["agreement"] == pytest.approx(2 / 4)
+    assert hooks["pass@1"] == pytest.approx(0.5)
+
+    knight = by_pid.loc[2]
+    assert knight["majority_answer"] == "9" and not knight["majority_ok"]
+    assert knight["agreement"] == pytest.approx(2 / 4)           # the empty answer counts in n, not in a vote
+    assert knight["pass@2"] == pytest.approx(_brute_pass_at_k(4, 1, 2))
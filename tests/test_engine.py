@@ -0,0 +1,22 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from engine import Engine  # noqa: E402
+from ratelimit import RateLimiter  # noqa: E402
+
+
+def test_failed_call_refunds_its_reservation():
+    limiter = RateLimiter(rpm=10, tpm=200, clock=lambda: 0.0)
+
+    def call(job):
+        if job["attempt"] == 1:
+            raise RuntimeError("503 from the provider")
+        return {"total_tokens": 30}
+
+    jobs = [{"pid": "1", "attempt": 1, "tokens": 80}, {"pid": "1", "attempt": 2, "tokens": 80}]
+    stats = asyncio.run(Engine("t", call, concurrency=1, limiter=limiter).run(jobs, lambda job, entry: None))
+    assert (stats["failed"], stats["requests"]) == (1, 1)
+    assert limiter.tokens.used == 30
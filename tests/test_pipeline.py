@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pipeline  # noqa: E402
+
+
+def _tree(tmp_path, monkeypatch):
+    """A results/ + src/ layout under tmp_path that pipeline's paths point at."""
+    src, results = tmp_path / "src", tmp_path / "results"
+    src.mkdir()
+    results.mkdir()
+    for name in {n for names in pipeline.SCRIPTS.values() for n in names}:
+        (src / f"{name}.py").write_text(f"# {name}\n")
+    csv_path = tmp_path / "puzzles.csv"
+    csv_path.write_text("id,name,answer\n1,Hooks,42\n")
+    (results / "results_m.json").write_text("{}")
+    (results / "correct_m.json").write_text("{}")
+    for attr, value in (("SRC_DIR", src), ("BASE_DIR", tmp_path), ("RESULTS_DIR", results),
+                        ("CSV_PATH", csv_path)):
+        monkeypatch.setattr(pipeline, attr, value)
+    return src
+
+
+def test_editing_a_checker_marks_grade_stale(tmp_path, monkeypatch):
+    src = _tree(tmp_path, monkeypatch)
+    state = pipeline.State(tmp_path / "pipeline.json")
+    (target,) = pipeline.targets("grade", ["m"])
+    state.record(target)
+    assert state.why_stale(target) is None
+
+    for checker in ("check_accuracy_regex", "check_accuracy_llm"):
+        path = src / f"{checker}.py"
+        original = path.read_text()
+        path.write_text(original + "# new normalization rule\n")
+        assert state.why_stale(target) == f"changed: {checker}.py"
+        path.write_text(original)
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ratelimit import WINDOW_SEC, RateLimiter, Reservation  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_reserve_waits_for_the_window_and_settle_refunds():
+    clock = Clock()
+    limiter = RateLimiter(rpm=100, tpm=1000, clock=clock)
+    first = limiter.try_acquire(600)
+    assert isinstance(first, Reservation)
+    assert limiter.try_acquire(600) == WINDOW_SEC          # the only entry frees up a window later
+
+    limiter.settle(first, 200)                              # the estimate was 3x too high
+    assert limiter.tokens.used == 200
+    assert isinstance(limiter.try_acquire(600), Reservation)
+
+    clock.now = 30.0
+    assert limiter.try_acquire(600) == WINDOW_SEC - 30.0
+    clock.now = WINDOW_SEC
+    assert isinstance(limiter.try_acquire(600), Reservation)
+    assert limiter.tokens.used == 600
+
+
+def test_settle_charges_an_underestimate():
+    limiter = RateLimiter(tpm=1000, clock=Clock())
+    res = limiter.try_acquire(100)
+    limiter.settle(res, 900)
+    assert limiter.try_acquire(200) == WINDOW_SEC
+
+
+def test_requests_per_minute():
+    limiter = RateLimiter(rpm=2, clock=Clock())
+    assert isinstance(limiter.try_acquire(), Reservation)
+    assert isinstance(limiter.try_acquire(), Reservation)
+    assert limiter.try_acquire() == WINDOW_SEC
+
+
+def test_oversize_request_only_waits_for_an_empty_window():
+    clock = Clock()
+    limiter = RateLimiter(tpm=1000, clock=clock)
+    assert isinstance(limiter.try_acquire(5000), Reservation)
+    clock.now = WINDOW_SEC
+    assert isinstance(limiter.try_acquire(5000), Reservation)
+
+
+def test_headers_clamp_the_buckets():
+    limiter = RateLimiter(rpm=100, tpm=1000, clock=Clock())
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "100",
+                                 "x-ratelimit-remaining-requests": "not a number"})
+    assert limiter.try_acquire(200) > 0
+    assert isinstance(limiter.try_acquire(100), Reservation)
+
+    limiter = RateLimiter(rpm=100, tpm=1000, clock=Clock())
+    limiter.update_from_headers({"anthropic-ratelimit-requests-remaining": "0"})
+    assert limiter.try_acquire(1) > 0
+
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "5000"})   # never loosens
+    assert limiter.tokens.used == 0
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from response_cache import cache_key  # noqa: E402
+
+
+def test_gemini_models_with_same_contents_get_different_keys():
+    payload = {"contents": ["What is 6 x 7?"], "config": {"temperature": 0.25}}
+    flash = SimpleNamespace(model_name="models/gemini-2.0-flash-exp")
+    pro = SimpleNamespace(model_name="models/gemini-1.5-pro")
+    for provider in ("gemini", "gemini-stream"):
+        assert cache_key(provider, flash, payload, 1) != cache_key(provider, pro, payload, 1)
+        assert cache_key(provider, flash, payload, 1) == cache_key(provider, flash, dict(payload), 1)
+
+
+def test_payload_model_is_kept():
+    client = SimpleNamespace(base_url="https://api.openai.com/v1/")
+    payload = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+    assert cache_key("openai", client, payload) != cache_key("openai", client, {**payload, "model": "o3"})
@@ -0,0 +1,55 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import results_log  # noqa: E402
+
+
+def _entry(attempt, answer):
+    return {"attempt": attempt, "temperature": 0.25, "answer": answer}
+
+
+def test_replay_keeps_attempt_order(tmp_path):
+    json_path = tmp_path / "results_m.json"
+    with results_log.ResultsLog(json_path) as log:
+        log.append("7", "Hooks", _entry(2, "second"))
+        log.append("7", "Hooks", _entry(1, "first"))
+    results = results_log.load(json_path)
+    assert [a["attempt"] for a in results["7"]["answers"]] == [1, 2]
+
+    results_log.compact(json_path, results)
+    stored = json.loads(json_path.read_text())
+    assert [a["answer"] for a in stored["7"]["answers"]] == ["first", "second"]
+    assert not results_log.log_path(json_path).exists()
+
+
+def test_replay_is_idempotent_and_replaces_an_attempt(tmp_path):
+    json_path = tmp_path / "results_m.json"
+    json_path.write_text(json.dumps({"7": {"name": "Hooks", "answers": [_entry(1, "old")]}}))
+    with results_log.ResultsLog(json_path) as log:
+        log.append("7", "Hooks", _entry(1, "new"))
+        log.append("8", "Knight Moves", _entry(1, "9"))
+    once = results_log.load(json_path)
+    assert once["7"]["answers"] == [_entry(1, "new")]
+    results_log.replay(results_log.log_path(json_path), once)
+    assert once == results_log.load(json_path)
+
+
+def test_torn_tail_line_is_skipped(tmp_path, capsys):
+    json_path = tmp_path / "results_m.json"
+    with results_log.ResultsLog(json_path) as log:
+        log.append("7", "Hooks", _entry(1, "first"))
+    with open(results_log.log_path(json_path), "a") as f:
+        f.write('{"pid": "7", "name": "Hooks", "entry": {"attempt": 2, "ans')     # crash mid-append
+    results = results_log.load(json_path)
+    assert [a["answer"] for a in results["7"]["answers"]] == ["first"]
+    assert "truncated record" in capsys.readouterr().err
+
+
+def test_compact_leaves_sample_lists_alone(tmp_path):
+    json_path = tmp_path / "samples_m.json"
+    samples = {"7": {"name": "Hooks", "answers": ["b", None, "a"], "completion_tokens": [1, None, 2]}}
+    results_log.compact(json_path, samples)
+    assert json.loads(json_path.read_text())["7"]["answers"] == ["b", None, "a"]
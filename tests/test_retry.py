@@ -0,0 +1,122 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from retry import Breaker, CircuitOpen, RetryPolicy, classify, retry_after  # noqa: E402
+
+
+class APIError(Exception):
+    def __init__(self, status_code=None, message="", headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("exc, kind", [
+    (APIError(429), "rate_limit"),
+    (RateLimitError("slow down"), "rate_limit"),
+    (APIError(503), "overloaded"),
+    (APIError(529), "overloaded"),
+    (APIError(504), "timeout"),
+    (TimeoutError(), "timeout"),
+    (APIError(500), "server"),
+    (ConnectionResetError(), "connection"),
+    (RuntimeError("Resource has been exhausted (e.g. check quota)."), "rate_limit"),
+    (APIError(400), None),
+    (APIError(401), None),
+    (ValueError("bad request"), None),
+])
+def test_classify(exc, kind):
+    assert classify(exc) == kind
+
+
+def test_retry_after():
+    assert retry_after(APIError(429, headers={"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(APIError(429, headers={"retry-after": "2"})) == 2.0
+    assert retry_after(APIError(429, "Rate limit reached. Please try again in 250ms.")) == 0.25
+    assert retry_after(APIError(429, "Please retry in 3.5s")) == 3.5
+    assert retry_after(APIError(429, "Rate limit reached.")) is None
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = Clock()
+    breaker = Breaker(threshold=2, cooldown=10.0, clock=clock)
+    assert breaker.admit() == 0.0
+    assert breaker.failure() is False
+    assert breaker.failure() is True                  # open
+    assert breaker.admit() == 10.0
+
+    clock.now = 10.0
+    assert breaker.admit() == 0.0                     # half-open: one probe goes out ...
+    assert breaker.admit() == 2.5                     # ... and the rest wait
+    assert breaker.failure() is True                  # the probe failed: open again
+    assert breaker.down_for() == 0.0                  # the outage started at t=10
+
+    clock.now = 25.0
+    assert breaker.down_for() == 15.0
+    assert breaker.admit() == 0.0
+    breaker.success()
+    assert (breaker.admit(), breaker.down_for(), breaker.failures) == (0.0, 0.0, 0)
+
+
+def _policy(clock, sleeps, **kw):
+    def sleep(sec):
+        sleeps.append(sec)
+        clock.now += sec
+    return RetryPolicy(sleep=sleep, clock=clock, **kw)
+
+
+def test_policy_retries_transient_errors_within_budget():
+    clock, sleeps = Clock(), []
+    policy = _policy(clock, sleeps, base_delay=1.0, max_delay=8.0)
+    errors = [APIError(503), APIError(429, headers={"retry-after": "4"})]
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert policy.call("openai", fn) == "ok"
+    assert 1.0 <= sleeps[0] <= 3.0                    # first backoff: uniform(base, 3 × base)
+    assert sleeps[1] == pytest.approx(4.3)            # Retry-After + cushion
+    m = policy.metrics.snapshot()["openai"]
+    assert m["retries"] == {"overloaded": 1, "rate_limit": 1} and m["gave_up"] == 0
+
+
+def test_policy_gives_up_and_raises_fatal_errors_at_once():
+    clock, sleeps = Clock(), []
+    policy = _policy(clock, sleeps, budgets={"server": 2}, breaker_threshold=100)
+    with pytest.raises(APIError):
+        policy.call("anthropic", lambda: (_ for _ in ()).throw(APIError(500)))
+    assert len(sleeps) == 2 and policy.metrics.snapshot()["anthropic"]["gave_up"] == 1
+
+    sleeps.clear()
+    with pytest.raises(APIError):
+        policy.call("anthropic", lambda: (_ for _ in ()).throw(APIError(400)))
+    assert sleeps == []
+
+
+def test_policy_fails_fast_once_the_provider_is_down_too_long():
+    clock, sleeps = Clock(), []
+    policy = _policy(clock, sleeps, budgets={"server": 100}, breaker_threshold=2,
+                     breaker_cooldown=10.0, breaker_max_open=30.0, max_delay=1.0)
+    with pytest.raises(CircuitOpen):
+        policy.call("gemini", lambda: (_ for _ in ()).throw(APIError(500)))
+    assert policy.breaker("gemini").down_for() > 30.0
+    assert policy.metrics.snapshot()["gemini"]["rejected"] == 1
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from sampling import EarlyStop, apply, missing, next_job, runs  # noqa: E402
+
+
+def test_solved_stops_at_the_first_match():
+    stop = EarlyStop(k=8)
+    assert stop.track(("m", "1"), "42", []) is None
+    assert stop.add(("m", "1"), ["41"]) is None
+    assert stop.add(("m", "1"), ["42"]) == "solved"
+    assert stop.stopped(("m", "1"))
+
+
+def test_agreed_on_agree_votes_or_an_unbeatable_lead():
+    stop = EarlyStop(k=8, agree=3, rules=("agreed",))
+    stop.track(("m", "1"), "42", [])
+    assert stop.add(("m", "1"), ["7", "7"]) is None
+    assert stop.add(("m", "1"), ["42"]) is None                 # solved is not a rule here
+    assert stop.add(("m", "1"), ["7"]) == "agreed"
+
+    stop = EarlyStop(k=3, agree=3, rules=("agreed",))
+    assert stop.track(("m", "2"), "42", ["7", "7"]) == "agreed"  # 2 votes, 1 sample left: cannot be overtaken
+
+
+def test_budget_and_empty_answers():
+    stop = EarlyStop(k=3, rules=())
+    stop.track(("m", "1"), "42", [])
+    assert stop.add(("m", "1"), ["", None]) is None             # drawn, but no vote
+    assert stop.puzzles[("m", "1")]["forms"] == []
+    assert stop.add(("m", "1"), ["42"]) == "budget"
+
+
+def test_summary_counts_reasons():
+    stop = EarlyStop(k=4)
+    stop.track(("m", "1"), "42", ["42"])
+    stop.track(("m", "2"), "42", [])
+    stop.budget["m"].update(samples=8, calls=8)
+    assert stop.summary("m", 3, 3) == ("adaptive: 3/8 samples drawn, 5 saved; 3/8 API calls, 5 saved; "
+                                       "stopped: solved 1, open 1")
+
+
+def test_queued_samples_become_follow_ups():
+    job = {"pid": "1", "attempt": 1, "n": 2, "queued": [3, 4, 5, 7], "step": 2}
+    assert runs([1, 2, 3, 5, 6], 2) == [(1, 2), (3, 1), (5, 2)]
+    assert [(j["attempt"], j["n"]) for j in next_job(job)] == [(3, 2)]
+    assert [(j["attempt"], j["n"]) for j in next_job(job)] == [(5, 1)]
+    assert [(j["attempt"], j["n"]) for j in next_job(job)] == [(7, 1)]
+    assert next_job(job) == []
+
+
+def test_apply_places_samples_by_number():
+    samples = {}
+    entry = {"sample": 3, "temperature": 0.7, "answers": ["a", "b"], "completion_tokens": [5, 6],
+             "prompt_tokens": 100}
+    apply(samples, "1", "Hooks", entry)
+    apply(samples, "1", "Hooks", entry)                          # replaying is idempotent
+    assert samples["1"]["answers"] == [None, None, "a", "b"]
+    assert missing(samples["1"], 5) == [1, 2, 5]
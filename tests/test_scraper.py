@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import scraper  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent.parent / "data" / "fixtures" / "janestreet"
+
+
+def test_archive_walk_over_fixtures():
+    fetcher = scraper.FixtureFetcher(FIXTURES)
+    entries = scraper.walk_archive(fetcher, incremental=False)
+    names = [e["name"] for e in entries]
+    assert names[:3] == ["Robot Road Trip", "Some Ones, Somewhere", "Number Cross 5"]
+    assert entries[0]["solutionLink"] is None                    # the current puzzle has no solution yet
+    assert entries[1]["date"] == "June 2025"                     # trailing ":" dropped
+    assert all(e["puzzleLink"].startswith(scraper.SITE_URL) for e in entries)
+
+    # incremental: page 1 has nothing new, so page 2 is never requested
+    fetcher = scraper.FixtureFetcher(FIXTURES)
+    known = {n: {"hasSolution": True} for n in names} | {"Robot Road Trip": {"hasSolution": False}}
+    assert len(scraper.walk_archive(fetcher, known)) == 3
+    assert fetcher.stats["fetched"] == 1
+
+
+def test_solvers_are_counted_from_the_html():
+    assert scraper.parse_solvers('<p class="correct-submissions margin-top-20">a<br>b<br>c<br></p>') == 3
+    assert scraper.parse_solvers("<p>no list here</p>") is None
+
+
+class Session:
+    """requests.Session stand-in answering 304 when the request carries the page's ETag."""
+
+    def __init__(self):
+        self.headers, self.seen = {}, []
+
+    def get(self, url, headers=None, timeout=None):
+        self.seen.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return SimpleNamespace(status_code=304, headers={}, content=b"")
+        return SimpleNamespace(status_code=200, headers={"ETag": '"v1"'}, content=b"<html>v1</html>")
+
+
+def test_conditional_requests_answer_304_from_the_cache(tmp_path):
+    fetcher = scraper.Fetcher(cache_dir=tmp_path)
+    fetcher.session = Session()
+    assert fetcher.get(scraper.ARCHIVE_URL) == (200, b"<html>v1</html>")
+    assert fetcher.get(scraper.ARCHIVE_URL) == (200, b"<html>v1</html>")
+    assert fetcher.session.seen[1] == {"If-None-Match": '"v1"'}
+    assert (fetcher.stats["fetched"], fetcher.stats["not_modified"]) == (1, 1)
+
+
+def test_live_markup(tmp_path):
+    """The parser against the real site; fails on markup drift, skipped offline."""
+    import requests
+    fetcher = scraper.Fetcher(cache_dir=tmp_path)
+    fetcher.session.mount("https://", requests.adapters.HTTPAdapter(max_retries=0))
+    try:
+        status, html = fetcher.get(scraper.ARCHIVE_URL)
+    except requests.exceptions.RequestException as e:
+        pytest.skip(f"archive unreachable: {type(e).__name__}")
+    assert status == 200
+    entries = scraper.parse_archive(html)
+    assert entries, "no div.row.puzzle-row.archive-list rows on the archive page"
+    assert all(e["name"] and e["date"] for e in entries)
+
+    solved = next(e for e in entries if e["solutionLink"])
+    text, _ = scraper.parse_body(fetcher.get(solved["puzzleLink"])[1])
+    assert text, "no <p> text in div.page-column.row of a puzzle page"
+    sol_html = fetcher.get(solved["solutionLink"])[1]
+    assert scraper.parse_body(sol_html)[0], "no <p> text on a solution page"
+    assert scraper.parse_solvers(sol_html), "no p.correct-submissions solver list on a solution page"
+
+    fetcher.get(scraper.ARCHIVE_URL)
+    if fetcher.stats["not_modified"] == 0:
+        meta = fetcher._paths(scraper.ARCHIVE_URL)[0].read_text()
+        assert '"etag": null' in meta and '"last_modified": null' in meta, "validators sent but no 304"